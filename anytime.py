@@ -0,0 +1,287 @@
+import heapq
+import math
+import time
+
+from array import array
+from grid import Grid
+from heuristics import Heuristic, estimator
+from pathfinding import SearchStats, construct_path, move_cost
+from typing import List, NamedTuple, Optional, Tuple
+
+# Type definitions.
+Cell_ID = int
+
+# Default weight on the heuristic: the first path found costs at most this many times as much as the shortest path.
+DEFAULT_WEIGHT = 2.0
+
+# Amount the weight is lowered by between ARA* iterations.
+DEFAULT_WEIGHT_STEP = 0.5
+
+# Default time ara_star may spend searching, in seconds.
+DEFAULT_BUDGET_SECONDS = 0.05
+
+# Number of cells expanded between checks of the clock.
+CLOCK_INTERVAL = 64
+
+
+class AnytimeResult(NamedTuple):
+    """ The best path an AnytimePlanner has found so far.
+
+    Instance Variables:
+        path: Best path found, or empty if there is none (yet).
+        bound: Suboptimality bound of the path: it costs at most this many times as much as the shortest path. Infinite
+            if no path has been found yet.
+        complete: Whether the planner has finished. If so, the path is the best it will find, and is empty only if
+            there is no path.
+    """
+    path: List[Cell_ID]
+    bound: float
+    complete: bool
+
+
+class AnytimePlanner:
+    """ Finds a path from start to end with Anytime Repairing A* (ARA*), within a budget of time or cell expansions.
+    The first path is found quickly with Weighted A*, which multiplies the heuristic by a weight greater than 1: this
+    expands far fewer cells than A*, and the path costs at most weight times as much as the shortest. While budget
+    remains, the weight is lowered and the path improved, reusing the previous iteration's search instead of starting
+    again: only cells whose cost from the start improved since they were expanded are searched again. The final
+    iteration, at a weight of 1, finds the shortest path.
+
+    The planner keeps its search between calls to improve(), so a search that ran out of budget continues where it left
+    off. If the grid changes, the search starts again.
+
+    Instance Variables:
+        grid: Grid the path is found on.
+        start: Cell ID the path starts at.
+        end: Cell ID the path ends at.
+        initial_weight: Weight the first iteration searches with.
+        final_weight: Weight of the last iteration. The planner stops improving the path once its bound reaches this.
+        weight_step: Amount the weight is lowered by between iterations.
+        expansions: Total number of cells expanded since the planner was created.
+        __heuristic: Heuristic the weight is applied to.
+        __h_score: Estimate of the cost from a cell to the end.
+        __version: Grid version the search is for.
+        __weight: Weight of the current iteration.
+        __g_scores: Cost of the best path found from the start to each cell.
+        __came_from: Cell ID before each cell on its best path from the start.
+        __keys: Key (g_score plus weighted h_score) each open cell was last pushed onto the heap with.
+        __open: Whether each cell is in the heap. Heap entries for cells that aren't open, or whose key is out of date,
+            are skipped.
+        __closed: Whether each cell was expanded in the current iteration.
+        __inconsistent: Whether each cell is in __inconsistent_cells.
+        __inconsistent_cells: Cells whose g_score improved after they were expanded in the current iteration. They
+            are only expanded again in the next iteration.
+        __heap: Heap of (key, Cell ID) entries.
+        __pushes: Total number of entries pushed onto the heap.
+        __stale_pops: Total number of out of date entries popped from the heap.
+        __result: Best path found so far, with its bound.
+    """
+    grid: Grid
+    start: Cell_ID
+    end: Cell_ID
+    initial_weight: float
+    final_weight: float
+    weight_step: float
+    expansions: int
+
+    def __init__(self, grid: Grid, start: Cell_ID, end: Cell_ID, heuristic: Optional[Heuristic] = None,
+                 weight: float = DEFAULT_WEIGHT, final_weight: float = 1.0,
+                 weight_step: float = DEFAULT_WEIGHT_STEP) -> None:
+        assert weight >= final_weight >= 1 and weight_step > 0
+        self.grid = grid
+        self.start = start
+        self.end = end
+        self.initial_weight = weight
+        self.final_weight = final_weight
+        self.weight_step = weight_step
+        self.expansions = 0
+        self.__heuristic = heuristic
+        self.__pushes = 0
+        self.__stale_pops = 0
+        self.__reset()
+
+    @property
+    def weight(self) -> float:
+        """ Weight of the current iteration. """
+        return self.__weight
+
+    @property
+    def result(self) -> AnytimeResult:
+        """ Best path found so far, with its bound. """
+        return self.__result
+
+    def improve(self, seconds: Optional[float] = None, expansions: Optional[int] = None,
+                stats: Optional[SearchStats] = None) -> AnytimeResult:
+        """ Search for up to the given number of seconds and cell expansions (without limit if neither is given), and
+        return the best path found so far. Each iteration that finishes within the budget improves the path, and the
+        search stops early once the path can't be improved any further.
+        """
+        if self.grid.version != self.__version:
+            self.__reset()
+
+        deadline = time.perf_counter() + seconds if seconds is not None else None
+        limit = self.expansions + expansions if expansions is not None else None
+        expanded, pushes, stale_pops = self.expansions, self.__pushes, self.__stale_pops
+
+        while not self.__result.complete and self.__improve_path(deadline, limit):
+            self.__publish()
+            if not self.__result.complete:
+                self.__lower_weight()
+
+        if stats is not None:
+            stats.expanded += self.expansions - expanded
+            stats.pushes += self.__pushes - pushes
+            stats.stale_pops += self.__stale_pops - stale_pops
+            stats.path_length += len(self.__result.path)
+            stats.suboptimality_bound = max(stats.suboptimality_bound, self.__result.bound)
+        return self.__result
+
+    def __reset(self) -> None:
+        """ Forget all search state and start again from the first iteration. """
+        num_cells = self.grid.get_num_cells()
+        self.__version = self.grid.version
+        self.__h_score = estimator(self.grid, self.end, self.__heuristic)
+        self.__weight = self.initial_weight
+        self.__g_scores = array('d', [math.inf]) * num_cells
+        self.__came_from = array('i', bytes(4 * num_cells))
+        self.__keys = array('d', bytes(8 * num_cells))
+        self.__open = bytearray(num_cells)
+        self.__closed = bytearray(num_cells)
+        self.__inconsistent = bytearray(num_cells)
+        self.__inconsistent_cells: List[Cell_ID] = []
+        self.__heap: List[Tuple[float, Cell_ID]] = []
+        self.__result = AnytimeResult([], math.inf, False)
+
+        self.__g_scores[self.start] = 0
+        self.__came_from[self.start] = self.start
+        self.__push(self.start)
+
+    def __push(self, cell_id: Cell_ID) -> None:
+        """ Add a cell to the heap, replacing any entry it already has. """
+        key = self.__g_scores[cell_id] + self.__weight * self.__h_score(cell_id)
+        self.__keys[cell_id] = key
+        self.__open[cell_id] = True
+        heapq.heappush(self.__heap, (key, cell_id))
+        self.__pushes += 1
+
+    def __improve_path(self, deadline: Optional[float], limit: Optional[int]) -> bool:
+        """ Run the current iteration until the end's cost is no higher than any open cell's key. Returns False if the
+        budget ran out first.
+        """
+        grid = self.grid
+        g_scores = self.__g_scores
+        came_from = self.__came_from
+        keys = self.__keys
+        is_open = self.__open
+        closed = self.__closed
+        inconsistent = self.__inconsistent
+        heap = self.__heap
+        end = self.end
+        diagonal = grid.diagonal
+        width = grid.width
+        costs = None if grid.uniform else grid.costs
+
+        while heap:
+            key, current_id = heap[0]
+            if not is_open[current_id] or keys[current_id] != key:
+                heapq.heappop(heap)
+                self.__stale_pops += 1
+                continue
+
+            # No open cell can lead to a cheaper path to the end at this weight.
+            if g_scores[end] <= key:
+                return True
+
+            if limit is not None and self.expansions >= limit:
+                return False
+            if deadline is not None and self.expansions % CLOCK_INTERVAL == 0 and time.perf_counter() >= deadline:
+                return False
+
+            heapq.heappop(heap)
+            is_open[current_id] = False
+            closed[current_id] = True
+            self.expansions += 1
+
+            for neighbour_id in grid.get_neighbours(current_id):
+                new_g_score = g_scores[current_id] + move_cost(diagonal, width, costs, current_id, neighbour_id)
+                if new_g_score >= g_scores[neighbour_id]:
+                    continue
+
+                g_scores[neighbour_id] = new_g_score
+                came_from[neighbour_id] = current_id
+
+                # Cells are expanded at most once per iteration. A cell that improves after its expansion waits for the
+                # next iteration.
+                if not closed[neighbour_id]:
+                    self.__push(neighbour_id)
+                elif not inconsistent[neighbour_id]:
+                    inconsistent[neighbour_id] = True
+                    self.__inconsistent_cells.append(neighbour_id)
+        return True
+
+    def __publish(self) -> None:
+        """ Record the path found by the iteration that just finished, with its bound. The bound is the lower of the
+        weight and the path's cost over the lowest unweighted f_score of any cell that could still lead to a cheaper
+        path; if there are no such cells, the path is the shortest.
+        """
+        end_score = self.__g_scores[self.end]
+        if end_score == math.inf or self.start == self.end:
+            # Either every reachable cell was expanded without reaching the end, or there is nowhere to go.
+            self.__result = AnytimeResult([], 1.0, True)
+            return
+
+        lowest = min((self.__g_scores[cell_id] + self.__h_score(cell_id) for cell_id in self.__frontier()),
+                     default=math.inf)
+        bound = max(1.0, min(self.__weight, end_score / lowest if lowest > 0 else self.__weight))
+        path = construct_path(self.start, self.end, self.__came_from)
+        self.__result = AnytimeResult(path, bound, bound <= self.final_weight)
+
+    def __lower_weight(self) -> None:
+        """ Start the next iteration: lower the weight, and re-open the open and inconsistent cells with keys for the
+        new weight.
+        """
+        self.__weight = max(self.final_weight, self.__weight - self.weight_step)
+        frontier = self.__frontier()
+
+        self.__closed[:] = bytes(len(self.__closed))
+        for cell_id in self.__inconsistent_cells:
+            self.__inconsistent[cell_id] = False
+        self.__inconsistent_cells = []
+
+        h_score = self.__h_score
+        self.__heap = []
+        for cell_id in frontier:
+            key = self.__g_scores[cell_id] + self.__weight * h_score(cell_id)
+            self.__keys[cell_id] = key
+            self.__open[cell_id] = True
+            self.__heap.append((key, cell_id))
+        heapq.heapify(self.__heap)
+        self.__pushes += len(frontier)
+
+    def __frontier(self) -> List[Cell_ID]:
+        """ Get the cells that could still lead to a cheaper path: the open and the inconsistent cells. """
+        cells = {cell_id for key, cell_id in self.__heap if self.__open[cell_id] and self.__keys[cell_id] == key}
+        cells.update(self.__inconsistent_cells)
+        return list(cells)
+
+
+def weighted_a_star(grid: Grid, start: Cell_ID, end: Cell_ID, heuristic: Optional[Heuristic] = None,
+                    stats: Optional[SearchStats] = None, weight: float = DEFAULT_WEIGHT,
+                    seconds: Optional[float] = None, expansions: Optional[int] = None) -> List[Cell_ID]:
+    """ Find a path from start to end that costs at most weight times as much as the shortest path, with Weighted A*
+    (a single iteration of AnytimePlanner). Returns an empty path if there is none, or if the budget of seconds and
+    expansions runs out before one is found (stats then records an infinite bound).
+    """
+    planner = AnytimePlanner(grid, start, end, heuristic, weight, final_weight=weight)
+    return planner.improve(seconds, expansions, stats).path
+
+
+def ara_star(grid: Grid, start: Cell_ID, end: Cell_ID, heuristic: Optional[Heuristic] = None,
+             stats: Optional[SearchStats] = None, weight: float = DEFAULT_WEIGHT,
+             seconds: Optional[float] = DEFAULT_BUDGET_SECONDS, expansions: Optional[int] = None) -> List[Cell_ID]:
+    """ Find the best path from start to end that AnytimePlanner can find within a budget of seconds and expansions,
+    starting from the given weight. The path's suboptimality bound is recorded in stats. Returns an empty path if there
+    is none, or if the budget runs out before one is found.
+    """
+    planner = AnytimePlanner(grid, start, end, heuristic, weight)
+    return planner.improve(seconds, expansions, stats).path
@@ -0,0 +1,127 @@
+import collections
+import itertools
+import os
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+from grid import Grid
+from mapfile import load_map
+from multiprocessing import shared_memory
+from pathfinding import a_star
+from typing import Any, Callable, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+# Type definitions.
+Cell_ID = int
+Query = Tuple[Cell_ID, Cell_ID]
+
+# Number of queries sent to a worker at a time. Larger chunks mean less inter-process overhead but coarser streaming.
+DEFAULT_CHUNK_SIZE = 64
+
+# Number of chunks per worker submitted to the pool but not yet yielded. Enough to keep every worker busy while results
+# are consumed, without reading ahead of the queries.
+CHUNKS_IN_FLIGHT_PER_WORKER = 2
+
+# Grid and shared memory block of a worker process, set up once by _init_worker (or _init_worker_from_file, which leaves
+# the shared memory block unset).
+_worker_grid: Optional[Grid] = None
+_worker_memory: Optional[shared_memory.SharedMemory] = None
+
+
+class QueryResult(NamedTuple):
+    """ Result of one query in a batch.
+
+    Instance Variables:
+        start: Cell ID the path starts at.
+        end: Cell ID the path ends at.
+        path: Shortest path from start to end, or an empty list if there is none.
+        seconds: Wall time spent searching for the path.
+    """
+    start: Cell_ID
+    end: Cell_ID
+    path: List[Cell_ID]
+    seconds: float
+
+
+def solve_many(grid: Grid, queries: Iterable[Query], workers: Optional[int] = None,
+               chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[QueryResult]:
+    """ Find the shortest path for every (start, end) pair in queries, spreading the work across a pool of worker
+    processes (one per core by default). The grid's obstacles (and terrain costs, if it has any) are copied into shared
+    memory once, and every worker searches that block in place. Results are yielded in the same order as the queries as
+    soon as they are ready.
+    """
+    costs = None if grid.uniform else grid.costs
+    num_bytes = len(grid.obstacles)
+    memory = shared_memory.SharedMemory(create=True, size=max(1, num_bytes + (len(costs) if costs is not None else 0)))
+    try:
+        memory.buf[:num_bytes] = grid.obstacles
+        if costs is not None:
+            memory.buf[num_bytes:num_bytes + len(costs)] = costs
+        initargs = (memory.name, grid.width, grid.height, grid.diagonal, costs is not None)
+        yield from _solve(queries, workers, chunk_size, _init_worker, initargs)
+    finally:
+        memory.close()
+        memory.unlink()
+
+
+def solve_many_from_file(path: str, queries: Iterable[Query], workers: Optional[int] = None,
+                         chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[QueryResult]:
+    """ Like solve_many, but for a grid saved as a map file (see mapfile). Every worker memory-maps the file read-only,
+    so the grid is never copied and the workers share the operating system's pages of it.
+    """
+    yield from _solve(queries, workers, chunk_size, _init_worker_from_file, (path,))
+
+
+def _solve(queries: Iterable[Query], workers: Optional[int], chunk_size: int, initializer: Callable[..., None],
+           initargs: Tuple[Any, ...]) -> Iterator[QueryResult]:
+    """ Solve the queries in chunks on a pool of worker processes set up by the initializer. Chunks are read from the
+    queries and submitted only as earlier results are yielded, so the queries are streamed rather than read up front.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = _chunk(queries, chunk_size)
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as executor:
+        pending = collections.deque(executor.submit(_solve_chunk, chunk)
+                                    for chunk in itertools.islice(chunks, CHUNKS_IN_FLIGHT_PER_WORKER * workers))
+        while pending:
+            results = pending.popleft().result()
+            for chunk in itertools.islice(chunks, 1):
+                pending.append(executor.submit(_solve_chunk, chunk))
+            yield from results
+
+
+def _chunk(queries: Iterable[Query], chunk_size: int) -> Iterator[List[Query]]:
+    """ Split the queries into lists of at most chunk_size queries. """
+    iterator = iter(queries)
+    while True:
+        chunk = list(itertools.islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _init_worker(memory_name: str, width: int, height: int, diagonal: bool, has_costs: bool) -> None:
+    """ Attach a worker process to the grid in shared memory: its obstacles, followed by its terrain costs if it has
+    any.
+    """
+    global _worker_grid, _worker_memory
+    _worker_memory = shared_memory.SharedMemory(name=memory_name)
+    num_bytes = (width * height + 7) // 8
+    costs = _worker_memory.buf[num_bytes:num_bytes + width * height] if has_costs else None
+    _worker_grid = Grid(width, height, _worker_memory.buf[:num_bytes], diagonal, costs)
+
+
+def _init_worker_from_file(path: str) -> None:
+    """ Attach a worker process to the grid in a map file. """
+    global _worker_grid
+    _worker_grid = load_map(path, writable=False).grid
+
+
+def _solve_chunk(queries: List[Query]) -> List[QueryResult]:
+    """ Solve a chunk of queries in a worker process. """
+    assert _worker_grid is not None
+
+    results = []
+    for start, end in queries:
+        started = time.perf_counter()
+        path = a_star(_worker_grid, start, end)
+        results.append(QueryResult(start, end, path, time.perf_counter() - started))
+    return results
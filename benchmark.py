@@ -0,0 +1,413 @@
+""" Benchmark suite for the pathfinding algorithms. Generates reproducible maps, runs searches on them headlessly and
+reports wall time, search counts and peak memory as JSON. Results can be compared against an earlier run to catch
+slowdowns.
+
+Example:
+    python benchmark.py --sizes 20 64 256 --output results.json
+    python benchmark.py --sizes 20 64 256 --baseline results.json
+    python benchmark.py --sizes 1024 --same-goal --algorithms a_star distance_field
+    python benchmark.py --startup --baseline results.json
+"""
+import argparse
+import functools
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from anytime import ara_star, weighted_a_star
+from distance_fields import clear_distance_fields, distance_field_search
+from grid import Grid
+from hierarchical import clear_planners, hierarchical_search
+from mapfile import save_map
+from pathfinding import SearchStats, a_star, bidirectional_a_star, clear_search_states, jump_point_search
+from priority_queues import QueueType
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# Type definitions.
+Cell_ID = int
+Query = Tuple[Cell_ID, Cell_ID]
+Result = Dict[str, Any]
+
+DEFAULT_SIZES = [20, 64, 256]
+DEFAULT_QUERIES = 10
+DEFAULT_SEED = 0
+DEFAULT_THRESHOLD = 0.25
+
+# Number of times each case is timed; the median time is reported, so one slow run doesn't look like a regression.
+DEFAULT_REPEATS = 3
+
+# Smallest slowdown, in seconds, that counts as a regression. Cases that take a few milliseconds vary by more than the
+# threshold from run to run, so a relative slowdown alone isn't enough.
+DEFAULT_MIN_DELTA = 0.005
+
+# Number of times each startup case is run; the median time is reported.
+STARTUP_REPEATS = 5
+
+# Width and height of the map the headless startup case solves.
+STARTUP_MAP_SIZE = 256
+
+# Fraction of cells that are obstacles on random maps.
+RANDOM_DENSITY = 0.25
+
+# Width of the rooms (including their walls) on room maps.
+ROOM_SIZE = 16
+
+# Fraction of cells that are rough terrain on terrain maps, and the highest cost of entering one.
+TERRAIN_DENSITY = 0.5
+MAX_TERRAIN_COST = 9
+
+# ARA* runs without a time budget, so its results are reproducible: it measures the total work of improving the path
+# until it is the shortest.
+ALGORITHMS: Dict[str, Callable[..., List[Cell_ID]]] = {
+    'a_star': a_star,
+    'a_star_lazy_heap': functools.partial(a_star, queue=QueueType.LAZY),
+    'a_star_indexed_heap': functools.partial(a_star, queue=QueueType.INDEXED),
+    'a_star_bucket_queue': functools.partial(a_star, queue=QueueType.BUCKET),
+    'jump_point_search': jump_point_search,
+    'bidirectional_a_star': bidirectional_a_star,
+    'hierarchical': hierarchical_search,
+    'distance_field': distance_field_search,
+    'weighted_a_star': weighted_a_star,
+    'ara_star': functools.partial(ara_star, seconds=None),
+}
+
+
+def generate_random_map(size: int, rng: random.Random, density: float = RANDOM_DENSITY) -> Grid:
+    """ Generate a size x size map where each cell is an obstacle with the given probability. """
+    grid = Grid(size, size)
+    obstacles = grid.obstacles
+    for cell_id in range(size * size):
+        if rng.random() < density:
+            obstacles[cell_id >> 3] |= 1 << (cell_id & 7)
+    return grid
+
+
+def generate_maze_map(size: int, rng: random.Random) -> Grid:
+    """ Generate a size x size maze with corridors one cell wide, carved by a randomized depth-first search. Cells with
+    two even coordinates are rooms, and the walls between them are knocked down as the search visits them.
+    """
+    grid = Grid(size, size)
+    obstacles = grid.obstacles
+    obstacles[:] = b'\xff' * len(obstacles)
+
+    def carve(x: int, y: int) -> None:
+        cell_id = x + y * size
+        obstacles[cell_id >> 3] &= ~(1 << (cell_id & 7)) & 0xFF
+
+    carve(0, 0)
+    stack = [(0, 0)]
+    while stack:
+        x, y = stack[-1]
+        unvisited = [(x + dx, y + dy) for dx, dy in ((0, -2), (2, 0), (0, 2), (-2, 0))
+                     if 0 <= x + dx < size and 0 <= y + dy < size and grid.obstacle_exists(x + dx + (y + dy) * size)]
+        if not unvisited:
+            stack.pop()
+            continue
+
+        next_x, next_y = rng.choice(unvisited)
+        carve((x + next_x) // 2, (y + next_y) // 2)
+        carve(next_x, next_y)
+        stack.append((next_x, next_y))
+    return grid
+
+
+def generate_rooms_map(size: int, rng: random.Random, room_size: int = ROOM_SIZE) -> Grid:
+    """ Generate a size x size map split into square rooms by walls, with a door at a random spot in each wall. """
+    grid = Grid(size, size)
+    for wall in range(room_size - 1, size, room_size):
+        for segment in range(0, size, room_size):
+            # Doors can't be where two walls cross, at the end of the segment.
+            length = min(room_size - 1, size - segment)
+            vertical_door = segment + rng.randrange(length)
+            horizontal_door = segment + rng.randrange(length)
+
+            for offset in range(segment, min(segment + room_size, size)):
+                if offset != vertical_door:
+                    grid.set_obstacle(grid.cell_to_cell_id((wall, offset)), True)
+                if offset != horizontal_door:
+                    grid.set_obstacle(grid.cell_to_cell_id((offset, wall)), True)
+    return grid
+
+
+def generate_open_map(size: int, rng: random.Random) -> Grid:
+    """ Generate a size x size map with no obstacles. """
+    return Grid(size, size)
+
+
+def generate_terrain_map(size: int, rng: random.Random, density: float = TERRAIN_DENSITY) -> Grid:
+    """ Generate a size x size map with no obstacles where each cell is rough terrain with the given probability,
+    costing 2 to MAX_TERRAIN_COST to enter.
+    """
+    costs = bytearray(b'\x01' * (size * size))
+    for cell_id in range(size * size):
+        if rng.random() < density:
+            costs[cell_id] = rng.randint(2, MAX_TERRAIN_COST)
+    return Grid(size, size, costs=costs)
+
+
+MAPS: Dict[str, Callable[[int, random.Random], Grid]] = {
+    'random': generate_random_map,
+    'maze': generate_maze_map,
+    'rooms': generate_rooms_map,
+    'open': generate_open_map,
+    'terrain': generate_terrain_map,
+}
+
+
+def generate_queries(grid: Grid, count: int, rng: random.Random, same_goal: bool = False) -> List[Query]:
+    """ Pick count random (start, end) pairs of free cells. With same_goal, every query has the same end. """
+    queries: List[Query] = []
+    while len(queries) < count:
+        start = rng.randrange(grid.get_num_cells())
+        end = queries[0][1] if same_goal and queries else rng.randrange(grid.get_num_cells())
+        if not grid.obstacle_exists(start) and not grid.obstacle_exists(end):
+            queries.append((start, end))
+    return queries
+
+
+def clear_caches() -> None:
+    """ Free everything the searches keep between queries, so each case starts from scratch. """
+    clear_search_states()
+    clear_distance_fields()
+    clear_planners()
+
+
+def time_case(grid: Grid, queries: Sequence[Query], algorithm: str) -> Tuple[float, SearchStats]:
+    """ Run every query on the grid with one algorithm, starting from empty caches, and return the time taken and the
+    work done.
+    """
+    search = ALGORITHMS[algorithm]
+    stats = SearchStats()
+
+    clear_caches()
+    started = time.perf_counter()
+    for start, end in queries:
+        search(grid, start, end, stats=stats)
+    return time.perf_counter() - started, stats
+
+
+def measure_memory_peak(grid: Grid, queries: Sequence[Query], algorithm: str) -> int:
+    """ Run every query on the grid with one algorithm, starting from empty caches, and return the peak memory
+    allocated. This is a separate run from the timed ones, since tracing allocations slows the search down.
+    """
+    search = ALGORITHMS[algorithm]
+
+    clear_caches()
+    tracemalloc.start()
+    for start, end in queries:
+        search(grid, start, end)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def case_result(algorithm: str, queries: Sequence[Query], times: Sequence[float], stats: SearchStats,
+                peak_memory: Optional[int]) -> Result:
+    """ Build the result of a case from its run times, the work done by one run and its peak memory (if measured). """
+    result: Result = {
+        'algorithm': algorithm,
+        'queries': len(queries),
+        'repeats': len(times),
+        'seconds': statistics.median(times),
+    }
+    result.update(stats.as_dict())
+    if peak_memory is not None:
+        result['peak_memory'] = peak_memory
+    return result
+
+
+def run_suite(sizes: Sequence[int], maps: Sequence[str], algorithms: Sequence[str], queries: int = DEFAULT_QUERIES,
+              seed: int = DEFAULT_SEED, measure_memory: bool = True, same_goal: bool = False,
+              repeats: int = DEFAULT_REPEATS) -> List[Result]:
+    """ Run every algorithm on every map at every size. Each map and its queries are generated from the seed, so runs
+    with the same arguments are comparable. With same_goal, every query on a map has the same end.
+
+    Every case is timed repeats times and the median time is reported. Rather than repeating each case back to back,
+    the whole suite is run repeats times over, so a stretch of time when the machine is busy slows down one run of
+    many cases instead of every run of a few.
+    """
+    cases = []
+    for map_name in maps:
+        for size in sizes:
+            rng = random.Random(f'{seed}-{map_name}-{size}')
+            grid = MAPS[map_name](size, rng)
+            case_queries = generate_queries(grid, queries, rng, same_goal)
+
+            for algorithm in algorithms:
+                # Jump point search can't search grids with terrain.
+                if algorithm == 'jump_point_search' and not grid.uniform:
+                    continue
+                cases.append((map_name, size, grid, case_queries, algorithm))
+
+    times: List[List[float]] = [[] for _ in cases]
+    stats: List[SearchStats] = []
+    for repeat in range(repeats):
+        stats = []
+        for (map_name, size, grid, case_queries, algorithm), case_times in zip(cases, times):
+            seconds, case_stats = time_case(grid, case_queries, algorithm)
+            case_times.append(seconds)
+            stats.append(case_stats)
+            print(f"{map_name:>8} {size:>5}x{size:<5} {algorithm:>22}: {seconds:9.4f}s "
+                  f"{case_stats.expanded:>10} expanded (run {repeat + 1} of {repeats})", file=sys.stderr)
+
+    results = []
+    for (map_name, size, grid, case_queries, algorithm), case_times, case_stats in zip(cases, times, stats):
+        result = {'map': map_name, 'size': size}
+        result.update(case_result(algorithm, case_queries, case_times, case_stats,
+                                  measure_memory_peak(grid, case_queries, algorithm) if measure_memory else None))
+        results.append(result)
+    return results
+
+
+def run_startup(repeats: int = STARTUP_REPEATS, size: int = STARTUP_MAP_SIZE,
+                seed: int = DEFAULT_SEED) -> List[Result]:
+    """ Time how long a fresh interpreter takes to start the program, as the median of several runs: starting Python
+    alone (the floor the other cases can't go below), solving a generated map with start.py --headless, and importing
+    the window. The headless case also reports whether it imported tkinter, which it should never need.
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+
+    with tempfile.TemporaryDirectory() as temporary:
+        # An open map with its start and end in opposite corners.
+        map_path = os.path.join(temporary, 'startup.bin')
+        grid = generate_open_map(size, random.Random(f'{seed}-startup-{size}'))
+        save_map(map_path, grid, 0, grid.get_num_cells() - 1)
+
+        cases = {
+            'python': ['-c', 'pass'],
+            'headless': ['start.py', '--headless', map_path],
+            'import_window': ['-c', 'import window'],
+        }
+
+        results = []
+        for case, arguments in cases.items():
+            times = []
+            for _ in range(repeats):
+                started = time.perf_counter()
+                subprocess.run([sys.executable, *arguments], cwd=directory, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL)
+                times.append(time.perf_counter() - started)
+
+            result: Result = {'case': case, 'runs': repeats, 'seconds': statistics.median(times)}
+            if case == 'headless':
+                # -X importtime lists every module imported on standard error, one per line ending in its name.
+                completed = subprocess.run([sys.executable, '-X', 'importtime', *arguments], cwd=directory,
+                                           stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+                imported = {line.rsplit('|', 1)[-1].strip() for line in completed.stderr.splitlines()}
+                result['imports_tkinter'] = 'tkinter' in imported
+            results.append(result)
+            print(f"startup {case:>22}: {result['seconds']:9.4f}s", file=sys.stderr)
+    return results
+
+
+def is_slower(seconds: float, baseline_seconds: float, threshold: float = DEFAULT_THRESHOLD,
+              min_delta: float = DEFAULT_MIN_DELTA) -> bool:
+    """ Return whether a time is slower than the baseline's by more than the threshold (a fraction of the baseline
+    time) and by more than min_delta seconds.
+    """
+    return seconds > baseline_seconds * (1 + threshold) and seconds - baseline_seconds > min_delta
+
+
+def compare(results: List[Result], baseline: List[Result], threshold: float = DEFAULT_THRESHOLD,
+            min_delta: float = DEFAULT_MIN_DELTA) -> List[str]:
+    """ Compare results against a baseline run, and describe every case that got slower (see is_slower) or expanded
+    more cells.
+    """
+    baseline_cases = {(result['map'], result['size'], result['algorithm']): result for result in baseline}
+
+    regressions = []
+    for result in results:
+        old = baseline_cases.get((result['map'], result['size'], result['algorithm']))
+        if old is None:
+            continue
+
+        case = f"{result['map']} {result['size']}x{result['size']} {result['algorithm']}"
+        if is_slower(result['seconds'], old['seconds'], threshold, min_delta):
+            regressions.append(f"{case}: {old['seconds']:.4f}s -> {result['seconds']:.4f}s")
+        if result['expanded'] > old['expanded']:
+            regressions.append(f"{case}: {old['expanded']} -> {result['expanded']} cells expanded")
+    return regressions
+
+
+def compare_startup(results: List[Result], baseline: List[Result], threshold: float = DEFAULT_THRESHOLD,
+                    min_delta: float = DEFAULT_MIN_DELTA) -> List[str]:
+    """ Compare startup results against a baseline run, and describe every case that got slower (see is_slower), and
+    any headless run that imported tkinter.
+    """
+    baseline_cases = {result['case']: result for result in baseline}
+
+    regressions = []
+    for result in results:
+        if result.get('imports_tkinter'):
+            regressions.append(f"startup {result['case']}: imports tkinter")
+
+        old = baseline_cases.get(result['case'])
+        if old is not None and is_slower(result['seconds'], old['seconds'], threshold, min_delta):
+            regressions.append(f"startup {result['case']}: {old['seconds']:.4f}s -> {result['seconds']:.4f}s")
+    return regressions
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """ Entry point of the benchmark suite. Returns 1 if there are regressions against the baseline. """
+    parser = argparse.ArgumentParser(description="Benchmark the pathfinding algorithms on generated maps.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="map widths/heights in cells (e.g. 20 64 256 1024 4096)")
+    parser.add_argument('--maps', nargs='+', choices=list(MAPS), default=list(MAPS))
+    parser.add_argument('--algorithms', nargs='+', choices=list(ALGORITHMS), default=list(ALGORITHMS))
+    parser.add_argument('--queries', type=int, default=DEFAULT_QUERIES, help="queries per map")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--same-goal', action='store_true', help="give every query on a map the same end")
+    parser.add_argument('--no-memory', action='store_true', help="skip the peak memory measurement")
+    parser.add_argument('--startup', action='store_true',
+                        help="also time how long a fresh interpreter takes to start the program")
+    parser.add_argument('--output', help="file to write the results to (default: standard output)")
+    parser.add_argument('--baseline', help="results of an earlier run to compare against")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="fraction of the baseline time a case may slow down by before it counts as a regression")
+    parser.add_argument('--min-delta', type=float, default=DEFAULT_MIN_DELTA,
+                        help="seconds a case must slow down by, as well as the threshold, to count as a regression")
+    parser.add_argument('--repeats', type=int, default=DEFAULT_REPEATS,
+                        help="times each case is timed; the median is reported")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.sizes, args.maps, args.algorithms, args.queries, args.seed, not args.no_memory,
+                        args.same_goal, args.repeats)
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': args.seed,
+        'same_goal': args.same_goal,
+        'results': results,
+    }
+    if args.startup:
+        report['startup'] = run_startup(seed=args.seed)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline['results'], args.threshold, args.min_delta)
+        if args.startup:
+            regressions += compare_startup(report['startup'], baseline.get('startup', []), args.threshold,
+                                           args.min_delta)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
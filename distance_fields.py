@@ -0,0 +1,274 @@
+import heapq
+import math
+
+from array import array
+from grid import Grid
+from heuristics import Heuristic
+from lru import LRUCache
+from optional_numpy import get_numpy
+from pathfinding import ADJACENT_COST, SearchStats, move_cost
+from typing import List, Optional, Tuple
+
+# Type definitions.
+Cell_ID = int
+Field_Key = Tuple[int, Cell_ID]
+
+# Distance of cells that can't reach the goal.
+UNREACHABLE = math.inf
+
+# Most fields a cache keeps, and the most memory (in bytes) they may take together. Fields hold 8 bytes per cell, so on
+# a 4096x4096 grid the memory limit is reached by two fields, while small grids keep the full count.
+DEFAULT_CAPACITY = 8
+DEFAULT_MAX_BYTES = 256 * 2 ** 20
+
+# Wavefronts narrower than this are expanded one cell at a time, since a vectorized step has a fixed cost that only
+# pays off on wide fronts (e.g. not in the corridors of a maze).
+VECTORIZE_THRESHOLD = 32
+
+
+class DistanceFieldCache:
+    """ Bounded least-recently-used cache of distance fields, keyed on the grid version and the goal. Once a goal's
+    field is cached, the shortest path to it from any start is found by descending the field, without searching.
+
+    The cache is bounded both by the number of fields and by the memory they take, since a field's size grows with its
+    grid. The most recently used field is always kept, even if it alone takes more than max_bytes.
+
+    Instance Variables:
+        capacity: Maximum number of fields held in the cache.
+        max_bytes: Maximum memory the cached fields may take together, in bytes.
+        hits: Number of lookups answered from the cache.
+        misses: Number of lookups that required a field to be calculated.
+        __fields: Cached fields.
+        __bytes: Memory taken by the cached fields, in bytes.
+    """
+    capacity: int
+    max_bytes: int
+    hits: int
+    misses: int
+    __fields: LRUCache[Field_Key, array]
+    __bytes: int
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.capacity = capacity
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.__fields = LRUCache(capacity, self.__forget)
+        self.__bytes = 0
+
+    def __len__(self) -> int:
+        return len(self.__fields)
+
+    def get_field(self, grid: Grid, goal: Cell_ID, stats: Optional[SearchStats] = None) -> array:
+        """ Return the distance field to the goal, only calculating it if it isn't cached. If stats is given, the
+        calculation is counted in it. The field is shared with the cache, so it must not be modified.
+        """
+        key = (grid.version, goal)
+        field = self.__fields.get(key)
+        if field is not None:
+            self.hits += 1
+            return field
+
+        self.misses += 1
+        field = distance_field(grid, goal, stats)
+        self.__fields.put(key, field)
+        self.__bytes += field.itemsize * len(field)
+
+        # Evict the least recently used fields until the rest fit in the memory limit.
+        while self.__bytes > self.max_bytes and len(self.__fields) > 1:
+            self.__fields.remove(next(iter(self.__fields.items()))[0])
+        return field
+
+    def find_path(self, grid: Grid, start: Cell_ID, end: Cell_ID,
+                  stats: Optional[SearchStats] = None) -> List[Cell_ID]:
+        """ Return the shortest path from start to end by descending the distance field to end. """
+        path = descend(grid, self.get_field(grid, end, stats), start)
+        if stats is not None:
+            stats.path_length += len(path)
+        return path
+
+    def clear(self) -> None:
+        """ Remove every field from the cache. """
+        self.__fields.clear()
+
+    def __forget(self, field: array) -> None:
+        """ Stop counting the memory of a field that was evicted or cleared from the cache. """
+        self.__bytes -= field.itemsize * len(field)
+
+
+# Cache used by distance_field_search.
+_fields = DistanceFieldCache()
+
+
+def distance_field(grid: Grid, goal: Cell_ID, stats: Optional[SearchStats] = None) -> array:
+    """ Calculate the cost of the shortest path from every cell to the goal in one pass, indexed by Cell ID. Cells that
+    can't reach the goal (including every cell, if the goal is an obstacle) are UNREACHABLE.
+
+    On 4-connected grids without terrain, every move costs the same, so the field is a breadth-first wavefront spreading
+    out from the goal; with NumPy, each wide step of the wavefront is expanded in a single vectorized pass. Other grids
+    are searched with Dijkstra's algorithm from the goal.
+    """
+    field = array('d', [UNREACHABLE]) * grid.get_num_cells()
+    field[goal] = 0
+    if grid.obstacle_exists(goal):
+        return field
+
+    if not grid.diagonal and grid.uniform:
+        expanded, pushes = _wavefront(grid, goal, field)
+    else:
+        expanded, pushes = _dijkstra(grid, goal, field)
+
+    if stats is not None:
+        stats.expanded += expanded
+        stats.pushes += pushes
+    return field
+
+
+def descend(grid: Grid, field: array, start: Cell_ID) -> List[Cell_ID]:
+    """ Follow a distance field downhill from start to its goal, returning the path taken (empty if the goal can't be
+    reached from start or start is the goal). At each cell, the next cell is the neighbour whose distance plus the cost
+    of moving to it is lowest, which is a shortest path.
+    """
+    if field[start] == 0:
+        return []
+
+    diagonal = grid.diagonal
+    width = grid.width
+    costs = None if grid.uniform else grid.costs
+
+    path = [start]
+    current_id = start
+    while field[current_id] != 0:
+        best_id = current_id
+        best_distance = UNREACHABLE
+        for neighbour_id in grid.get_neighbours(current_id):
+            distance = move_cost(diagonal, width, costs, current_id, neighbour_id) + field[neighbour_id]
+            if distance < best_distance:
+                best_id = neighbour_id
+                best_distance = distance
+
+        # The start can't reach the goal.
+        if best_distance == UNREACHABLE:
+            return []
+
+        path.append(best_id)
+        current_id = best_id
+    return path
+
+
+def distance_field_search(grid: Grid, start: Cell_ID, end: Cell_ID, heuristic: Optional[Heuristic] = None,
+                          stats: Optional[SearchStats] = None) -> List[Cell_ID]:
+    """ Find the shortest path from start to end with DistanceFieldCache, so searches that share an end only calculate
+    its field once. The heuristic is unused, since fields are calculated outward from the end without one.
+    """
+    return _fields.find_path(grid, start, end, stats)
+
+
+def get_distance_field(grid: Grid, goal: Cell_ID, stats: Optional[SearchStats] = None) -> array:
+    """ Get the distance field to the goal from the cache used by distance_field_search, calculating it if needed. """
+    return _fields.get_field(grid, goal, stats)
+
+
+def clear_distance_fields() -> None:
+    """ Free every field cached by distance_field_search. """
+    _fields.clear()
+
+
+def heatmap(field: array, shades: int) -> bytes:
+    """ Quantize a distance field into one byte per cell: 0 where the goal can't be reached, and 1 (at the goal) up to
+    shades (at the furthest reachable cells) elsewhere, spread evenly over the distances.
+    """
+    numpy = get_numpy()
+    if numpy is not None:
+        distances = numpy.frombuffer(field, dtype=numpy.float64)
+        reachable = distances != UNREACHABLE
+        furthest = distances[reachable].max(initial=0)
+        scale = (shades - 1) / furthest if furthest else 0
+        values = numpy.zeros(len(distances), dtype=numpy.uint8)
+        values[reachable] = 1 + (distances[reachable] * scale).astype(numpy.uint8)
+        return values.tobytes()
+
+    furthest = max((distance for distance in field if distance != UNREACHABLE), default=0)
+    scale = (shades - 1) / furthest if furthest else 0
+    return bytes(1 + int(distance * scale) if distance != UNREACHABLE else 0 for distance in field)
+
+
+def _wavefront(grid: Grid, goal: Cell_ID, field: array) -> Tuple[int, int]:
+    """ Fill in the field of a 4-connected grid without terrain one step of the wavefront from the goal at a time.
+    Returns the number of cells expanded and the number added to the wavefront, which are both the number of cells
+    reached.
+    """
+    num_cells = grid.get_num_cells()
+    width = grid.width
+
+    # Obstacles start out reached, so the wavefront never enters them.
+    reached = bytearray(grid.get_obstacle_mask())
+    reached[goal] = 1
+    frontier: List[Cell_ID] = [goal]
+    expanded = 0
+
+    # NumPy is optional; without it, every step is expanded one cell at a time.
+    numpy = get_numpy()
+    if numpy is not None:
+        # Views of the same memory, for the vectorized steps.
+        reached_cells = numpy.frombuffer(reached, dtype=numpy.bool_)
+        distances = numpy.frombuffer(field, dtype=numpy.float64)
+
+    distance = 0
+    while len(frontier):
+        distance += ADJACENT_COST
+        expanded += len(frontier)
+
+        if numpy is None or len(frontier) < VECTORIZE_THRESHOLD:
+            # Reached covers obstacles, so only the edges of the grid need checking.
+            next_frontier = []
+            for cell_id in frontier:
+                column = cell_id % width
+                for neighbour_id, on_grid in ((cell_id - width, cell_id >= width), (cell_id + 1, column < width - 1),
+                                              (cell_id + width, cell_id < num_cells - width),
+                                              (cell_id - 1, column > 0)):
+                    if on_grid and not reached[neighbour_id]:
+                        reached[neighbour_id] = 1
+                        field[neighbour_id] = distance
+                        next_frontier.append(neighbour_id)
+            frontier = next_frontier
+            continue
+
+        # Step every cell of the frontier in each direction at once, keeping moves that stay on the grid (and in the
+        # same row, for east and west).
+        cells = numpy.asarray(frontier)
+        columns = cells % width
+        neighbours = numpy.concatenate((cells[cells >= width] - width, cells[columns < width - 1] + 1,
+                                        cells[cells < num_cells - width] + width, cells[columns > 0] - 1))
+        neighbours = numpy.unique(neighbours[~reached_cells[neighbours]])
+        reached_cells[neighbours] = True
+        distances[neighbours] = distance
+        frontier = neighbours
+    return expanded, expanded
+
+
+def _dijkstra(grid: Grid, goal: Cell_ID, field: array) -> Tuple[int, int]:
+    """ Fill in the field with Dijkstra's algorithm from the goal, and return the number of cells expanded and the
+    number of entries pushed onto the heap. Moves are followed backwards, so moving from a neighbour to a cell costs the
+    cell's terrain cost.
+    """
+    diagonal = grid.diagonal
+    width = grid.width
+    costs = None if grid.uniform else grid.costs
+    heap = [(0.0, goal)]
+    expanded = 0
+    pushes = 1
+
+    while heap:
+        distance, current_id = heapq.heappop(heap)
+        if distance != field[current_id]:
+            continue
+
+        expanded += 1
+        for neighbour_id in grid.get_neighbours(current_id):
+            new_distance = distance + move_cost(diagonal, width, costs, neighbour_id, current_id)
+            if new_distance < field[neighbour_id]:
+                field[neighbour_id] = new_distance
+                heapq.heappush(heap, (new_distance, neighbour_id))
+                pushes += 1
+    return expanded, pushes
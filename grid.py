@@ -0,0 +1,322 @@
+import itertools
+
+from array import array
+from typing import Callable, List, Optional, Sequence, Tuple, Union
+
+# Type definitions.
+Coordinate = Tuple[int, int]
+Cell_ID = int
+Buffer = Union[bytearray, memoryview]
+Observer = Callable[[Optional[Cell_ID]], None]
+
+# Maximum number of neighbours a cell can have when moving N,E,S,W (4-connected) and when diagonal moves are also
+# allowed (8-connected). This is the width of each row in the adjacency index.
+MAX_NEIGHBOURS = 4
+MAX_NEIGHBOURS_DIAGONAL = 8
+
+# Degree that marks a row of the adjacency index as out of date.
+STALE_ROW = 0xFF
+
+# The adjacency index is split into blocks of 2 ** BLOCK_SHIFT cells, each allocated the first time a row in it is
+# built, so a search that only visits part of a huge grid only pays for the blocks it visits.
+BLOCK_SHIFT = 10
+BLOCK_CELLS = 1 << BLOCK_SHIFT
+BLOCK_MASK = BLOCK_CELLS - 1
+
+# Cost of entering a cell on a grid without terrain, and the highest cost a cell can have.
+DEFAULT_COST = 1
+MAX_COST = 0xFF
+
+# Source of grid versions. Versions are unique across all grids, so a version identifies both a grid and its contents.
+_versions = itertools.count()
+
+
+class Grid:
+    """ Headless model of the grid that the pathfinding algorithms run on. It holds no tkinter state, so searches can
+    run without a window (e.g. on display-less batch workers).
+
+    Instance Variables:
+        width: Number of cells in each row of the grid.
+        height: Number of cells in each column of the grid.
+        __diagonal: Whether diagonal moves are allowed. A diagonal move may not cut the corner of an obstacle, i.e. both
+            cells it passes between must be free.
+        __obstacles: Packed bitset of obstacles; bit (cell_id % 8) of byte (cell_id // 8) is set if the cell is an
+            obstacle. Any writable buffer works, which lets the grid live in shared or memory-mapped memory.
+        __adjacency: Neighbour index in compressed sparse row form with a fixed row width of __row_width, split into
+            blocks of BLOCK_CELLS cells; the neighbours of a cell are
+            __adjacency[cell_id >> BLOCK_SHIFT][(cell_id & BLOCK_MASK) * __row_width:][:__degrees[cell_id]]. Each
+            block is None until a row in it is built.
+        __degrees: Number of neighbours in each row of the adjacency index, or STALE_ROW if the row must be rebuilt.
+            Rows are built when first read and marked stale when an obstacle next to them changes, so an edit only
+            costs as much as the rows it touches. Allocated on the first neighbour lookup.
+        __costs: Cost of entering each cell (one unsigned byte per cell, indexed by Cell ID), which multiplies the cost
+            of every move into the cell. None until a cell is given a cost other than DEFAULT_COST, so grids without
+            terrain take no extra memory. Like the obstacles, any writable buffer works.
+        __min_cost: Lowest cost of any cell, or None if it must be recalculated. Heuristics are scaled by it so they
+            stay admissible.
+        __uniform: Whether every cell costs DEFAULT_COST to enter, or None if it must be recalculated. Searches use
+            their faster uniform-cost code when it is set.
+        __version: Number that changes every time an obstacle is placed or removed, a cell's cost changes or the
+            movement model changes. Caches of search results are keyed on it.
+        __observers: Functions called after the grid changes, with the Cell ID that changed, or None if the whole grid
+            may have changed. Planners that keep search state between queries use this to repair it.
+    """
+    width: int
+    height: int
+
+    def __init__(self, width: int, height: int, obstacles: Optional[Buffer] = None, diagonal: bool = False,
+                 costs: Optional[Buffer] = None) -> None:
+        self.width = width
+        self.height = height
+        self.__diagonal = diagonal
+        self.__row_width = MAX_NEIGHBOURS_DIAGONAL if diagonal else MAX_NEIGHBOURS
+
+        num_bytes = (width * height + 7) // 8
+        if obstacles is None:
+            obstacles = bytearray(num_bytes)
+        assert len(obstacles) >= num_bytes
+        self.__obstacles = obstacles
+        assert costs is None or len(costs) == width * height
+        self.__costs = costs
+        self.__min_cost: Optional[int] = None if costs is not None else DEFAULT_COST
+        self.__uniform: Optional[bool] = None if costs is not None else True
+        self.__adjacency: List[Optional[array]] = []
+        self.__degrees: Optional[bytearray] = None
+        self.__version = next(_versions)
+        self.__observers: List[Observer] = []
+
+    @property
+    def obstacles(self) -> Buffer:
+        return self.__obstacles
+
+    @property
+    def costs(self) -> Optional[Buffer]:
+        """ Cost of entering each cell, or None if no cell has ever had a cost other than DEFAULT_COST. """
+        return self.__costs
+
+    @property
+    def min_cost(self) -> int:
+        """ Lowest cost of entering any cell. """
+        if self.__min_cost is None:
+            costs = self.__searchable_costs()
+            self.__min_cost = next(cost for cost in range(MAX_COST + 1) if costs.find(bytes([cost])) != -1)
+        return self.__min_cost
+
+    @property
+    def uniform(self) -> bool:
+        """ Whether every cell costs DEFAULT_COST to enter. """
+        if self.__uniform is None:
+            self.__uniform = self.__searchable_costs().count(bytes([DEFAULT_COST])) == self.get_num_cells()
+        return self.__uniform
+
+    @property
+    def version(self) -> int:
+        return self.__version
+
+    @property
+    def diagonal(self) -> bool:
+        return self.__diagonal
+
+    @diagonal.setter
+    def diagonal(self, diagonal: bool) -> None:
+        """ Switch between 4-connected and 8-connected movement. Every row of the adjacency index is rebuilt. """
+        if diagonal == self.__diagonal:
+            return
+
+        self.__diagonal = diagonal
+        self.__row_width = MAX_NEIGHBOURS_DIAGONAL if diagonal else MAX_NEIGHBOURS
+        self.__clear_adjacency()
+        self.__version = next(_versions)
+        self.__notify(None)
+
+    def add_observer(self, observer: Observer) -> None:
+        """ Call observer every time the grid changes. """
+        self.__observers.append(observer)
+
+    def remove_observer(self, observer: Observer) -> None:
+        """ Stop calling an observer added with add_observer. """
+        self.__observers.remove(observer)
+
+    def get_num_cells(self) -> int:
+        """ Get the number of cells on the grid. """
+        return self.width * self.height
+
+    def cell_to_cell_id(self, cell_coords: Coordinate) -> Cell_ID:
+        """ Convert's a cell's position on the grid to its cell ID. As with Window.cell_to_cell_id, it is up to the
+        caller to check that the coordinate is in bounds.
+        """
+        return cell_coords[0] + cell_coords[1] * self.width
+
+    def cell_id_to_cell(self, cell_id: Cell_ID) -> Coordinate:
+        """ Convert's a cell ID to its position on the grid. """
+        return (cell_id % self.width, cell_id // self.width)
+
+    def out_of_bounds(self, cell_coords: Coordinate) -> bool:
+        """ Return whether the coordinates of a cell are outside the bounds of the grid. """
+        return not (0 <= cell_coords[0] < self.width and 0 <= cell_coords[1] < self.height)
+
+    def obstacle_exists(self, cell_id: Cell_ID) -> bool:
+        """ Return if an obstacle exists in the specified cell. """
+        return bool(self.__obstacles[cell_id >> 3] & (1 << (cell_id & 7)))
+
+    def set_obstacle(self, cell_id: Cell_ID, obstacle: bool) -> None:
+        """ Place (obstacle=True) or remove (obstacle=False) an obstacle in the specified cell. """
+        if obstacle == self.obstacle_exists(cell_id):
+            return
+
+        self.__version = next(_versions)
+        if obstacle:
+            self.__obstacles[cell_id >> 3] |= 1 << (cell_id & 7)
+        else:
+            self.__obstacles[cell_id >> 3] &= ~(1 << (cell_id & 7)) & 0xFF
+
+        # Only the cell itself and the cells around it can gain or lose a neighbour (diagonal moves between two cells
+        # around it depend on it too, but those cells are in the same 3x3 block).
+        if self.__degrees is not None:
+            self.__degrees[cell_id] = STALE_ROW
+            for neighbour_id in self.get_cells_around(cell_id):
+                self.__degrees[neighbour_id] = STALE_ROW
+
+        self.__notify(cell_id)
+
+    def get_cost(self, cell_id: Cell_ID) -> int:
+        """ Get the cost of entering a cell. """
+        return self.__costs[cell_id] if self.__costs is not None else DEFAULT_COST
+
+    def set_cost(self, cell_id: Cell_ID, cost: int) -> None:
+        """ Set the cost of entering a cell, from DEFAULT_COST up to MAX_COST. Every move into the cell costs this many
+        times as much as it would on a grid without terrain.
+        """
+        assert DEFAULT_COST <= cost <= MAX_COST
+        old_cost = self.get_cost(cell_id)
+        if cost == old_cost:
+            return
+
+        if self.__costs is None:
+            self.__costs = bytearray([DEFAULT_COST]) * self.get_num_cells()
+        self.__costs[cell_id] = cost
+        self.__version = next(_versions)
+
+        # Keep the cost summaries when the change can't affect them, and recalculate them when next needed otherwise.
+        if self.__min_cost is not None and cost < self.__min_cost:
+            self.__min_cost = cost
+        elif old_cost == self.__min_cost:
+            self.__min_cost = None
+        self.__uniform = False if cost != DEFAULT_COST else None
+
+        self.__notify(cell_id)
+
+    def clear(self) -> None:
+        """ Remove every obstacle and all terrain from the grid. """
+        self.__obstacles[:] = bytes(len(self.__obstacles))
+        self.__costs = None
+        self.__min_cost = DEFAULT_COST
+        self.__uniform = True
+        self.__version = next(_versions)
+        self.__clear_adjacency()
+        self.__notify(None)
+
+    def get_obstacle_mask(self) -> bytes:
+        """ Get the obstacles unpacked to one byte per cell, indexed by Cell ID: 1 if the cell is an obstacle and 0 if
+        it is free. Each bit position is unpacked across the whole grid at once, so this is fast even on huge grids.
+        """
+        num_cells = self.get_num_cells()
+        num_bytes = (num_cells + 7) // 8
+        packed = int.from_bytes(self.__obstacles[:num_bytes], 'little')
+        ones = int.from_bytes(b'\x01' * num_bytes, 'little')
+
+        mask = bytearray(num_bytes * 8)
+        for bit in range(8):
+            mask[bit::8] = ((packed >> bit) & ones).to_bytes(num_bytes, 'little')
+        return bytes(mask[:num_cells])
+
+    def get_neighbours(self, cell_id: Cell_ID) -> Sequence[Cell_ID]:
+        """ Get surrounding cells (N,E,S,W, then NE,SE,SW,NW if diagonal moves are allowed) that can be moved to. This
+        reads the cell's row of the adjacency index, building it first if it is out of date.
+        """
+        if self.__degrees is None:
+            self.__clear_adjacency()
+            self.__degrees = bytearray([STALE_ROW]) * self.get_num_cells()
+
+        degree = self.__degrees[cell_id]
+        if degree == STALE_ROW:
+            degree = self.__build_row(cell_id)
+
+        row_start = (cell_id & BLOCK_MASK) * self.__row_width
+        return self.__adjacency[cell_id >> BLOCK_SHIFT][row_start:row_start + degree]
+
+    def __clear_adjacency(self) -> None:
+        """ Free the adjacency index. It is allocated again, one block at a time, as neighbours are looked up. """
+        self.__adjacency = [None] * ((self.get_num_cells() + BLOCK_CELLS - 1) >> BLOCK_SHIFT)
+        self.__degrees = None
+
+    def __build_row(self, cell_id: Cell_ID) -> int:
+        """ Rebuild a cell's row of the adjacency index and return its degree, allocating its block if needed. """
+        assert self.__degrees is not None
+        adjacency = self.__adjacency[cell_id >> BLOCK_SHIFT]
+        if adjacency is None:
+            adjacency = self.__adjacency[cell_id >> BLOCK_SHIFT] = array('i', [0]) * (BLOCK_CELLS * self.__row_width)
+        row_start = (cell_id & BLOCK_MASK) * self.__row_width
+        x, y = self.cell_id_to_cell(cell_id)
+
+        degree = 0
+        for neighbour_id in self.get_cells_around(cell_id):
+            if self.obstacle_exists(neighbour_id):
+                continue
+
+            # Diagonal moves can't squeeze between two obstacles or cut the corner of one.
+            neighbour_x, neighbour_y = self.cell_id_to_cell(neighbour_id)
+            if neighbour_x != x and neighbour_y != y and \
+               (self.obstacle_exists(self.cell_to_cell_id((neighbour_x, y))) or
+                    self.obstacle_exists(self.cell_to_cell_id((x, neighbour_y)))):
+                continue
+
+            adjacency[row_start + degree] = neighbour_id
+            degree += 1
+
+        self.__degrees[cell_id] = degree
+        return degree
+
+    def get_cells_around(self, cell_id: Cell_ID) -> List[Cell_ID]:
+        """ Get the in-bounds cells surrounding a cell (N,E,S,W, then NE,SE,SW,NW if diagonal moves are allowed),
+        whether or not they are obstacles.
+        """
+        x, y = self.cell_id_to_cell(cell_id)
+        north = y > 0
+        east = x < self.width - 1
+        south = y < self.height - 1
+        west = x > 0
+
+        cells = []
+        if north:
+            cells.append(cell_id - self.width)
+        if east:
+            cells.append(cell_id + 1)
+        if south:
+            cells.append(cell_id + self.width)
+        if west:
+            cells.append(cell_id - 1)
+
+        if self.__diagonal:
+            if north and east:
+                cells.append(cell_id - self.width + 1)
+            if south and east:
+                cells.append(cell_id + self.width + 1)
+            if south and west:
+                cells.append(cell_id + self.width - 1)
+            if north and west:
+                cells.append(cell_id - self.width - 1)
+        return cells
+
+    def __searchable_costs(self) -> Union[bytes, bytearray]:
+        """ Get the costs as a buffer that can be searched with find and count. """
+        if self.__costs is None:
+            return bytes([DEFAULT_COST]) * self.get_num_cells()
+        if isinstance(self.__costs, bytearray):
+            return self.__costs
+        return bytes(self.__costs)
+
+    def __notify(self, cell_id: Optional[Cell_ID]) -> None:
+        """ Tell every observer that the grid changed. """
+        for observer in list(self.__observers):
+            observer(cell_id)
@@ -0,0 +1,110 @@
+import functools
+import math
+
+from array import array
+from enum import Enum
+from grid import Grid
+from optional_numpy import get_numpy
+from typing import Callable, Optional
+
+# Type definitions.
+Cell_ID = int
+Estimator = Callable[[Cell_ID], float]
+
+# Extra cost of a diagonal move over an adjacent one (sqrt(2) - 1 for unit adjacent cost).
+DIAGONAL_EXTRA = math.sqrt(2) - 1
+
+
+class Heuristic(Enum):
+    """ This class defines the heuristics that can estimate the cost from a cell to the end.
+
+    Manhattan is exact on an empty 4-connected grid and octile is exact on an empty 8-connected grid; both are the
+    tightest admissible choice for their movement model. Manhattan overestimates diagonal moves, so using it on an
+    8-connected grid may give paths that aren't the shortest. Euclidean is admissible for both but looser, and zero
+    turns A* into Dijkstra's algorithm.
+    """
+    MANHATTAN = 'Manhattan'
+    OCTILE = 'Octile'
+    EUCLIDEAN = 'Euclidean'
+    ZERO = 'Zero (Dijkstra)'
+
+
+def default_heuristic(grid: Grid) -> Heuristic:
+    """ Get the tightest admissible heuristic for the grid's movement model. """
+    return Heuristic.OCTILE if grid.diagonal else Heuristic.MANHATTAN
+
+
+def distance(heuristic: Heuristic, dx: int, dy: int) -> float:
+    """ Calculate the heuristic for two cells that are dx columns and dy rows apart. """
+    dx = abs(dx)
+    dy = abs(dy)
+    if heuristic is Heuristic.MANHATTAN:
+        return dx + dy
+    if heuristic is Heuristic.OCTILE:
+        return max(dx, dy) + DIAGONAL_EXTRA * min(dx, dy)
+    if heuristic is Heuristic.EUCLIDEAN:
+        return math.hypot(dx, dy)
+    return 0
+
+
+def estimator(grid: Grid, goal: Cell_ID, heuristic: Optional[Heuristic] = None,
+              precompute: bool = False) -> Estimator:
+    """ Get a function that estimates the cost from any cell to the goal. With precompute, the estimate for every cell
+    is calculated up front (see heuristic_table) and the function is a plain array lookup.
+
+    On grids with terrain, the estimate is scaled by the lowest cost of entering a cell: every move costs at least that
+    many times its cost on a grid without terrain, so the scaled heuristic is still admissible.
+    """
+    if heuristic is None:
+        heuristic = default_heuristic(grid)
+
+    unscaled = _unscaled_estimator(grid, goal, heuristic, precompute)
+    scale = grid.min_cost
+    if scale != 1:
+        return lambda cell_id: scale * unscaled(cell_id)
+    return unscaled
+
+
+def _unscaled_estimator(grid: Grid, goal: Cell_ID, heuristic: Heuristic, precompute: bool) -> Estimator:
+    """ Get a function that estimates the cost from any cell to the goal on a grid without terrain. """
+    if precompute:
+        return heuristic_table(grid.width, grid.height, goal, heuristic).__getitem__
+
+    width = grid.width
+    goal_x, goal_y = grid.cell_id_to_cell(goal)
+
+    if heuristic is Heuristic.MANHATTAN:
+        return lambda cell_id: abs(cell_id % width - goal_x) + abs(cell_id // width - goal_y)
+    if heuristic is Heuristic.ZERO:
+        return lambda cell_id: 0
+    return lambda cell_id: distance(heuristic, cell_id % width - goal_x, cell_id // width - goal_y)
+
+
+@functools.lru_cache(maxsize=4)
+def heuristic_table(width: int, height: int, goal: Cell_ID, heuristic: Heuristic) -> array:
+    """ Calculate the heuristic from every cell of a width x height grid to the goal, indexed by Cell ID. This is done
+    in a single vectorized pass when NumPy is installed. Tables are cached, so they must not be modified.
+    """
+    goal_x = goal % width
+    goal_y = goal // width
+
+    # NumPy is optional; without it, tables are calculated in pure Python.
+    numpy = get_numpy()
+    table = array('d')
+    if numpy is not None:
+        dx = numpy.abs(numpy.arange(width, dtype=numpy.float64) - goal_x)[numpy.newaxis, :]
+        dy = numpy.abs(numpy.arange(height, dtype=numpy.float64) - goal_y)[:, numpy.newaxis]
+        if heuristic is Heuristic.MANHATTAN:
+            values = dx + dy
+        elif heuristic is Heuristic.OCTILE:
+            values = numpy.maximum(dx, dy) + DIAGONAL_EXTRA * numpy.minimum(dx, dy)
+        elif heuristic is Heuristic.EUCLIDEAN:
+            values = numpy.hypot(dx, dy)
+        else:
+            values = numpy.zeros((height, width))
+        table.frombytes(values.tobytes())
+        return table
+
+    for y in range(height):
+        table.extend(distance(heuristic, x - goal_x, y - goal_y) for x in range(width))
+    return table
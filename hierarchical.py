@@ -0,0 +1,416 @@
+import heapq
+import math
+
+from array import array
+from grid import Grid
+from heuristics import Heuristic, estimator
+from lru import LRUCache
+from pathfinding import SearchStats, move_cost
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# Type definitions.
+Cell_ID = int
+Transition = Tuple[Cell_ID, Cell_ID]
+Route = Tuple[array, array]
+
+DEFAULT_CLUSTER_SIZE = 16
+
+# Clusters are searched with local cell indexes stored in unsigned shorts, one of which marks a cell with no route.
+MAX_CLUSTER_SIZE = 255
+NO_ROUTE = 0xFFFF
+
+# Entrances (runs of free cells along a border between two clusters) shorter than this get one transition in the
+# middle; longer ones get a transition at each end. On grids with terrain, entrances get a transition in every this
+# many cells instead, wherever crossing is cheapest.
+ENTRANCE_SPLIT_LENGTH = 6
+
+# Maximum number of planners kept by hierarchical_search.
+MAX_PLANNERS = 4
+
+# Planners used by hierarchical_search, keyed by the ID of their grid and their cluster size. Planners are closed as
+# they are evicted.
+_planners: 'LRUCache[Tuple[int, int], HierarchicalPlanner]' = LRUCache(MAX_PLANNERS, lambda planner: planner.close())
+
+
+class Cluster(NamedTuple):
+    """ Part of the abstract graph that lives in one cluster.
+
+    Instance Variables:
+        partners: Transition cells of the cluster, each with the cells in neighbouring clusters it leads to.
+        edges: Cost of the shortest route inside the cluster from each transition cell to the others it can reach.
+        routes: Routes inside the cluster from each transition cell (see HierarchicalPlanner.search_cluster), used to
+            refine abstract paths to cells.
+    """
+    partners: Dict[Cell_ID, List[Cell_ID]]
+    edges: Dict[Cell_ID, List[Tuple[Cell_ID, float]]]
+    routes: Dict[Cell_ID, array]
+
+
+class HierarchicalPlanner:
+    """ Finds paths with Hierarchical Pathfinding A* (HPA*). The grid is split into square clusters. Wherever two
+    neighbouring clusters share a run of free cells along their border (an entrance), a transition between them is
+    placed, and the shortest routes inside each cluster between its transition cells are precomputed. Queries search
+    this much smaller abstract graph, then refine the abstract path to cells by joining up the precomputed routes.
+
+    The refined path is usually within a few percent of the shortest path. The abstract graph keeps every connection
+    between clusters, so queries with no path are answered without searching the grid. Where the shortest path is
+    needed, use a_star, which is faster than building the abstract graph and then searching the grid anyway.
+
+    On grids with terrain, paths are longer, since they can only cross borders at transitions. Transitions
+    are placed where crossing is cheapest, and more of them, which makes the abstract graph bigger and slower to build
+    and search. On the benchmark's terrain maps, paths then cost about 5% more than the shortest on average, but short
+    paths can cost up to 60% more. The routes in the end's cluster are also searched outward from the end and followed
+    in reverse, although moves cost more one way than the other. Use a_star where that matters.
+
+    The abstraction is built lazily: a cluster (and the borders around it) is only built when a query reaches it, and
+    kept for later queries. The planner watches its grid for changes, and an obstacle or terrain edit only invalidates
+    the cluster it is in, plus the clusters on the other side of any border it is on. Call close() when done with the
+    planner to stop watching.
+
+    Instance Variables:
+        grid: Grid the paths are found on.
+        cluster_size: Width and height of each cluster (in cells).
+        columns: Number of columns of clusters.
+        rows: Number of rows of clusters.
+        clusters_built: Total number of times a cluster was built since the planner was created.
+        __transitions: Transitions across each border between clusters, or None if the border must be rebuilt.
+            Border 2k is the east border of cluster k, and border 2k + 1 is its south border.
+        __clusters: Abstract graph of each cluster, or None if the cluster must be rebuilt.
+    """
+    grid: Grid
+    cluster_size: int
+    columns: int
+    rows: int
+    clusters_built: int
+    __transitions: List[Optional[List[Transition]]]
+    __clusters: List[Optional[Cluster]]
+
+    def __init__(self, grid: Grid, cluster_size: int = DEFAULT_CLUSTER_SIZE) -> None:
+        assert 1 < cluster_size <= MAX_CLUSTER_SIZE
+        self.grid = grid
+        self.cluster_size = cluster_size
+        self.columns = -(-grid.width // cluster_size)
+        self.rows = -(-grid.height // cluster_size)
+        self.clusters_built = 0
+        self.__reset()
+        grid.add_observer(self.__on_grid_change)
+
+    def close(self) -> None:
+        """ Stop watching the grid for changes. """
+        self.grid.remove_observer(self.__on_grid_change)
+
+    def find_path(self, start: Cell_ID, end: Cell_ID, heuristic: Optional[Heuristic] = None,
+                  stats: Optional[SearchStats] = None) -> List[Cell_ID]:
+        """ Return a path from start to end found on the abstract graph, or an empty list if there is none. If stats
+        is given, the work done by the search is added to it.
+        """
+        if start == end:
+            return []
+
+        path = self.__abstract_search(start, end, heuristic, stats)
+        if stats is not None:
+            stats.path_length += len(path)
+        return path
+
+    def get_cluster(self, cell_id: Cell_ID) -> int:
+        """ Get the index of the cluster a cell is in. """
+        x, y = self.grid.cell_id_to_cell(cell_id)
+        return x // self.cluster_size + y // self.cluster_size * self.columns
+
+    def search_cluster(self, cluster: int, source: Cell_ID) -> Route:
+        """ Find the shortest routes from a cell to every cell of its cluster, without leaving the cluster. Returns the
+        cost of each route and the cell each route comes from, as arrays indexed by the cells' local index
+        ((x - left) + (y - top) * cluster_size).
+        """
+        grid = self.grid
+        width = grid.width
+        size = self.cluster_size
+        left = cluster % self.columns * size
+        top = cluster // self.columns * size
+        right = min(left + size, width)
+        bottom = min(top + size, grid.height)
+
+        diagonal = grid.diagonal
+        terrain = None if grid.uniform else grid.costs
+        costs = array('d', [math.inf]) * (size * size)
+        came_from = array('H', [NO_ROUTE]) * (size * size)
+        source_index = source % width - left + (source // width - top) * size
+        costs[source_index] = 0
+        came_from[source_index] = source_index
+
+        heap = [(0.0, source)]
+        while heap:
+            cost, cell_id = heapq.heappop(heap)
+            x, y = cell_id % width, cell_id // width
+            index = x - left + (y - top) * size
+            if cost > costs[index]:
+                continue
+
+            for neighbour_id in grid.get_neighbours(cell_id):
+                neighbour_x, neighbour_y = neighbour_id % width, neighbour_id // width
+                if not (left <= neighbour_x < right and top <= neighbour_y < bottom):
+                    continue
+
+                new_cost = cost + move_cost(diagonal, width, terrain, cell_id, neighbour_id)
+
+                neighbour_index = neighbour_x - left + (neighbour_y - top) * size
+                if new_cost < costs[neighbour_index]:
+                    costs[neighbour_index] = new_cost
+                    came_from[neighbour_index] = index
+                    heapq.heappush(heap, (new_cost, neighbour_id))
+        return costs, came_from
+
+    def __reset(self) -> None:
+        """ Forget the whole abstract graph. """
+        num_clusters = self.columns * self.rows
+        self.__transitions = [None] * (2 * num_clusters)
+        self.__clusters = [None] * num_clusters
+
+    def __on_grid_change(self, cell_id: Optional[Cell_ID]) -> None:
+        """ Invalidate the parts of the abstract graph that depend on a changed cell. If the whole grid changed, start
+        again.
+        """
+        if cell_id is None:
+            self.__reset()
+            return
+
+        cluster = self.get_cluster(cell_id)
+        self.__clusters[cluster] = None
+
+        # A cell on the edge of its cluster may change the transitions across that border, and with them the cluster
+        # on the other side.
+        size = self.cluster_size
+        x, y = self.grid.cell_id_to_cell(cell_id)
+        borders = []
+        if x % size == size - 1 and x < self.grid.width - 1:
+            borders.append(2 * cluster)
+        if x % size == 0 and x > 0:
+            borders.append(2 * (cluster - 1))
+        if y % size == size - 1 and y < self.grid.height - 1:
+            borders.append(2 * cluster + 1)
+        if y % size == 0 and y > 0:
+            borders.append(2 * (cluster - self.columns) + 1)
+
+        for border in borders:
+            self.__transitions[border] = None
+            for neighbour in self.__border_clusters(border):
+                self.__clusters[neighbour] = None
+
+    def __border_clusters(self, border: int) -> Tuple[int, int]:
+        """ Get the two clusters on either side of a border. """
+        cluster = border // 2
+        return cluster, cluster + (self.columns if border % 2 else 1)
+
+    def __get_transitions(self, border: int) -> List[Transition]:
+        """ Get the transitions across a border, building them if they are out of date. """
+        transitions = self.__transitions[border]
+        if transitions is None:
+            transitions = self.__transitions[border] = self.__build_transitions(border)
+        return transitions
+
+    def __build_transitions(self, border: int) -> List[Transition]:
+        """ Find the entrances along a border, and place one or two transitions in each. """
+        grid = self.grid
+        size = self.cluster_size
+        cluster = border // 2
+        column, row = cluster % self.columns, cluster // self.columns
+        south = border % 2 == 1
+        if (south and row == self.rows - 1) or (not south and column == self.columns - 1):
+            return []
+
+        # Pairs of cells facing each other across the border.
+        if south:
+            y = row * size + size - 1
+            pairs = [(x + y * grid.width, x + (y + 1) * grid.width)
+                     for x in range(column * size, min(column * size + size, grid.width))]
+        else:
+            x = column * size + size - 1
+            pairs = [(x + y * grid.width, x + 1 + y * grid.width)
+                     for y in range(row * size, min(row * size + size, grid.height))]
+
+        transitions = []
+        entrance: List[Transition] = []
+        for pair in pairs + [(-1, -1)]:
+            if pair[0] != -1 and not grid.obstacle_exists(pair[0]) and not grid.obstacle_exists(pair[1]):
+                entrance.append(pair)
+                continue
+
+            if not grid.uniform:
+                transitions += self.__cheapest_crossings(entrance)
+            elif len(entrance) >= ENTRANCE_SPLIT_LENGTH:
+                transitions += [entrance[0], entrance[-1]]
+            elif entrance:
+                transitions.append(entrance[len(entrance) // 2])
+            entrance = []
+        return transitions
+
+    def __cheapest_crossings(self, entrance: List[Transition]) -> List[Transition]:
+        """ Place transitions in an entrance on a grid with terrain: one in every ENTRANCE_SPLIT_LENGTH cells of the
+        entrance, where crossing it costs the least (the middle one if several cost the same).
+        """
+        get_cost = self.grid.get_cost
+        transitions = []
+        for first in range(0, len(entrance), ENTRANCE_SPLIT_LENGTH):
+            segment = entrance[first:first + ENTRANCE_SPLIT_LENGTH]
+            crossing_costs = [get_cost(inside) + get_cost(outside) for inside, outside in segment]
+            cheapest = min(crossing_costs)
+            candidates = [pair for pair, crossing_cost in zip(segment, crossing_costs) if crossing_cost == cheapest]
+            transitions.append(candidates[len(candidates) // 2])
+        return transitions
+
+    def __get_cluster_graph(self, cluster: int) -> Cluster:
+        """ Get the abstract graph of a cluster, building it if it is out of date. """
+        graph = self.__clusters[cluster]
+        if graph is None:
+            graph = self.__clusters[cluster] = self.__build_cluster_graph(cluster)
+        return graph
+
+    def __build_cluster_graph(self, cluster: int) -> Cluster:
+        """ Collect the transition cells on the cluster's four borders, and find the routes between them. """
+        self.clusters_built += 1
+        column, row = cluster % self.columns, cluster // self.columns
+        borders = [2 * cluster, 2 * cluster + 1]
+        if column > 0:
+            borders.append(2 * (cluster - 1))
+        if row > 0:
+            borders.append(2 * (cluster - self.columns) + 1)
+
+        partners: Dict[Cell_ID, List[Cell_ID]] = {}
+        for border in borders:
+            for transition in self.__get_transitions(border):
+                inside, outside = transition if self.__border_clusters(border)[0] == cluster else transition[::-1]
+                partners.setdefault(inside, []).append(outside)
+
+        edges: Dict[Cell_ID, List[Tuple[Cell_ID, float]]] = {}
+        routes: Dict[Cell_ID, array] = {}
+        for source in partners:
+            costs, routes[source] = self.search_cluster(cluster, source)
+            edges[source] = [(target, costs[self.__local_index(cluster, target)]) for target in partners
+                             if target != source and costs[self.__local_index(cluster, target)] != math.inf]
+        return Cluster(partners, edges, routes)
+
+    def __local_index(self, cluster: int, cell_id: Cell_ID) -> int:
+        """ Get a cell's index within its cluster. """
+        size = self.cluster_size
+        x, y = self.grid.cell_id_to_cell(cell_id)
+        return x - cluster % self.columns * size + (y - cluster // self.columns * size) * size
+
+    def __route(self, cluster: int, came_from: array, source: Cell_ID, target: Cell_ID) -> List[Cell_ID]:
+        """ Follow a route found by search_cluster back from the target to its source, and return it in order. """
+        size = self.cluster_size
+        left = cluster % self.columns * size
+        top = cluster // self.columns * size
+        width = self.grid.width
+
+        source_index = self.__local_index(cluster, source)
+        index = self.__local_index(cluster, target)
+        route = [target]
+        while index != source_index:
+            index = came_from[index]
+            route.append(left + index % size + (top + index // size) * width)
+        route.reverse()
+        return route
+
+    def __abstract_search(self, start: Cell_ID, end: Cell_ID, heuristic: Optional[Heuristic],
+                          stats: Optional[SearchStats]) -> List[Cell_ID]:
+        """ Search the abstract graph from start to end, and refine the abstract path to cells. """
+        start_cluster = self.get_cluster(start)
+        end_cluster = self.get_cluster(end)
+
+        # Connect the start and end to the transition cells of their clusters (and to each other if they share one).
+        start_costs, start_came_from = self.search_cluster(start_cluster, start)
+        end_costs, end_came_from = self.search_cluster(end_cluster, end)
+        start_graph = self.__get_cluster_graph(start_cluster)
+        start_edges = [(target, start_costs[self.__local_index(start_cluster, target)])
+                       for target in start_graph.partners]
+        if start_cluster == end_cluster:
+            start_edges.append((end, start_costs[self.__local_index(start_cluster, end)]))
+        end_edges = {source: end_costs[self.__local_index(end_cluster, source)]
+                     for source in self.__get_cluster_graph(end_cluster).partners}
+
+        h_score = estimator(self.grid, end, heuristic)
+        g_scores = {start: 0.0}
+        came_from = {start: start}
+        closed = set()
+        heap = [(h_score(start), start)]
+        expanded = pushes = stale_pops = 0
+        pushes += 1
+
+        while heap:
+            _, current_id = heapq.heappop(heap)
+            if current_id in closed:
+                stale_pops += 1
+                continue
+            if current_id == end:
+                break
+            closed.add(current_id)
+            expanded += 1
+
+            cluster = self.get_cluster(current_id)
+            graph = self.__get_cluster_graph(cluster)
+            edges = list(start_edges if current_id == start else graph.edges.get(current_id, []))
+            edges += [(partner, move_cost(self.grid.diagonal, self.grid.width, self.grid.costs, current_id, partner))
+                      for partner in graph.partners.get(current_id, [])]
+            if current_id in end_edges:
+                edges.append((end, end_edges[current_id]))
+
+            for neighbour_id, cost in edges:
+                new_g_score = g_scores[current_id] + cost
+                if neighbour_id not in closed and new_g_score < g_scores.get(neighbour_id, math.inf):
+                    g_scores[neighbour_id] = new_g_score
+                    came_from[neighbour_id] = current_id
+                    heapq.heappush(heap, (new_g_score + h_score(neighbour_id), neighbour_id))
+                    pushes += 1
+
+        if stats is not None:
+            stats.expanded += expanded
+            stats.pushes += pushes
+            stats.stale_pops += stale_pops
+
+        if end not in came_from:
+            return []
+
+        abstract_path = [end]
+        while abstract_path[-1] != start:
+            abstract_path.append(came_from[abstract_path[-1]])
+        abstract_path.reverse()
+
+        # Refine each abstract edge: a step across a border, or a route inside a cluster.
+        path = [start]
+        for source, target in zip(abstract_path, abstract_path[1:]):
+            cluster = self.get_cluster(source)
+            if self.get_cluster(target) != cluster:
+                path.append(target)
+            elif source == start:
+                path += self.__route(cluster, start_came_from, start, target)[1:]
+            elif target == end:
+                path += self.__route(cluster, end_came_from, end, source)[-2::-1]
+            else:
+                path += self.__route(cluster, self.__get_cluster_graph(cluster).routes[source], source, target)[1:]
+        return path
+
+
+def hierarchical_search(grid: Grid, start: Cell_ID, end: Cell_ID, heuristic: Optional[Heuristic] = None,
+                        stats: Optional[SearchStats] = None, cluster_size: int = DEFAULT_CLUSTER_SIZE) -> List[Cell_ID]:
+    """ Find a path from start to end with HierarchicalPlanner. Planners are kept for the most recently searched grids,
+    so their abstract graphs are reused by later searches.
+    """
+    key = (id(grid), cluster_size)
+    planner = _planners.get(key)
+    if planner is None:
+        planner = HierarchicalPlanner(grid, cluster_size)
+        _planners.put(key, planner)
+    return planner.find_path(start, end, heuristic, stats)
+
+
+def close_planners(grid: Grid) -> None:
+    """ Close and free the planners kept by hierarchical_search for a grid, e.g. once the grid is replaced. Planners
+    hold on to their grid, so otherwise it stays alive until later searches push its planners out.
+    """
+    for key in [key for key, _ in _planners.items() if key[0] == id(grid)]:
+        _planners.remove(key)
+
+
+def clear_planners() -> None:
+    """ Close and free every planner kept by hierarchical_search. """
+    _planners.clear()
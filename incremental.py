@@ -0,0 +1,168 @@
+import heapq
+import math
+
+from array import array
+from grid import Grid
+from heuristics import Heuristic, estimator
+from pathfinding import move_cost
+from typing import List, Optional, Tuple
+
+# Type definitions.
+Cell_ID = int
+Key = Tuple[float, float]
+
+# Number of decimal places f_scores are rounded to in heap keys. Costs summed in a different order can differ in their
+# last bit, and a path that ties with the end's must not look more expensive, or the search could stop too early.
+KEY_DECIMALS = 9
+
+
+class IncrementalPlanner:
+    """ Finds the shortest path between a fixed start and end with Lifelong Planning A* (LPA*), and keeps its search
+    state between queries. When obstacles are placed or removed, only the cells whose cost from the start may have
+    changed are searched again, so re-routing after a small edit costs a fraction of a full a_star. Changing the cost
+    of a cell's terrain is repaired the same way, unless it lowers the grid's lowest cost, which the heuristic is scaled
+    by; then the search starts again.
+
+    The planner watches its grid for changes, so edits just need to go through the grid. Call close() when done with
+    the planner to stop watching.
+
+    Instance Variables:
+        grid: Grid the path is found on.
+        start: Cell ID the path starts at.
+        end: Cell ID the path ends at.
+        expansions: Total number of cells expanded since the planner was created.
+        __min_cost: Lowest cost of entering a cell when the search was started, which its heuristic is scaled by.
+        __g_scores: Cost from the start to each cell as of its last expansion.
+        __rhs_scores: One-step lookahead cost from the start to each cell, based on its neighbours' g_scores. A cell is
+            consistent when its g_score and rhs_score match, and only inconsistent cells are in the heap.
+        __keys: Key each cell was last pushed onto the heap with.
+        __open: Whether each cell is in the heap. Heap entries for cells that aren't open, or whose key is out of date,
+            are skipped.
+        __heap: Heap of (key, Cell ID) entries.
+    """
+    grid: Grid
+    start: Cell_ID
+    end: Cell_ID
+    expansions: int
+
+    def __init__(self, grid: Grid, start: Cell_ID, end: Cell_ID, heuristic: Optional[Heuristic] = None) -> None:
+        self.grid = grid
+        self.start = start
+        self.end = end
+        self.expansions = 0
+        self.__heuristic = heuristic
+        self.__reset()
+        grid.add_observer(self.__on_grid_change)
+
+    def close(self) -> None:
+        """ Stop watching the grid for changes. """
+        self.grid.remove_observer(self.__on_grid_change)
+
+    def find_path(self) -> List[Cell_ID]:
+        """ Bring the search up to date with the grid and return the shortest path from start to end. """
+        self.__compute_shortest_path()
+        if self.start == self.end or self.__g_scores[self.end] == math.inf:
+            return []
+
+        # Work backwards from the end, always stepping to the neighbour the end's cost was calculated from.
+        path = [self.end]
+        current = self.end
+        while current != self.start:
+            current = min(self.grid.get_neighbours(current),
+                          key=lambda neighbour_id: self.__g_scores[neighbour_id] + self.__cost(neighbour_id, current))
+            path.append(current)
+
+        path.reverse()
+        return path
+
+    def __reset(self) -> None:
+        """ Forget all search state and start again from just the start cell. """
+        num_cells = self.grid.get_num_cells()
+        self.__min_cost = self.grid.min_cost
+        self.__h_score = estimator(self.grid, self.end, self.__heuristic)
+        self.__g_scores = array('d', [math.inf]) * num_cells
+        self.__rhs_scores = array('d', [math.inf]) * num_cells
+        self.__keys: List[Optional[Key]] = [None] * num_cells
+        self.__open = bytearray(num_cells)
+        self.__heap: List[Tuple[Key, Cell_ID]] = []
+
+        self.__rhs_scores[self.start] = 0
+        self.__push(self.start)
+
+    def __on_grid_change(self, cell_id: Optional[Cell_ID]) -> None:
+        """ Update the cells whose incoming moves may have changed. If the whole grid changed, or the heuristic may now
+        overestimate, start again.
+        """
+        if cell_id is None or self.grid.min_cost < self.__min_cost:
+            self.__reset()
+            return
+
+        self.__update_cell(cell_id)
+        for neighbour_id in self.grid.get_cells_around(cell_id):
+            self.__update_cell(neighbour_id)
+
+    def __cost(self, cell_id: Cell_ID, neighbour_id: Cell_ID) -> float:
+        """ Cost of moving from a cell to a neighbouring cell. """
+        return move_cost(self.grid.diagonal, self.grid.width, self.grid.costs, cell_id, neighbour_id)
+
+    def __calculate_key(self, cell_id: Cell_ID) -> Key:
+        """ Heap key of a cell. Cells are expanded in order of f_score, then g_score. """
+        score = min(self.__g_scores[cell_id], self.__rhs_scores[cell_id])
+        return (round(score + self.__h_score(cell_id), KEY_DECIMALS), score)
+
+    def __push(self, cell_id: Cell_ID) -> None:
+        """ Add a cell to the heap, replacing any entry it already has. """
+        key = self.__calculate_key(cell_id)
+        self.__keys[cell_id] = key
+        self.__open[cell_id] = True
+        heapq.heappush(self.__heap, (key, cell_id))
+
+    def __top(self) -> Tuple[Key, Cell_ID]:
+        """ Get the entry with the lowest key, discarding out of date entries. """
+        while self.__heap:
+            key, cell_id = self.__heap[0]
+            if self.__open[cell_id] and self.__keys[cell_id] == key:
+                return key, cell_id
+            heapq.heappop(self.__heap)
+        return (math.inf, math.inf), -1
+
+    def __update_cell(self, cell_id: Cell_ID) -> None:
+        """ Recalculate a cell's rhs_score from its neighbours, and put it in the heap if it became inconsistent. """
+        if cell_id != self.start:
+            if self.grid.obstacle_exists(cell_id):
+                self.__rhs_scores[cell_id] = math.inf
+            else:
+                self.__rhs_scores[cell_id] = min(
+                    (self.__g_scores[neighbour_id] + self.__cost(neighbour_id, cell_id)
+                     for neighbour_id in self.grid.get_neighbours(cell_id)),
+                    default=math.inf)
+
+        self.__open[cell_id] = False
+        if self.__g_scores[cell_id] != self.__rhs_scores[cell_id]:
+            self.__push(cell_id)
+
+    def __compute_shortest_path(self) -> None:
+        """ Expand inconsistent cells until the end is consistent and no cell in the heap could lower its cost. """
+        g_scores = self.__g_scores
+        rhs_scores = self.__rhs_scores
+        end = self.end
+
+        while True:
+            key, cell_id = self.__top()
+            if cell_id == -1 or (key >= self.__calculate_key(end) and rhs_scores[end] == g_scores[end]):
+                return
+
+            heapq.heappop(self.__heap)
+            self.__open[cell_id] = False
+            self.expansions += 1
+
+            if g_scores[cell_id] > rhs_scores[cell_id]:
+                # The cell got cheaper to reach; its cost is now final.
+                g_scores[cell_id] = rhs_scores[cell_id]
+            else:
+                # The cell got more expensive to reach; recalculate it along with its neighbours.
+                g_scores[cell_id] = math.inf
+                self.__update_cell(cell_id)
+
+            for neighbour_id in self.grid.get_neighbours(cell_id):
+                self.__update_cell(neighbour_id)
@@ -0,0 +1,72 @@
+from collections import OrderedDict
+from typing import Callable, Generic, ItemsView, Optional, TypeVar
+
+# Type definitions.
+Key = TypeVar('Key')
+Value = TypeVar('Value')
+
+
+class LRUCache(Generic[Key, Value]):
+    """ Bounded mapping that evicts its least recently used entry once it holds more than capacity entries.
+
+    The caches built on it key their entries on the grid version (or the grid itself), and every edit changes the
+    version, so entries never need to be invalidated; out of date entries simply stop being used and are eventually
+    evicted.
+
+    Instance Variables:
+        capacity: Maximum number of entries held in the cache.
+        __entries: Cached values, ordered from least to most recently used.
+        __on_evict: Called with each value that is evicted or cleared from the cache, or None.
+    """
+    capacity: int
+    __entries: 'OrderedDict[Key, Value]'
+    __on_evict: Optional[Callable[[Value], None]]
+
+    def __init__(self, capacity: int, on_evict: Optional[Callable[[Value], None]] = None) -> None:
+        assert capacity > 0
+        self.capacity = capacity
+        self.__entries = OrderedDict()
+        self.__on_evict = on_evict
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def get(self, key: Key) -> Optional[Value]:
+        """ Return the value stored for the key, marking it as the most recently used, or None if it isn't cached. """
+        value = self.__entries.get(key)
+        if value is not None:
+            self.__entries.move_to_end(key)
+        return value
+
+    def put(self, key: Key, value: Value) -> None:
+        """ Store the value for the key as the most recently used, evicting the least recently used entry if the cache
+        is full.
+        """
+        self.__entries[key] = value
+        self.__entries.move_to_end(key)
+
+        if len(self.__entries) > self.capacity:
+            evicted = self.__entries.popitem(last=False)[1]
+            if self.__on_evict is not None:
+                self.__on_evict(evicted)
+
+    def remove(self, key: Key) -> None:
+        """ Remove a key from the cache if it is cached, passing its value to on_evict. """
+        value = self.__entries.pop(key, None)
+        if value is not None and self.__on_evict is not None:
+            self.__on_evict(value)
+
+    def touch(self, key: Key) -> None:
+        """ Mark a cached key as the most recently used. """
+        self.__entries.move_to_end(key)
+
+    def items(self) -> ItemsView[Key, Value]:
+        """ Return the cached (key, value) pairs, from least to most recently used. """
+        return self.__entries.items()
+
+    def clear(self) -> None:
+        """ Remove every entry from the cache. """
+        while self.__entries:
+            value = self.__entries.popitem()[1]
+            if self.__on_evict is not None:
+                self.__on_evict(value)
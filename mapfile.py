@@ -0,0 +1,175 @@
+""" Saving and loading grids.
+
+Maps are stored in a compact binary format: a fixed-size header followed by the grid's packed obstacle bitset, exactly
+as Grid holds it in memory, and then its terrain costs (one byte per cell) if it has any. Loading memory-maps the file
+and puts the grid directly on top of the mapping, so even huge maps open in constant time, and processes that load the
+same file share its pages.
+
+Header (little-endian):
+    magic: 4 bytes, b'GRID'.
+    version: Format version (uint16).
+    flags: Bit 0 is set if diagonal moves are allowed, and bit 1 if the file has terrain costs (uint16).
+    width, height: Size of the grid in cells (uint32 each).
+    start, end: Cell IDs of the start and end points, or -1 if not set (int64 each).
+
+Maps in the text format of the Moving AI benchmark suites (.map files) can also be imported and exported.
+"""
+import mmap
+import os
+import struct
+import tempfile
+
+from grid import Grid
+from typing import Dict, NamedTuple, Optional
+
+# Type definitions.
+Cell_ID = int
+
+MAGIC = b'GRID'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sHHIIqq')
+
+# Header flags.
+FLAG_DIAGONAL = 1
+FLAG_COSTS = 2
+
+# Cell ID stored for a start or end point that isn't set.
+NO_CELL = -1
+
+# Characters of the Moving AI format. '.' and 'G' are ground and 'S' is swamp, which can all be walked through; every
+# other character ('@', 'O', 'T' and 'W': out of bounds, trees and water) is an obstacle.
+MOVING_AI_FREE = b'.GS'
+MOVING_AI_FREE_CHAR = b'.'
+MOVING_AI_OBSTACLE_CHAR = b'@'
+
+# Translation tables between the Moving AI characters and obstacle masks (one byte per cell: 1 if it is an obstacle).
+_FROM_MOVING_AI = bytes(0 if char in MOVING_AI_FREE else 1 for char in range(256))
+_TO_MOVING_AI = MOVING_AI_FREE_CHAR + MOVING_AI_OBSTACLE_CHAR + bytes(254)
+
+
+class MapData(NamedTuple):
+    """ A grid with its start and end points.
+
+    Instance Variables:
+        grid: Grid of obstacles.
+        start: Cell ID of the start point, or None if it isn't set.
+        end: Cell ID of the end point, or None if it isn't set.
+    """
+    grid: Grid
+    start: Optional[Cell_ID] = None
+    end: Optional[Cell_ID] = None
+
+
+def save_map(path: str, grid: Grid, start: Optional[Cell_ID] = None, end: Optional[Cell_ID] = None) -> None:
+    """ Save a grid and its start and end points to a map file.
+
+    The map is written to a temporary file that then replaces the old one, so a grid that was loaded from the same path
+    (and is still mapped to the old file) is left intact.
+    """
+    num_bytes = (grid.get_num_cells() + 7) // 8
+    costs = None if grid.uniform else grid.costs
+    flags = (FLAG_DIAGONAL if grid.diagonal else 0) | (FLAG_COSTS if costs is not None else 0)
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, flags, grid.width, grid.height, NO_CELL if start is None else start,
+                         NO_CELL if end is None else end)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    descriptor, temporary_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(header)
+            file.write(grid.obstacles[:num_bytes])
+            if costs is not None:
+                file.write(costs)
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.remove(temporary_path)
+        raise
+
+
+def load_map(path: str, writable: bool = True) -> MapData:
+    """ Load a map file by memory-mapping it. The grid's obstacles are the mapped file itself, so nothing is read until
+    it is used.
+
+    A writable grid is mapped copy-on-write: obstacles can be placed and removed, but the changes stay in memory and
+    only reach the file through save_map. A read-only grid (e.g. for search workers) shares its pages with every other
+    process that maps the file.
+    """
+    with open(path, 'rb') as file:
+        mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_COPY if writable else mmap.ACCESS_READ)
+
+    if len(mapping) < HEADER.size:
+        raise ValueError(f"{path} is too short to be a map file")
+    magic, version, flags, width, height, start, end = HEADER.unpack_from(mapping)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a map file")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"{path} is version {version} of the map format, expected version {FORMAT_VERSION}")
+
+    num_bytes = (width * height + 7) // 8
+    num_cost_bytes = width * height if flags & FLAG_COSTS else 0
+    if len(mapping) < HEADER.size + num_bytes + num_cost_bytes:
+        raise ValueError(f"{path} is truncated")
+
+    for cell_id in (start, end):
+        if not NO_CELL <= cell_id < width * height:
+            raise ValueError(f"{path} has a start or end point outside the grid")
+
+    obstacles = memoryview(mapping)[HEADER.size:HEADER.size + num_bytes]
+    costs = memoryview(mapping)[HEADER.size + num_bytes:HEADER.size + num_bytes + num_cost_bytes] if num_cost_bytes \
+        else None
+    grid = Grid(width, height, obstacles, diagonal=bool(flags & FLAG_DIAGONAL), costs=costs)
+    return MapData(grid, None if start == NO_CELL else start, None if end == NO_CELL else end)
+
+
+def import_moving_ai(path: str) -> MapData:
+    """ Import a map in the Moving AI text format. Octile maps allow diagonal moves. Moving AI maps don't store start
+    and end points; those come from separate scenario files.
+    """
+    with open(path, 'rb') as file:
+        header: Dict[str, str] = {}
+        for line in file:
+            if line.strip() == b'map':
+                break
+            key, _, value = line.decode('ascii').partition(' ')
+            header[key] = value.strip()
+        else:
+            raise ValueError(f"{path} has no map section")
+
+        try:
+            width = int(header['width'])
+            height = int(header['height'])
+        except (KeyError, ValueError):
+            raise ValueError(f"{path} has no valid width and height") from None
+
+        rows = [file.readline().rstrip(b'\r\n') for _ in range(height)]
+    if any(len(row) != width for row in rows):
+        raise ValueError(f"{path} has rows that don't match its width")
+
+    obstacles = _pack_mask(b''.join(rows).translate(_FROM_MOVING_AI))
+    return MapData(Grid(width, height, obstacles, diagonal=header.get('type') == 'octile'))
+
+
+def export_moving_ai(path: str, grid: Grid) -> None:
+    """ Export a grid in the Moving AI text format. Free cells are written as '.' and obstacles as '@'. 8-way grids
+    are written as octile maps; 4-way grids have no type in the format, so they are written as 'tile' maps. The format
+    has no terrain costs, so they are left out.
+    """
+    cells = grid.get_obstacle_mask().translate(_TO_MOVING_AI)
+    with open(path, 'wb') as file:
+        file.write(b'type %s\nheight %d\nwidth %d\nmap\n' % (b'octile' if grid.diagonal else b'tile', grid.height,
+                                                            grid.width))
+        for row_start in range(0, len(cells), grid.width):
+            file.write(cells[row_start:row_start + grid.width] + b'\n')
+
+
+def _pack_mask(mask: bytes) -> bytearray:
+    """ Pack an obstacle mask (one byte per cell: 1 if it is an obstacle) into a bitset, the reverse of
+    Grid.get_obstacle_mask.
+    """
+    num_bytes = (len(mask) + 7) // 8
+    mask += bytes(num_bytes * 8 - len(mask))
+
+    packed = 0
+    for bit in range(8):
+        packed |= int.from_bytes(mask[bit::8], 'little') << bit
+    return bytearray(packed.to_bytes(num_bytes, 'little'))
@@ -0,0 +1,17 @@
+""" NumPy is optional, and takes longer to import than the rest of the program, so modules that can use it import it
+through get_numpy() the first time they need it rather than when they are loaded.
+"""
+import functools
+
+from types import ModuleType
+from typing import Optional
+
+
+@functools.lru_cache(maxsize=None)
+def get_numpy() -> Optional[ModuleType]:
+    """ Import NumPy, or return None if it isn't installed. """
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
@@ -0,0 +1,116 @@
+from distance_fields import distance_field_search
+from grid import Grid
+from lru import LRUCache
+from pathfinding import SearchStats, a_star, bidirectional_a_star, jump_point_search
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+# Type definitions.
+Cell_ID = int
+Search = Callable[..., List[Cell_ID]]
+Cache_Key = Tuple[int, Cell_ID, Cell_ID, Search, Tuple[Tuple[str, Any], ...]]
+
+DEFAULT_CAPACITY = 128
+
+# Searches that always find shortest paths. Only their paths answer queries between other cells along them.
+EXACT_SEARCHES = (a_star, jump_point_search, bidirectional_a_star, distance_field_search)
+
+
+class CachedPath(NamedTuple):
+    """ A path stored in the cache.
+
+    Instance Variables:
+        path: Shortest path, as returned by a_star.
+        positions: Index of each Cell ID in the path, used to find subpaths.
+    """
+    path: List[Cell_ID]
+    positions: Dict[Cell_ID, int]
+
+
+class PathCache:
+    """ Bounded least-recently-used cache of shortest paths, keyed on the grid version, the path's endpoints and the
+    search function and options (such as the heuristic) used to find it.
+
+    Every part of a shortest path is itself a shortest path, so a query is also answered from any cached path on the
+    same grid version and search that passes through both of its endpoints, if the search is one of EXACT_SEARCHES.
+    Paths of other searches (such as near-optimal HPA*) only answer the query they were found for. Paths are only
+    reversed to answer queries in the other direction on grids without terrain, since terrain makes moves cost more
+    one way than the other.
+
+    Instance Variables:
+        capacity: Maximum number of paths held in the cache.
+        hits: Number of lookups answered from the cache.
+        misses: Number of lookups that required a search.
+        __entries: Cached paths.
+    """
+    capacity: int
+    hits: int
+    misses: int
+    __entries: LRUCache[Cache_Key, CachedPath]
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY) -> None:
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self.__entries = LRUCache(capacity)
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def find_path(self, grid: Grid, start: Cell_ID, end: Cell_ID, search: Search = a_star,
+                  stats: Optional[SearchStats] = None, **options: Any) -> List[Cell_ID]:
+        """ Return the shortest path from start to end, only running the search (with the given keyword options) if
+        the cache can't answer the query. If stats is given, it is passed on to the search, so it is left untouched
+        when the path comes from the cache.
+        """
+        path = self.get(grid, start, end, search, **options)
+        if path is None:
+            self.misses += 1
+            path = search(grid, start, end, stats=stats, **options)
+            self.put(grid, start, end, path, search, **options)
+        else:
+            self.hits += 1
+        return path
+
+    def get(self, grid: Grid, start: Cell_ID, end: Cell_ID, search: Search = a_star,
+            **options: Any) -> Optional[List[Cell_ID]]:
+        """ Return the cached shortest path from start to end, or None if it isn't cached. """
+        key = self.__key(grid, start, end, search, options)
+        entry = self.__entries.get(key)
+        if entry is not None:
+            return list(entry.path)
+        if search not in EXACT_SEARCHES:
+            return None
+
+        # Look for a cached path on the same grid, found by the same search, that visits both endpoints.
+        for cached_key, entry in self.__entries.items():
+            if cached_key[0] != key[0] or cached_key[3:] != key[3:]:
+                continue
+
+            start_index = entry.positions.get(start)
+            end_index = entry.positions.get(end)
+            if start_index is None or end_index is None or start_index == end_index or \
+               (start_index > end_index and not grid.uniform):
+                continue
+
+            self.__entries.touch(cached_key)
+            if start_index < end_index:
+                return entry.path[start_index:end_index + 1]
+            return entry.path[end_index:start_index + 1][::-1]
+
+        return None
+
+    def put(self, grid: Grid, start: Cell_ID, end: Cell_ID, path: List[Cell_ID], search: Search = a_star,
+            **options: Any) -> None:
+        """ Store the shortest path from start to end, evicting the least recently used path if the cache is full. """
+        key = self.__key(grid, start, end, search, options)
+        path = list(path)
+        self.__entries.put(key, CachedPath(path, {cell_id: index for index, cell_id in enumerate(path)}))
+
+    def clear(self) -> None:
+        """ Remove every path from the cache. """
+        self.__entries.clear()
+
+    @staticmethod
+    def __key(grid: Grid, start: Cell_ID, end: Cell_ID, search: Search, options: Dict[str, Any]) -> Cache_Key:
+        """ Build the cache key for a query. """
+        return (grid.version, start, end, search, tuple(sorted(options.items())))
@@ -1,39 +1,244 @@
 import heapq
 import math
-import window
+import time
 
-from typing import List, Optional, Tuple
+from array import array
+from grid import BLOCK_CELLS, BLOCK_MASK, BLOCK_SHIFT, Buffer, Grid
+from heuristics import Heuristic, default_heuristic, distance, estimator
+from lru import LRUCache
+from priority_queues import BucketQueue, IndexedHeap, QueueType
+from typing import Callable, Dict, Generator, List, NamedTuple, Optional, Sequence, Tuple, Union
 
 # Type definitions.
 Cell_ID = int
+Search_Hook = Callable[[Cell_ID], None]
+Indexed_Queue = Union[IndexedHeap, BucketQueue]
 
 ADJACENT_COST = 1
+DIAGONAL_COST = math.sqrt(2)
 
+# Largest generation number a SearchState can hold before its stamps must be cleared.
+MAX_GENERATION = 2 ** 32 - 1
 
-class Node:
-    """ Holds important information about a Cell when calculating the shortest path.
+# Number of search states kept cached: enough for the two bidirectional_a_star uses at once and one other. States that
+# fall out of the cache are freed, so a program that searches grids of many sizes doesn't keep a state for each.
+SEARCH_STATE_CACHE_SIZE = 3
+
+# Block of zeros that every block of a search state's arrays starts as, by type code. Shared blocks are never written;
+# a cell's blocks are allocated before it is first stamped.
+_ZERO_BLOCKS: Dict[str, array] = {typecode: array(typecode, [0]) * BLOCK_CELLS for typecode in 'diI'}
+
+# Cache of search states, keyed by the number of cells on the grid and the state's slot.
+_search_states: 'LRUCache[Tuple[int, int], SearchState]' = LRUCache(SEARCH_STATE_CACHE_SIZE)
+
+# Jump lines of the grid jump_point_search last searched, keyed by the grid's ID and version.
+_jump_lines: Dict[Tuple[int, int], 'JumpLines'] = {}
+
+
+class BlockArray:
+    """ One value per cell of a grid, split into blocks of BLOCK_CELLS cells like the grid's adjacency index. The value
+    of a cell is blocks[cell_id >> BLOCK_SHIFT][cell_id & BLOCK_MASK]. Searches index the blocks directly in their
+    loops; indexing the BlockArray itself is for code outside them, such as construct_path.
+
+    Instance Variables:
+        blocks: Values of the cells in each block. Blocks that haven't been allocated are a shared block of zeros.
+        __num_cells: Number of cells the array holds a value for.
+    """
+    blocks: List[array]
+    __num_cells: int
+
+    def __init__(self, typecode: str, num_cells: int) -> None:
+        self.blocks = [_ZERO_BLOCKS[typecode]] * ((num_cells + BLOCK_CELLS - 1) >> BLOCK_SHIFT)
+        self.__num_cells = num_cells
+
+    def __len__(self) -> int:
+        return self.__num_cells
+
+    def __getitem__(self, cell_id: Cell_ID) -> Union[int, float]:
+        return self.blocks[cell_id >> BLOCK_SHIFT][cell_id & BLOCK_MASK]
+
+
+class SearchState:
+    """ Holds the per-cell information needed when calculating the shortest path, stored as one array per field
+    instead of one object per cell. Each array is split into blocks (see BlockArray), and a block is only allocated
+    once a search stamps a cell in it, so a short search on a huge grid only pays for the blocks it reaches.
+
+    Rather than resetting every cell before a search, each search gets a new generation number. A cell's g_score,
+    f_score and came_from are only valid if its stamp matches the current generation, and a cell is visited if its
+    closed stamp matches, so reusing the state for another search on a grid of the same size costs O(1).
 
     Instance Variables:
-        came_from: Contains the Cell ID that came before the current cell on the path. Used to construct the path when
-            the algorithm is complete.
-        visited: Flag to keep track of if the node was checked.
-        g_score: Exact time to get from the start to the current node
-        f_score: Value to minimize; g_score + h_score is the estimated cost of the path from start to finish (h_score
-            is a heuristic estimate of the time to get from the current node to the end).
+        g_scores: Exact cost to get from the start to each cell.
+        f_scores: Value to minimize; g_score + h_score is the estimated cost of the path from start to finish through
+            the cell (h_score is a heuristic estimate of the cost to get from the cell to the end).
+        came_from: Cell ID that came before each cell on the path. Used to construct the path when the algorithm is
+            complete.
+        stamps: Generation in which each cell's scores were last written.
+        closed: Generation in which each cell was last visited.
+        generation: Number of the current search.
+        __num_cells: Number of cells on the grids the state is for.
+        __queues: Indexed priority queues used by searches with this state, by type. Each is allocated the first time
+            it is used, and emptied by reset().
     """
-    visited: bool
-    came_from: Optional[Cell_ID]
-    g_score: float
-    f_score: float
-
-    def __init__(self) -> None:
-        """ Initialize default node values. g_score must be set to infinity so any g_score from a cell to a newly
-            discovered neighbour will be smaller than the default g_score of the neighbour.
+    g_scores: BlockArray
+    f_scores: BlockArray
+    came_from: BlockArray
+    stamps: BlockArray
+    closed: BlockArray
+    generation: int
+    __num_cells: int
+    __queues: Dict[QueueType, Indexed_Queue]
+
+    def __init__(self, num_cells: int) -> None:
+        self.__num_cells = num_cells
+        self.__clear_blocks()
+        self.generation = 0
+        self.__queues = {}
+
+    def __len__(self) -> int:
+        return self.__num_cells
+
+    def allocate_block(self, block: int) -> None:
+        """ Give a block of cells its own arrays, so they can be written. Searches call this before stamping the first
+        cell of a block that still shares the zero block.
         """
-        self.came_from = None
-        self.g_score = math.inf
-        self.f_score = math.inf
-        self.visited = False
+        for field, typecode in ((self.g_scores, 'd'), (self.f_scores, 'd'), (self.came_from, 'i'),
+                                (self.stamps, 'I'), (self.closed, 'I')):
+            field.blocks[block] = array(typecode, [0]) * BLOCK_CELLS
+
+    def get_queue(self, queue_type: QueueType) -> Indexed_Queue:
+        """ Get the state's indexed priority queue of the given type (not the lazy heap, which isn't indexed). """
+        queue = self.__queues.get(queue_type)
+        if queue is None:
+            queue = self.__queues[queue_type] = BucketQueue() if queue_type is QueueType.BUCKET else IndexedHeap()
+        return queue
+
+    def reset(self) -> None:
+        """ Start a new search. Only frees the blocks on the rare occasion the generation counter wraps around. The
+        queues are emptied of whatever the last search left in them.
+        """
+        for queue in self.__queues.values():
+            queue.clear()
+
+        self.generation += 1
+        if self.generation > MAX_GENERATION:
+            self.__clear_blocks()
+            self.generation = 1
+
+    def __clear_blocks(self) -> None:
+        """ Point every block of every array at the shared zero blocks. """
+        self.g_scores = BlockArray('d', self.__num_cells)
+        self.f_scores = BlockArray('d', self.__num_cells)
+        self.came_from = BlockArray('i', self.__num_cells)
+        self.stamps = BlockArray('I', self.__num_cells)
+        self.closed = BlockArray('I', self.__num_cells)
+
+
+def get_search_state(num_cells: int, slot: int = 0) -> SearchState:
+    """ Get a reset search state for a grid with the given number of cells. The most recently used states are cached by
+    grid size so repeated searches reuse their buffers. A state can only be used by one search at a time; searches that
+    need more than one state at once use a different slot for each.
+    """
+    state = _search_states.get((num_cells, slot))
+    if state is None:
+        state = SearchState(num_cells)
+        _search_states.put((num_cells, slot), state)
+    state.reset()
+    return state
+
+
+def clear_search_states() -> None:
+    """ Free every cached search state, and the jump lines kept by jump_point_search. """
+    _search_states.clear()
+    _jump_lines.clear()
+
+
+class SearchStats:
+    """ Counts of the work done by searches. Searches add to the counts, so one SearchStats can total several searches.
+    Searches only measure anything when given a SearchStats, so leaving it out costs nothing.
+
+    Every search fills in the counts and the path length, and searches that may return longer paths than the shortest
+    (such as ara_star) fill in the suboptimality bound. The heap size, the phase timings and the hooks are only
+    supported by a_star (and a_star_steps, whose timings leave out the time spent paused).
+
+    Instance Variables:
+        expanded: Number of cells expanded (for jump_point_search, jump points expanded).
+        expanded_backward: How many of the expanded cells were expanded by the frontier growing from the end (only
+            bidirectional_a_star has one).
+        pushes: Number of entries pushed onto the heap.
+        stale_pops: Number of out of date entries popped from the heap and discarded.
+        max_heap_size: Largest number of entries the heap held at once, in any of the searches.
+        path_length: Number of cells in the paths found.
+        suboptimality_bound: Highest suboptimality bound of the paths found: each costs at most this many times as much
+            as the shortest path. 1 for searches that always find shortest paths, and infinite if a search ran out of
+            budget before finding a path.
+        setup_seconds: Time spent preparing to search: resetting the search state and setting up the heuristic
+            (including precomputing it).
+        search_seconds: Time spent expanding cells.
+        path_seconds: Time spent constructing the path once the end was reached.
+        on_expand: Function called with the Cell ID of every cell expanded, or None.
+        on_push: Function called with the Cell ID of every cell pushed onto the heap, or None.
+    """
+    expanded: int
+    expanded_backward: int
+    pushes: int
+    stale_pops: int
+    max_heap_size: int
+    path_length: int
+    suboptimality_bound: float
+    setup_seconds: float
+    search_seconds: float
+    path_seconds: float
+    on_expand: Optional[Search_Hook]
+    on_push: Optional[Search_Hook]
+
+    def __init__(self, on_expand: Optional[Search_Hook] = None, on_push: Optional[Search_Hook] = None) -> None:
+        self.expanded = 0
+        self.expanded_backward = 0
+        self.pushes = 0
+        self.stale_pops = 0
+        self.max_heap_size = 0
+        self.path_length = 0
+        self.suboptimality_bound = 1.0
+        self.setup_seconds = 0.0
+        self.search_seconds = 0.0
+        self.path_seconds = 0.0
+        self.on_expand = on_expand
+        self.on_push = on_push
+
+    @property
+    def expanded_forward(self) -> int:
+        return self.expanded - self.expanded_backward
+
+    @property
+    def seconds(self) -> float:
+        return self.setup_seconds + self.search_seconds + self.path_seconds
+
+    def as_dict(self) -> Dict[str, float]:
+        """ Get the counts and timings in a form that can be serialized (e.g. to JSON). The hooks are left out. """
+        return {
+            'expanded': self.expanded,
+            'expanded_backward': self.expanded_backward,
+            'pushes': self.pushes,
+            'stale_pops': self.stale_pops,
+            'max_heap_size': self.max_heap_size,
+            'path_length': self.path_length,
+            'suboptimality_bound': self.suboptimality_bound,
+            'setup_seconds': self.setup_seconds,
+            'search_seconds': self.search_seconds,
+            'path_seconds': self.path_seconds,
+        }
+
+
+class SearchStep(NamedTuple):
+    """ Progress made by a_star_steps since the last step.
+
+    Instance Variables:
+        opened: Cells added to (or updated in) the heap, in order.
+        closed: Cells expanded, in order.
+    """
+    opened: List[Cell_ID]
+    closed: List[Cell_ID]
 
 
 class Heap:
@@ -42,8 +247,8 @@ class Heap:
         Instance Variables:
             __data: Data structure used for the heap (in this case, a list).
     """
-    def __init__(self, data: List[Tuple[float, Cell_ID]] = []) -> None:
-        self.__data = data
+    def __init__(self, data: Optional[List[Tuple[float, Cell_ID]]] = None) -> None:
+        self.__data = data if data is not None else []
         heapq.heapify(self.__data)
 
     def push(self, item: Tuple[float, Cell_ID]) -> None:
@@ -52,70 +257,651 @@ class Heap:
     def pop(self) -> Tuple[float, Cell_ID]:
         return heapq.heappop(self.__data)
 
+    def __len__(self) -> int:
+        return len(self.__data)
+
     def empty(self) -> bool:
         return not self.__data
 
+    def peek(self) -> Tuple[float, Cell_ID]:
+        return self.__data[0]
 
-def a_star(window: window.Window) -> List[Cell_ID]:
-    """ Calculate and return the shortest path from start to end. """
-    # Confirm starting and ending points are defined.
-    start = window.start
-    end = window.end
-    assert start is not None
-    assert end is not None
 
-    # List of all cells to easily retrieve information from. Heap will store the cell ID along with it's f_score.
-    cells = [Node() for _ in range(window.get_num_cells())]
-    heap = Heap()
+def a_star(grid: Grid, start: Cell_ID, end: Cell_ID, state: Optional[SearchState] = None,
+           heuristic: Optional[Heuristic] = None, precompute_heuristic: bool = False,
+           stats: Optional[SearchStats] = None, queue: Optional[QueueType] = None) -> List[Cell_ID]:
+    """ Calculate and return the shortest path from start to end. This runs on the headless grid model, so it does not
+    need a tkinter window. A search state for the grid's size is reused from the cache unless one is passed in. On grids
+    with terrain, each move costs as much as usual times the cost of entering the cell moved into.
 
-    # Cost from start to start is 0; starting cell's cost is purely heuristic.
-    cells[start].g_score = 0
-    cells[start].f_score = h_score(window, start, end)
-    heap.push((cells[start].f_score, start))
+    The heuristic defaults to the tightest admissible one for the grid's movement model. With precompute_heuristic, the
+    heuristic for every cell is calculated in one pass before searching, which pays off when the same end is searched
+    for repeatedly. If stats is given, the work done by the search and the time spent on each phase are added to it,
+    and its hooks are called as cells are pushed and expanded.
 
-    while not heap.empty():
-        # Get cell with the lowest f_score. Keep popping until either the heap is empty or we find an up to date node
-        # (we can insert the same node multiple times but with different f_scores, so a node in the heap may have an
-        # outdated f_score).
+    The open cells are kept in the given type of priority queue (see QueueType). By default this is the bucket queue
+    when every score is a whole number, which is by far the fastest, and the lazy heap otherwise. The indexed heap
+    keeps the smallest queue but its pure Python sift operations are slower than heapq on some maps.
+    """
+    # Without a batch size the search never yields, so it runs to completion on the first step.
+    steps = a_star_steps(grid, start, end, None, state, heuristic, precompute_heuristic, stats, queue)
+    try:
         while True:
-            top = heap.pop()
-            current_id = top[1]
+            next(steps)
+    except StopIteration as stop:
+        return stop.value
+
+
+def a_star_steps(grid: Grid, start: Cell_ID, end: Cell_ID, batch_size: Optional[int],
+                 state: Optional[SearchState] = None, heuristic: Optional[Heuristic] = None,
+                 precompute_heuristic: bool = False, stats: Optional[SearchStats] = None,
+                 queue: Optional[QueueType] = None) -> Generator[SearchStep, None, List[Cell_ID]]:
+    """ Resumable version of a_star. Every batch_size expansions, the search pauses and yields the cells it opened and
+    closed since it last paused, so a caller can show the search's progress and spread it over time. The shortest path
+    is the generator's return value. If batch_size is None, the search runs without pausing or recording its progress.
+    """
+    # Only time the search if it is being measured.
+    instrument = stats is not None
+    if instrument:
+        started = time.perf_counter()
+
+    state = _start_search(grid, state)
+
+    # Local references to the blocks of the state's arrays keep attribute lookups out of the loop. Heap will store the
+    # cell ID along with it's f_score.
+    g_scores = state.g_scores.blocks
+    f_scores = state.f_scores.blocks
+    came_from = state.came_from.blocks
+    stamps = state.stamps.blocks
+    closed = state.closed.blocks
+    unstamped = _ZERO_BLOCKS['I']
+    allocate_block = state.allocate_block
+    generation = state.generation
+    h_score = estimator(grid, end, heuristic, precompute_heuristic)
+    diagonal = grid.diagonal
+    width = grid.width
+    heap = _open_queue(grid, state, heuristic, queue)
+    path: List[Cell_ID] = []
+    found = False
+    expanded = pushes = stale_pops = max_heap_size = 0
+    trace = batch_size is not None
+    step = SearchStep([start], [])
+    on_expand = stats.on_expand if stats is not None else None
+    on_push = stats.on_push if stats is not None else None
+
+    # Cost of entering each cell, or None if every cell costs the same and moves can be costed without looking it up.
+    costs = None if grid.uniform else grid.costs
 
-            if heap.empty() or cells[current_id].f_score == top[0]:
-                break
+    # Cost from start to start is 0; starting cell's cost is purely heuristic.
+    block, index = start >> BLOCK_SHIFT, start & BLOCK_MASK
+    if stamps[block] is unstamped:
+        allocate_block(block)
+    g_scores[block][index] = 0
+    f_scores[block][index] = f_score = h_score(start)
+    came_from[block][index] = start
+    stamps[block][index] = generation
+    heap.push((f_score, start))
+    pushes += 1
+    if on_push is not None:
+        on_push(start)
+
+    if instrument:
+        resumed = time.perf_counter()
+        setup_seconds = resumed - started
+        search_seconds = 0.0
+
+    while not heap.empty():
+        # The heap is largest just before a pop, after the last expansion pushed its neighbours.
+        if instrument and len(heap) > max_heap_size:
+            max_heap_size = len(heap)
+
+        # Get cell with the lowest f_score. We can insert the same cell multiple times but with different f_scores, so
+        # skip entries that are out of date or whose cell was already visited.
+        f_score, current_id = heap.pop()
+        block, index = current_id >> BLOCK_SHIFT, current_id & BLOCK_MASK
+        if closed[block][index] == generation or f_scores[block][index] != f_score:
+            stale_pops += 1
+            continue
 
         # Found the path to the end.
         if current_id == end:
-            return construct_path(start, current_id, cells)
+            found = True
+            break
+
+        # Pause to report progress once enough cells have been expanded. Time spent paused isn't counted.
+        if trace and len(step.closed) >= batch_size:
+            if instrument:
+                search_seconds += time.perf_counter() - resumed
+            yield step
+            if instrument:
+                resumed = time.perf_counter()
+            step = SearchStep([], [])
 
         # Mark cell as visited and check its neighbours.
-        cells[current_id].visited = True
-        for neighbour_id in window.get_neighbours(current_id):
-            if cells[neighbour_id].visited:
+        closed[block][index] = generation
+        g_score = g_scores[block][index]
+        expanded += 1
+        if trace:
+            step.closed.append(current_id)
+        if on_expand is not None:
+            on_expand(current_id)
+        for neighbour_id in grid.get_neighbours(current_id):
+            block, index = neighbour_id >> BLOCK_SHIFT, neighbour_id & BLOCK_MASK
+            if closed[block][index] == generation:
                 continue
 
+            new_g_score = g_score + move_cost(diagonal, width, costs, current_id, neighbour_id)
+
             # Update neighbour's information if a better path is found and add to the heap.
-            new_g_score = cells[current_id].g_score + ADJACENT_COST
-            if new_g_score < cells[neighbour_id].g_score:
-                cells[neighbour_id].came_from = current_id
-                cells[neighbour_id].g_score = new_g_score
-                cells[neighbour_id].f_score = new_g_score + h_score(window, neighbour_id, end)
+            block_stamps = stamps[block]
+            if block_stamps[index] != generation or new_g_score < g_scores[block][index]:
+                if block_stamps is unstamped:
+                    allocate_block(block)
+                came_from[block][index] = current_id
+                g_scores[block][index] = new_g_score
+                f_scores[block][index] = f_score = new_g_score + h_score(neighbour_id)
+                stamps[block][index] = generation
+
+                heap.push((f_score, neighbour_id))
+                pushes += 1
+                if trace:
+                    step.opened.append(neighbour_id)
+                if on_push is not None:
+                    on_push(neighbour_id)
+
+    if instrument:
+        searched = time.perf_counter()
+        search_seconds += searched - resumed
+
+    if found:
+        path = construct_path(start, end, state.came_from)
+
+    if stats is not None:
+        stats.expanded += expanded
+        stats.pushes += pushes
+        stats.stale_pops += stale_pops
+        stats.max_heap_size = max(stats.max_heap_size, max_heap_size)
+        stats.path_length += len(path)
+        stats.setup_seconds += setup_seconds
+        stats.search_seconds += search_seconds
+        stats.path_seconds += time.perf_counter() - searched
+
+    if trace and (step.opened or step.closed):
+        yield step
+
+    # Empty if there is no solution.
+    return path
 
-                heap.push((cells[neighbour_id].f_score, neighbour_id))
 
-    # No solution, return empty path.
-    return []
+class JumpLines:
+    """ The rows and columns of a grid's obstacles, one byte per cell, for jump point search. Each line is kept with
+    the cells along it where a jump moving in each direction must stop because they have a forced neighbour. A straight
+    jump is then found with bytes.find, which scans the line in C, instead of stepping through it one cell at a time.
+    Lines are built the first time a jump moves along them, and are only valid while the grid is unchanged.
 
+    Instance Variables:
+        width: Width of the grid.
+        height: Height of the grid.
+        version: Grid version the lines were built from.
+        __mask: Obstacles of the grid, one byte per cell (see Grid.get_obstacle_mask).
+        __rows: Rows built so far, by y.
+        __columns: Columns built so far, by x.
+        __row_stops: Cells of each row built so far where a jump must stop, by y and direction.
+        __column_stops: Cells of each column built so far where a jump must stop, by x and direction.
+    """
+    width: int
+    height: int
+    version: int
+    __mask: bytes
+    __rows: Dict[int, bytes]
+    __columns: Dict[int, bytes]
+    __row_stops: Dict[Tuple[int, int], bytes]
+    __column_stops: Dict[Tuple[int, int], bytes]
+
+    def __init__(self, grid: Grid) -> None:
+        self.width = grid.width
+        self.height = grid.height
+        self.version = grid.version
+        self.__mask = grid.get_obstacle_mask()
+        self.__rows = {}
+        self.__columns = {}
+        self.__row_stops = {}
+        self.__column_stops = {}
+
+    def walkable(self, x: int, y: int) -> bool:
+        """ Return whether a cell is in bounds and not an obstacle. """
+        return 0 <= x < self.width and 0 <= y < self.height and not self.__mask[x + y * self.width]
+
+    def jump_horizontal(self, x: int, y: int, dx: int, target: int = -1) -> Optional[int]:
+        """ Move from (x, y) along its row in direction dx until reaching a cell with a forced neighbour, or the
+        target column if it isn't -1, and return that cell's column. Returns None if an obstacle or the edge of the
+        grid is reached first.
+        """
+        if not 0 <= y < self.height:
+            return None
+        return self.__jump(self.__row(y), self.__stops(self.__row_stops, self.__row, y, self.height, dx), x, dx, target)
 
-def h_score(window: window.Window, cell1: Cell_ID, cell2: Cell_ID) -> float:
-    """ Calculate the heuristic for two cells (euclidian distance). """
-    c1_coords = window.cell_id_to_cell(cell1)
-    c2_coords = window.cell_id_to_cell(cell2)
-    return math.sqrt(sum([(a - b) ** 2 for a, b in zip(c1_coords, c2_coords)]))
+    def jump_vertical(self, x: int, y: int, dy: int, target: int = -1) -> Optional[int]:
+        """ Move from (x, y) along its column in direction dy, as jump_horizontal does along rows, and return the row
+        of the cell reached.
+        """
+        if not 0 <= x < self.width:
+            return None
+        return self.__jump(self.__column(x), self.__stops(self.__column_stops, self.__column, x, self.width, dy), y,
+                           dy, target)
+
+    def free_length(self, x: int, y: int, dy: int) -> int:
+        """ Get the number of cells that can be moved through from (x, y) along its column in direction dy, starting
+        with (x, y) itself, before reaching an obstacle or the edge of the grid.
+        """
+        column = self.__column(x)
+        if dy > 0:
+            blocked = column.find(1, y)
+            return (blocked if blocked >= 0 else len(column)) - y
+        return y - column.rfind(1, 0, y + 1)
+
+    def __row(self, y: int) -> bytes:
+        """ Get a row of the obstacles, building it if needed. """
+        row = self.__rows.get(y)
+        if row is None:
+            row = self.__rows[y] = self.__mask[y * self.width:(y + 1) * self.width]
+        return row
+
+    def __column(self, x: int) -> bytes:
+        """ Get a column of the obstacles, building it if needed. """
+        column = self.__columns.get(x)
+        if column is None:
+            column = self.__columns[x] = self.__mask[x::self.width]
+        return column
+
+    @staticmethod
+    def __stops(stops: Dict[Tuple[int, int], bytes], get_line: Callable[[int], bytes], index: int, count: int,
+                direction: int) -> bytes:
+        """ Get the cells of a line where a jump moving in the given direction must stop, building them if needed: 1
+        where a cell on a neighbouring line is free but the cell behind it is not, so the neighbour is forced.
+        """
+        key = (index, direction)
+        line_stops = stops.get(key)
+        if line_stops is None:
+            length = len(get_line(index))
+            ones = int.from_bytes(b'\x01' * length, 'little')
+
+            # Every cell is a byte, so shifting a line by 8 bits moves it one cell along.
+            forced = 0
+            for neighbour in (index - 1, index + 1):
+                if 0 <= neighbour < count:
+                    blocked = int.from_bytes(get_line(neighbour), 'little')
+                    forced |= (blocked ^ ones) & (blocked << 8 if direction > 0 else blocked >> 8)
+            line_stops = stops[key] = forced.to_bytes(length, 'little')
+        return line_stops
+
+    @staticmethod
+    def __jump(line: bytes, stops: bytes, position: int, direction: int, target: int) -> Optional[int]:
+        """ Find the first stop (or the target) along a line from position in direction, before the first obstacle.
+        """
+        if direction > 0:
+            blocked = line.find(1, position)
+            if blocked < 0:
+                blocked = len(line)
+            stop = stops.find(1, position, blocked)
+            if position <= target < blocked and (stop < 0 or target < stop):
+                stop = target
+        else:
+            blocked = line.rfind(1, 0, position + 1)
+            stop = stops.rfind(1, blocked + 1, position + 1)
+            if blocked < target <= position and target > stop:
+                stop = target
+        return stop if stop >= 0 else None
+
+
+def get_jump_lines(grid: Grid) -> JumpLines:
+    """ Get the jump lines of a grid. The lines of the most recently searched grid are kept until it changes, so
+    repeated searches on the same grid share the lines they build.
+    """
+    key = (id(grid), grid.version)
+    lines = _jump_lines.get(key)
+    if lines is None:
+        _jump_lines.clear()
+        lines = _jump_lines[key] = JumpLines(grid)
+    return lines
+
+
+def jump_point_search(grid: Grid, start: Cell_ID, end: Cell_ID, state: Optional[SearchState] = None,
+                      heuristic: Optional[Heuristic] = None, stats: Optional[SearchStats] = None) -> List[Cell_ID]:
+    """ Calculate and return the shortest path from start to end using Jump Point Search. This is A* that, instead of
+    pushing every neighbour, skips ahead along straight (and diagonal) lines until it reaches a cell where the path may
+    need to turn (a jump point). Only jump points are pushed onto the heap, which on open grids means far fewer
+    expansions than a_star. Straight jumps are found a whole line at a time with JumpLines. On maps dense with scattered
+    obstacles, jumps are only a few cells long and a_star is faster. Paths have the same cost as those from a_star, and
+    are returned cell by cell.
+
+    Only valid on grids where every move of the same kind costs the same, so grids with terrain raise ValueError. If
+    stats is given, the work done by the search is added to it.
+    """
+    if not grid.uniform:
+        raise ValueError("Jump point search needs a grid where every cell costs the same to enter")
+    state = _start_search(grid, state)
+
+    g_scores = state.g_scores.blocks
+    f_scores = state.f_scores.blocks
+    came_from = state.came_from
+    stamps = state.stamps.blocks
+    closed = state.closed.blocks
+    unstamped = _ZERO_BLOCKS['I']
+    generation = state.generation
+    h_score = estimator(grid, end, heuristic)
+    diagonal = grid.diagonal
+    width = grid.width
+    end_x, end_y = grid.cell_id_to_cell(end)
+    heap = Heap()
+
+    lines = get_jump_lines(grid)
+    walkable = lines.walkable
+    jump_horizontal = lines.jump_horizontal
+    jump_vertical = lines.jump_vertical
+    free_length = lines.free_length
+
+    # Jumps are straight or diagonal lines, so the octile (or Manhattan) distance is their exact cost.
+    jump_cost = Heuristic.OCTILE if diagonal else Heuristic.MANHATTAN
+
+    def jump(x: int, y: int, dx: int, dy: int) -> Optional[Cell_ID]:
+        """ Move from (x, y) in direction (dx, dy) until reaching a jump point, and return it. Returns None if the
+        direction leads into an obstacle or off the grid without reaching one.
+        """
+        if dy == 0:
+            # A cell is a jump point if it has a forced neighbour: one that is only reached optimally through it.
+            jump_x = jump_horizontal(x, y, dx, end_x if y == end_y else -1)
+            return jump_x + y * width if jump_x is not None else None
+
+        if dx == 0:
+            jump_y = jump_vertical(x, y, dy, end_y if x == end_x else -1)
+            if diagonal:
+                return x + jump_y * width if jump_y is not None else None
+
+            # Without diagonal moves, turning off a vertical line is only found by looking horizontally, from every
+            # cell up to where the vertical jump stops.
+            length = abs(jump_y - y) if jump_y is not None else free_length(x, y, dy)
+            for step_y in range(y, y + dy * length, dy):
+                if jump_horizontal(x + 1, step_y, 1, end_x if step_y == end_y else -1) is not None or \
+                   jump_horizontal(x - 1, step_y, -1, end_x if step_y == end_y else -1) is not None:
+                    return x + step_y * width
+            return x + jump_y * width if jump_y is not None else None
+
+        while walkable(x, y):
+            if x == end_x and y == end_y:
+                return x + y * width
+
+            # Moving diagonally, a cell is a jump point if a horizontal or vertical jump from it finds one.
+            if jump_horizontal(x + dx, y, dx, end_x if y == end_y else -1) is not None or \
+               jump_vertical(x, y + dy, dy, end_y if x == end_x else -1) is not None:
+                return x + y * width
+
+            # Diagonal moves can't cut corners.
+            if not walkable(x + dx, y) or not walkable(x, y + dy):
+                return None
+            x += dx
+            y += dy
+        return None
+
+    def get_directions(cell_id: Cell_ID) -> List[Tuple[int, int]]:
+        """ Get the directions worth jumping in from a cell, pruning those that are reached at least as cheaply
+        without going through the cell.
+        """
+        x, y = cell_id % width, cell_id // width
+        parent = came_from[cell_id]
+        if parent == cell_id:
+            return [(neighbour_id % width - x, neighbour_id // width - y)
+                    for neighbour_id in grid.get_neighbours(cell_id)]
+
+        parent_x, parent_y = parent % width, parent // width
+        dx = (x > parent_x) - (x < parent_x)
+        dy = (y > parent_y) - (y < parent_y)
+
+        directions = []
+        if dx and dy:
+            if walkable(x, y + dy):
+                directions.append((0, dy))
+            if walkable(x + dx, y):
+                directions.append((dx, 0))
+            if walkable(x, y + dy) and walkable(x + dx, y):
+                directions.append((dx, dy))
+        elif dx:
+            directions.append((dx, 0))
+            for side in (-1, 1):
+                if walkable(x, y + side):
+                    directions.append((0, side))
+                    if diagonal and walkable(x + dx, y):
+                        directions.append((dx, side))
+        else:
+            directions.append((0, dy))
+            for side in (-1, 1):
+                if walkable(x + side, y):
+                    directions.append((side, 0))
+                    if diagonal and walkable(x, y + dy):
+                        directions.append((side, dy))
+        return directions
+
+    path: List[Cell_ID] = []
+    expanded = pushes = stale_pops = 0
+
+    block, index = start >> BLOCK_SHIFT, start & BLOCK_MASK
+    if stamps[block] is unstamped:
+        state.allocate_block(block)
+    g_scores[block][index] = 0
+    f_scores[block][index] = f_score = h_score(start)
+    came_from.blocks[block][index] = start
+    stamps[block][index] = generation
+    heap.push((f_score, start))
+    pushes += 1
+
+    while not heap.empty():
+        f_score, current_id = heap.pop()
+        block, index = current_id >> BLOCK_SHIFT, current_id & BLOCK_MASK
+        if closed[block][index] == generation or f_scores[block][index] != f_score:
+            stale_pops += 1
+            continue
 
+        if current_id == end:
+            path = expand_path(grid, construct_path(start, current_id, came_from))
+            break
+
+        closed[block][index] = generation
+        g_score = g_scores[block][index]
+        expanded += 1
+        current_x, current_y = current_id % width, current_id // width
+        for dx, dy in get_directions(current_id):
+            jump_point = jump(current_x + dx, current_y + dy, dx, dy)
+            if jump_point is None:
+                continue
+            block, index = jump_point >> BLOCK_SHIFT, jump_point & BLOCK_MASK
+            if closed[block][index] == generation:
+                continue
+
+            new_g_score = g_score + distance(
+                jump_cost, jump_point % width - current_x, jump_point // width - current_y)
+            if stamps[block][index] != generation or new_g_score < g_scores[block][index]:
+                if stamps[block] is unstamped:
+                    state.allocate_block(block)
+                came_from.blocks[block][index] = current_id
+                g_scores[block][index] = new_g_score
+                f_scores[block][index] = f_score = new_g_score + h_score(jump_point)
+                stamps[block][index] = generation
+
+                heap.push((f_score, jump_point))
+                pushes += 1
+
+    if stats is not None:
+        stats.expanded += expanded
+        stats.pushes += pushes
+        stats.stale_pops += stale_pops
+        stats.path_length += len(path)
+
+    return path
 
-def construct_path(start: Cell_ID, end: Cell_ID, cells: List[Node]) -> List[Cell_ID]:
-    """ Construct the shortest path taken from start to end. """
+
+def bidirectional_a_star(grid: Grid, start: Cell_ID, end: Cell_ID, heuristic: Optional[Heuristic] = None,
+                         stats: Optional[SearchStats] = None) -> List[Cell_ID]:
+    """ Calculate and return the shortest path from start to end by growing one A* frontier from the start towards the
+    end and another from the end towards the start, expanding whichever frontier has the lower f_score next. Every time
+    a frontier reaches a cell the other has already reached, the cost of the path through that cell is a candidate for
+    the shortest path. Once the lowest f_score in either frontier is no better than the best candidate, no unexplored
+    path can be shorter, so the search stops. On grids with terrain, moves cost more in one direction than the other, so
+    the frontier from the end costs each move by the cell it came from rather than the cell it reaches.
+
+    If stats is given, the work done by the search is added to it, including how many cells each frontier expanded.
+    """
+    if start == end:
+        return []
+
+    forward = get_search_state(grid.get_num_cells(), 0)
+    backward = get_search_state(grid.get_num_cells(), 1)
+    forward_h_score = estimator(grid, end, heuristic)
+    backward_h_score = estimator(grid, start, heuristic)
+    forward_heap = Heap()
+    backward_heap = Heap()
+    diagonal = grid.diagonal
+    width = grid.width
+    costs = None if grid.uniform else grid.costs
+
+    unstamped = _ZERO_BLOCKS['I']
+
+    # Each frontier's state, heap and heuristic, with local references to the blocks of the state's arrays to keep
+    # attribute lookups out of the loop.
+    forward_frontier = (forward, forward_heap, forward_h_score, forward.g_scores.blocks, forward.f_scores.blocks,
+                        forward.came_from.blocks, forward.stamps.blocks, forward.closed.blocks)
+    backward_frontier = (backward, backward_heap, backward_h_score, backward.g_scores.blocks, backward.f_scores.blocks,
+                         backward.came_from.blocks, backward.stamps.blocks, backward.closed.blocks)
+
+    for frontier, cell_id in ((forward_frontier, start), (backward_frontier, end)):
+        state, heap, h_score, g_scores, f_scores, came_from, stamps, closed = frontier
+        block, index = cell_id >> BLOCK_SHIFT, cell_id & BLOCK_MASK
+        if stamps[block] is unstamped:
+            state.allocate_block(block)
+        g_scores[block][index] = 0
+        f_scores[block][index] = f_score = h_score(cell_id)
+        came_from[block][index] = cell_id
+        stamps[block][index] = state.generation
+        heap.push((f_score, cell_id))
+
+    # Cost of the shortest path found so far, and the cell where its two halves meet.
+    best_cost = math.inf
+    meeting_id = -1
+    expanded = expanded_backward = stale_pops = 0
+    pushes = 2
+
+    while True:
+        # Discard out of date entries so the top of each heap is the frontier's real lowest f_score.
+        for state, heap, _, _, f_scores, _, _, closed in (forward_frontier, backward_frontier):
+            while not heap.empty():
+                f_score, cell_id = heap.peek()
+                block, index = cell_id >> BLOCK_SHIFT, cell_id & BLOCK_MASK
+                if closed[block][index] != state.generation and f_scores[block][index] == f_score:
+                    break
+                heap.pop()
+                stale_pops += 1
+
+        if forward_heap.empty() or backward_heap.empty():
+            break
+        if forward_heap.peek()[0] >= best_cost or backward_heap.peek()[0] >= best_cost:
+            break
+
+        # Expand the frontier with the lower f_score.
+        if forward_heap.peek()[0] <= backward_heap.peek()[0]:
+            frontier, other_frontier = forward_frontier, backward_frontier
+        else:
+            frontier, other_frontier = backward_frontier, forward_frontier
+            expanded_backward += 1
+        expanded += 1
+
+        state, heap, h_score, g_scores, f_scores, came_from, stamps, closed = frontier
+        other, _, _, other_g_scores, _, _, other_stamps, _ = other_frontier
+        generation = state.generation
+        _, current_id = heap.pop()
+        closed[current_id >> BLOCK_SHIFT][current_id & BLOCK_MASK] = generation
+        g_score = g_scores[current_id >> BLOCK_SHIFT][current_id & BLOCK_MASK]
+
+        for neighbour_id in grid.get_neighbours(current_id):
+            block, index = neighbour_id >> BLOCK_SHIFT, neighbour_id & BLOCK_MASK
+            if closed[block][index] == generation:
+                continue
+
+            # The backward frontier follows moves in reverse, from the cell moved into back to the cell the move starts
+            # from.
+            if state is forward:
+                new_g_score = g_score + move_cost(diagonal, width, costs, current_id, neighbour_id)
+            else:
+                new_g_score = g_score + move_cost(diagonal, width, costs, neighbour_id, current_id)
+
+            if stamps[block][index] != generation or new_g_score < g_scores[block][index]:
+                if stamps[block] is unstamped:
+                    state.allocate_block(block)
+                came_from[block][index] = current_id
+                g_scores[block][index] = new_g_score
+                f_scores[block][index] = f_score = new_g_score + h_score(neighbour_id)
+                stamps[block][index] = generation
+
+                heap.push((f_score, neighbour_id))
+                pushes += 1
+
+                # The frontiers meet at this cell; remember the path through it if it's the best so far.
+                if other_stamps[block][index] == other.generation and \
+                   new_g_score + other_g_scores[block][index] < best_cost:
+                    best_cost = new_g_score + other_g_scores[block][index]
+                    meeting_id = neighbour_id
+
+    if stats is not None:
+        stats.expanded += expanded
+        stats.expanded_backward += expanded_backward
+        stats.pushes += pushes
+        stats.stale_pops += stale_pops
+
+    if meeting_id == -1:
+        return []
+
+    # Join the path from the start to the meeting cell with the path from the meeting cell to the end.
+    path = construct_path(start, meeting_id, forward.came_from) or [start]
+    current = meeting_id
+    while current != end:
+        current = backward.came_from[current]
+        path.append(current)
+
+    if stats is not None:
+        stats.path_length += len(path)
+    return path
+
+
+def move_cost(diagonal: bool, width: int, costs: Optional[Buffer], cell_id: Cell_ID, neighbour_id: Cell_ID) -> float:
+    """ Cost of moving from a cell to a neighbouring cell: moves that change both the row and column are diagonal, and
+    moves into terrain cost more. costs is the cost of entering each cell, or None if every cell costs the same. Moves
+    are costed the same when followed in reverse by swapping the cells.
+    """
+    if diagonal and cell_id % width != neighbour_id % width and cell_id // width != neighbour_id // width:
+        cost = DIAGONAL_COST
+    else:
+        cost = ADJACENT_COST
+    return cost if costs is None else cost * costs[neighbour_id]
+
+
+def expand_path(grid: Grid, jump_points: List[Cell_ID]) -> List[Cell_ID]:
+    """ Fill in the cells between consecutive points of a path made of straight and diagonal lines. """
+    if not jump_points:
+        return []
+
+    path = [jump_points[0]]
+    for jump_point in jump_points[1:]:
+        x, y = grid.cell_id_to_cell(path[-1])
+        end_x, end_y = grid.cell_id_to_cell(jump_point)
+        dx = (end_x > x) - (end_x < x)
+        dy = (end_y > y) - (end_y < y)
+        while (x, y) != (end_x, end_y):
+            x += dx
+            y += dy
+            path.append(grid.cell_to_cell_id((x, y)))
+    return path
+
+
+def construct_path(start: Cell_ID, end: Cell_ID, came_from: Union[Sequence[Cell_ID], BlockArray]) -> List[Cell_ID]:
+    """ Construct the shortest path taken from start to end, given the Cell ID that came before each cell. """
     if start == end:
         return []
 
@@ -123,12 +909,37 @@ def construct_path(start: Cell_ID, end: Cell_ID, cells: List[Node]) -> List[Cell
 
     # Create the path by working backwards.
     current = end
-    while current is not start:
-        came_from = cells[current].came_from
-        assert came_from is not None
-
-        path.append(came_from)
-        current = came_from
+    while current != start:
+        current = came_from[current]
+        path.append(current)
 
     path.reverse()
     return path
+
+
+def _open_queue(grid: Grid, state: SearchState, heuristic: Optional[Heuristic],
+                queue: Optional[QueueType]) -> Union[Heap, Indexed_Queue]:
+    """ Get an empty priority queue of the given type for a search. By default, this is a bucket queue if the search's
+    scores are all whole numbers and the lazy heap otherwise. Raises ValueError if a bucket queue is asked for but the
+    scores might not be whole numbers.
+    """
+    whole_scores = not grid.diagonal and (heuristic or default_heuristic(grid)) in (Heuristic.MANHATTAN, Heuristic.ZERO)
+    if queue is None:
+        queue = QueueType.BUCKET if whole_scores else QueueType.LAZY
+
+    if queue is QueueType.LAZY:
+        return Heap()
+    if queue is QueueType.BUCKET and not whole_scores:
+        raise ValueError("A bucket queue needs whole-number scores: 4-way movement with the Manhattan or zero "
+                         "heuristic")
+    return state.get_queue(queue)
+
+
+def _start_search(grid: Grid, state: Optional[SearchState]) -> SearchState:
+    """ Get a reset search state for a search on the grid, using the cached state for its size if none is given. """
+    if state is None:
+        state = get_search_state(grid.get_num_cells())
+    else:
+        state.reset()
+    assert len(state) == grid.get_num_cells()
+    return state
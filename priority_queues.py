@@ -0,0 +1,224 @@
+from enum import Enum
+from typing import Dict, List, Tuple
+
+# Type definitions.
+Cell_ID = int
+Entry = Tuple[float, Cell_ID]
+
+# Position of a cell that isn't in a queue.
+NOT_QUEUED = -1
+
+
+class QueueType(Enum):
+    """ This class defines the priority queues a_star can keep its open cells in.
+
+    The lazy heap is heapq: improving a cell's score pushes a second entry, and out of date entries are discarded when
+    they are popped. The indexed heap updates the cell's entry in place instead, so the heap never holds duplicates.
+    The bucket queue also updates in place and needs no comparisons at all, but only works when every score is a whole
+    number (4-connected grids with the Manhattan or zero heuristic).
+    """
+    LAZY = 'Lazy Heap'
+    INDEXED = 'Indexed Heap'
+    BUCKET = 'Bucket Queue'
+
+
+class IndexedHeap:
+    """ Binary min-heap of cells with a decrease-key operation. The heap knows where each cell is in it, so pushing a
+    cell that is already queued updates its priority in place instead of adding a duplicate entry. The heap never holds
+    more entries than there are cells, and nothing popped from it is ever out of date.
+
+    Positions are only kept for the cells in the heap, so the heap costs as much as the cells a search queues rather
+    than the size of the grid, and clear() only touches the cells still in the heap.
+
+    Instance Variables:
+        __entries: (priority, Cell ID) entries in heap order. Ties are broken by Cell ID, as with heapq.
+        __positions: Index of each queued cell's entry in __entries.
+    """
+    __entries: List[Entry]
+    __positions: Dict[Cell_ID, int]
+
+    def __init__(self) -> None:
+        self.__entries = []
+        self.__positions = {}
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def __contains__(self, cell_id: Cell_ID) -> bool:
+        return cell_id in self.__positions
+
+    def empty(self) -> bool:
+        return not self.__entries
+
+    def peek(self) -> Entry:
+        return self.__entries[0]
+
+    def push(self, entry: Entry) -> None:
+        """ Add a cell to the heap, or change its priority if it is already in the heap. """
+        position = self.__positions.get(entry[1], NOT_QUEUED)
+        if position == NOT_QUEUED:
+            self.__entries.append(entry)
+            self.__sift_up(len(self.__entries) - 1, entry)
+        elif entry < self.__entries[position]:
+            self.__sift_up(position, entry)
+        else:
+            self.__sift_down(position, entry)
+
+    def pop(self) -> Entry:
+        """ Remove and return the entry with the lowest priority. """
+        entries = self.__entries
+        last = entries.pop()
+        if not entries:
+            del self.__positions[last[1]]
+            return last
+
+        top = entries[0]
+        del self.__positions[top[1]]
+        self.__sift_down(0, last)
+        return top
+
+    def clear(self) -> None:
+        """ Remove every entry. """
+        self.__positions.clear()
+        self.__entries.clear()
+
+    def __sift_up(self, position: int, entry: Entry) -> None:
+        """ Place an entry at a position, moving it towards the root until its parent has a lower priority. """
+        entries = self.__entries
+        positions = self.__positions
+        while position > 0:
+            parent_position = (position - 1) >> 1
+            parent = entries[parent_position]
+            if not entry < parent:
+                break
+            entries[position] = parent
+            positions[parent[1]] = position
+            position = parent_position
+
+        entries[position] = entry
+        positions[entry[1]] = position
+
+    def __sift_down(self, position: int, entry: Entry) -> None:
+        """ Place an entry at a position, moving it towards the leaves until both children have higher priorities. """
+        entries = self.__entries
+        positions = self.__positions
+        size = len(entries)
+        while True:
+            child_position = 2 * position + 1
+            if child_position >= size:
+                break
+
+            # Move towards the child with the lower priority.
+            child = entries[child_position]
+            if child_position + 1 < size and entries[child_position + 1] < child:
+                child_position += 1
+                child = entries[child_position]
+            if not child < entry:
+                break
+
+            entries[position] = child
+            positions[child[1]] = position
+            position = child_position
+
+        entries[position] = entry
+        positions[entry[1]] = position
+
+
+class BucketQueue:
+    """ Priority queue for whole-number priorities: one bucket (a list of cells) per priority, and a cursor at the
+    lowest bucket that may hold a cell. Pushing and decreasing a key are O(1), and popping only moves the cursor past
+    empty buckets. A* with a consistent heuristic pops priorities in non-decreasing order, so the cursor only moves
+    forward and a whole search costs O(cells + highest priority).
+
+    Cells with the same priority are popped last in, first out, which favours cells further from the start.
+
+    Instance Variables:
+        __buckets: Cells with each priority, indexed by priority. Grown as higher priorities are pushed.
+        __lowest: Priority of the lowest bucket that may be non-empty.
+        __size: Number of cells in the queue.
+        __priorities: Priority of each queued cell, i.e. the bucket it is in.
+        __positions: Index of each queued cell in its bucket.
+    """
+    __buckets: List[List[Cell_ID]]
+    __lowest: int
+    __size: int
+    __priorities: Dict[Cell_ID, int]
+    __positions: Dict[Cell_ID, int]
+
+    def __init__(self) -> None:
+        self.__buckets = []
+        self.__lowest = 0
+        self.__size = 0
+        self.__priorities = {}
+        self.__positions = {}
+
+    def __len__(self) -> int:
+        return self.__size
+
+    def __contains__(self, cell_id: Cell_ID) -> bool:
+        return cell_id in self.__positions
+
+    def empty(self) -> bool:
+        return not self.__size
+
+    def peek(self) -> Entry:
+        self.__advance()
+        return (self.__lowest, self.__buckets[self.__lowest][-1])
+
+    def push(self, entry: Entry) -> None:
+        """ Add a cell to the queue, or change its priority if it is already queued. The priority must be a
+        non-negative whole number.
+        """
+        priority = int(entry[0])
+        cell_id = entry[1]
+        assert priority == entry[0] and priority >= 0
+
+        if cell_id not in self.__positions:
+            self.__size += 1
+        else:
+            self.__remove(cell_id)
+
+        buckets = self.__buckets
+        if priority >= len(buckets):
+            buckets.extend([] for _ in range(priority + 1 - len(buckets)))
+        bucket = buckets[priority]
+        self.__positions[cell_id] = len(bucket)
+        self.__priorities[cell_id] = priority
+        bucket.append(cell_id)
+
+        if priority < self.__lowest:
+            self.__lowest = priority
+
+    def pop(self) -> Entry:
+        """ Remove and return the entry with the lowest priority. """
+        self.__advance()
+        cell_id = self.__buckets[self.__lowest].pop()
+        del self.__positions[cell_id]
+        del self.__priorities[cell_id]
+        self.__size -= 1
+        return (self.__lowest, cell_id)
+
+    def clear(self) -> None:
+        """ Remove every entry. """
+        for bucket in self.__buckets[self.__lowest:]:
+            bucket.clear()
+        self.__positions.clear()
+        self.__priorities.clear()
+        self.__lowest = 0
+        self.__size = 0
+
+    def __advance(self) -> None:
+        """ Move the cursor to the lowest non-empty bucket. The queue must not be empty. """
+        assert self.__size
+        buckets = self.__buckets
+        while not buckets[self.__lowest]:
+            self.__lowest += 1
+
+    def __remove(self, cell_id: Cell_ID) -> None:
+        """ Take a queued cell out of its bucket by swapping the bucket's last cell into its place. """
+        bucket = self.__buckets[self.__priorities[cell_id]]
+        position = self.__positions[cell_id]
+        last = bucket.pop()
+        if last != cell_id:
+            bucket[position] = last
+            self.__positions[last] = position
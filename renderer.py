@@ -0,0 +1,459 @@
+import abc
+import tkinter as tk
+
+from optional_numpy import get_numpy
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+# Type definitions.
+Coordinate = Tuple[int, int]
+Cell_ID = int
+
+# Colour of the grid lines.
+LINE_COLOUR = '#000000'
+
+# Tag shared by every cell rectangle, so they can all be updated with a single canvas call.
+CELL_TAG = 'cell'
+
+# Highest viewport zoom level. At level n >= 0 each cell is 2^n pixels wide, and at level -n each pixel shows a block
+# of 2^n x 2^n cells.
+MAX_ZOOM_LEVEL = 5
+
+# Maximum number of colours (not counting base colours) a viewport can draw. Without NumPy, blocks of cells are
+# combined by giving each colour a bit of a byte and OR-ing the cells together.
+MAX_VIEWPORT_COLOURS = 8
+
+# Translation tables from colour codes to their bits, and from a combination of bits to the highest code among them.
+# Combining cells is then a bitwise OR, which runs over whole rows of cells at once.
+_COLOUR_BITS = bytes([0] + [1 << bit for bit in range(MAX_VIEWPORT_COLOURS)] + [0] * (255 - MAX_VIEWPORT_COLOURS))
+_HIGHEST_CODE = bytes(mask.bit_length() for mask in range(256))
+
+# Translation table from colour codes to a byte with every bit set, or none for an empty cell.
+_FILLED = bytes([0] + [0xFF] * 255)
+
+
+class Renderer(abc.ABC):
+    """ Keeps the colour of every cell of a grid in a compact layer, one byte per cell, and draws it on a canvas. A
+    second layer of the same size holds base colours (e.g. terrain or a heatmap), which show wherever a cell is empty
+    and are kept when cells are filled over them and emptied again. Base colours have their own codes, after the other
+    colours in the palette.
+
+    Changes are not drawn straight away. The cells that changed are collected until tkinter is idle and then drawn
+    together by redraw(), so a cell that changes several times in one frame is only drawn once. Subclasses decide how
+    cells are drawn.
+
+    Instance Variables:
+        canvas: Canvas the grid is drawn on.
+        columns: Number of columns in the grid.
+        rows: Number of rows in the grid.
+        palette: Colour of each code in the layers. Code 0 is an empty cell, then come the colours and the base
+            colours. Colours later in the palette are drawn over earlier ones when several cells share a pixel.
+        layer: Colour code of each cell, indexed by Cell ID.
+        base: Base colour code of each cell, indexed by Cell ID.
+        __codes: Code of each colour in the palette.
+        __base_cells: Number of cells with a base colour.
+        __dirty: Cells changed since the last redraw, or None if every cell may have changed.
+        __flush_job: ID of the scheduled flush, or None if there are no pending changes.
+    """
+    canvas: tk.Canvas
+    columns: int
+    rows: int
+    palette: List[Optional[str]]
+    layer: bytearray
+    base: bytearray
+    __codes: Dict[str, int]
+    __base_cells: int
+    __dirty: Optional[Set[Cell_ID]]
+    __flush_job: Optional[str]
+
+    def __init__(self, canvas: tk.Canvas, columns: int, rows: int, colours: Sequence[str],
+                 base_colours: Sequence[str] = ()) -> None:
+        assert len(colours) + len(base_colours) < 256
+        self.canvas = canvas
+        self.columns = columns
+        self.rows = rows
+        self.palette = [None, *colours, *base_colours]
+        self.layer = bytearray(columns * rows)
+        self.base = bytearray(columns * rows)
+        self.__codes = {colour: code for code, colour in enumerate(self.palette) if colour is not None}
+        self.__base_cells = 0
+        self.__dirty = set()
+        self.__flush_job = None
+
+    def colour(self, cell_id: Cell_ID) -> Optional[str]:
+        """ Get the colour of a cell, or None if it is empty. """
+        return self.palette[self.layer[cell_id]]
+
+    def fill(self, cell_id: Cell_ID, colour: str) -> None:
+        """ Colour a cell. """
+        self.__set(cell_id, self.__codes[colour])
+
+    def erase(self, cell_id: Cell_ID) -> None:
+        """ Empty a cell. """
+        self.__set(cell_id, 0)
+
+    def fill_mask(self, mask: bytes, colour: str) -> None:
+        """ Colour every cell whose byte in the mask (one byte per cell, indexed by Cell ID) is non-zero, and empty the
+        rest, in a single pass.
+        """
+        table = bytearray([self.__codes[colour]]) * 256
+        table[0] = 0
+        self.layer[:] = mask.translate(table)
+        self.invalidate()
+
+    def fill_base(self, cell_id: Cell_ID, colour: Optional[str]) -> None:
+        """ Set the base colour of a cell, or remove it if colour is None. """
+        code = self.__codes[colour] if colour is not None else 0
+        if self.base[cell_id] == code:
+            return
+
+        self.__base_cells += bool(code) - bool(self.base[cell_id])
+        self.base[cell_id] = code
+        self.__mark(cell_id)
+
+    def fill_base_layer(self, values: bytes, colours: Sequence[Optional[str]]) -> None:
+        """ Set the base colour of every cell in a single pass, from one byte per cell (indexed by Cell ID) and the
+        colour of each byte value (None for no base colour).
+        """
+        table = bytes(self.__codes[colour] if colour is not None else 0 for colour in colours)
+        self.base[:] = bytes(values).translate(table.ljust(256, b'\0'))
+        self.__base_cells = len(self.base) - self.base.count(0)
+        self.invalidate()
+
+    def has_base(self) -> bool:
+        """ Return whether any cell has a base colour. """
+        return self.__base_cells > 0
+
+    def remove(self, colours: Sequence[str]) -> None:
+        """ Empty every cell that has one of the given colours, in a single pass over the layer. """
+        table = bytearray(range(256))
+        for colour in colours:
+            table[self.__codes[colour]] = 0
+        self.layer[:] = self.layer.translate(table)
+        self.invalidate()
+
+    def clear(self) -> None:
+        """ Empty every cell and remove every base colour. """
+        self.layer[:] = bytes(len(self.layer))
+        self.base[:] = bytes(len(self.base))
+        self.__base_cells = 0
+        self.invalidate()
+
+    def invalidate(self) -> None:
+        """ Schedule every cell to be drawn, e.g. after the view moves. """
+        self.__dirty = None
+        self.__schedule()
+
+    def flush(self) -> None:
+        """ Draw all pending changes. This runs automatically when tkinter is idle, but can be called to draw them
+        sooner.
+        """
+        if self.__flush_job is not None:
+            self.canvas.after_cancel(self.__flush_job)
+            self.__flush_job = None
+
+        dirty = self.__dirty
+        self.__dirty = set()
+        if dirty is None or dirty:
+            self.redraw(dirty)
+
+    @abc.abstractmethod
+    def redraw(self, cell_ids: Optional[Set[Cell_ID]]) -> None:
+        """ Draw the given cells as they are in the layer (or in the base layer, if they are empty), or every cell if
+        cell_ids is None.
+        """
+
+    @abc.abstractmethod
+    def canvas_to_cell(self, x: int, y: int) -> Coordinate:
+        """ Get the coordinates of the cell drawn at a point on the canvas. """
+
+    def __set(self, cell_id: Cell_ID, code: int) -> None:
+        """ Change a cell's colour code and schedule it to be drawn. """
+        if self.layer[cell_id] == code:
+            return
+
+        self.layer[cell_id] = code
+        self.__mark(cell_id)
+
+    def __mark(self, cell_id: Cell_ID) -> None:
+        """ Schedule a cell to be drawn. """
+        if self.__dirty is not None:
+            self.__dirty.add(cell_id)
+        self.__schedule()
+
+    def __schedule(self) -> None:
+        """ Schedule a flush, if one isn't scheduled already. """
+        if self.__flush_job is None:
+            self.__flush_job = self.canvas.after_idle(self.flush)
+
+
+class CellRenderer(Renderer):
+    """ Draws every cell as its own rectangle, on top of grid lines. Every cell has a rectangle allocated up front,
+    which is recoloured, shown and hidden with itemconfig instead of being created and deleted, and the grid lines are a
+    single image under the rectangles. Only suitable for grids small enough to show in full.
+
+    Instance Variables:
+        cell_width: Width of a cell (in pixels).
+        cell_height: Height of a cell (in pixels).
+        __lines: Image of the grid lines. tkinter doesn't keep a reference to it, so the renderer must.
+        __items: Canvas item ID of each cell's rectangle, indexed by Cell ID.
+        __drawn: Colour code each cell is drawn with on the canvas.
+    """
+    cell_width: int
+    cell_height: int
+    __lines: tk.PhotoImage
+    __items: List[int]
+    __drawn: bytearray
+
+    def __init__(self, canvas: tk.Canvas, columns: int, rows: int, colours: Sequence[str], cell_width: int,
+                 cell_height: int, base_colours: Sequence[str] = ()) -> None:
+        super().__init__(canvas, columns, rows, colours, base_colours)
+        self.cell_width = cell_width
+        self.cell_height = cell_height
+
+        # Draw the grid lines onto one image, filling a whole line per call.
+        width = columns * cell_width
+        height = rows * cell_height
+        self.__lines = tk.PhotoImage(master=canvas, width=width + 1, height=height + 1)
+        for x in range(0, width + 1, cell_width):
+            self.__lines.put(LINE_COLOUR, to=(x, 0, x + 1, height + 1))
+        for y in range(0, height + 1, cell_height):
+            self.__lines.put(LINE_COLOUR, to=(0, y, width + 1, y + 1))
+        canvas.create_image(0, 0, image=self.__lines, anchor=tk.NW)
+
+        # Allocate a hidden rectangle for every cell, on top of the grid lines.
+        self.__items = []
+        for cell_id in range(columns * rows):
+            x = cell_id % columns * cell_width
+            y = cell_id // columns * cell_height
+            self.__items.append(canvas.create_rectangle(x, y, x + cell_width, y + cell_height,
+                                                        state=tk.HIDDEN, tags=CELL_TAG))
+        self.__drawn = bytearray(columns * rows)
+
+    def redraw(self, cell_ids: Optional[Set[Cell_ID]]) -> None:
+        """ Recolour, show or hide the rectangles of the given cells. Cells that end up the colour they are already
+        drawn in aren't touched.
+        """
+        layer = self.layer
+        base = self.base
+        cells: Iterable[Cell_ID] = range(len(layer)) if cell_ids is None else cell_ids
+
+        # Hide every cell with a single call if the grid is empty.
+        if cell_ids is None and not self.has_base() and not any(layer):
+            self.canvas.itemconfig(CELL_TAG, state=tk.HIDDEN)
+            self.__drawn[:] = layer
+            return
+
+        drawn = self.__drawn
+        for cell_id in cells:
+            code = layer[cell_id] or base[cell_id]
+            if drawn[cell_id] == code:
+                continue
+
+            if code:
+                self.canvas.itemconfig(self.__items[cell_id], fill=self.palette[code], state=tk.NORMAL)
+            else:
+                self.canvas.itemconfig(self.__items[cell_id], state=tk.HIDDEN)
+            drawn[cell_id] = code
+
+    def canvas_to_cell(self, x: int, y: int) -> Coordinate:
+        """ Get the coordinates of the cell drawn at a point on the canvas. """
+        return (x // self.cell_width, y // self.cell_height)
+
+
+class ViewportRenderer(Renderer):
+    """ Draws the part of the grid visible through a fixed-size viewport as a single image, so the cost of a redraw
+    depends on the size of the viewport rather than the size of the grid. The viewport can be panned and zoomed. When
+    zoomed out far enough that a pixel covers a block of cells, the pixel takes the colour of the block's cell that is
+    latest in the palette, so obstacles, paths and endpoints stay visible at any zoom. Blocks with no coloured cells
+    take the base colour of their top left cell. The viewport can't be zoomed out further than it takes to show the
+    whole grid.
+
+    The image is built as a PPM at one pixel per cell (or per block of cells) and scaled up by Tk when zoomed in.
+
+    Instance Variables:
+        width: Width of the viewport (in pixels).
+        height: Height of the viewport (in pixels).
+        level: Zoom level. At level n >= 0 each cell is 2^n pixels wide, and at level -n each pixel shows a block of
+            2^n x 2^n cells.
+        scroll_x: Horizontal position of the viewport, in pixels at the current zoom level.
+        scroll_y: Vertical position of the viewport, in pixels at the current zoom level.
+        __min_level: Lowest zoom level, at which the whole grid is visible.
+        __rgb: Red, green and blue translation tables from colour codes to the bytes of a PPM image.
+        __image: Image currently shown. tkinter doesn't keep a reference to it, so the renderer must.
+        __item: Canvas item ID of the image.
+    """
+    width: int
+    height: int
+    level: int
+    scroll_x: int
+    scroll_y: int
+    __min_level: int
+    __rgb: Tuple[bytes, bytes, bytes]
+    __image: Optional[tk.PhotoImage]
+    __item: int
+
+    def __init__(self, canvas: tk.Canvas, columns: int, rows: int, colours: Sequence[str], width: int, height: int,
+                 background: str, base_colours: Sequence[str] = ()) -> None:
+        assert len(colours) <= MAX_VIEWPORT_COLOURS
+        super().__init__(canvas, columns, rows, colours, base_colours)
+        self.width = width
+        self.height = height
+        self.scroll_x = 0
+        self.scroll_y = 0
+
+        # Start zoomed in as far as possible with the whole grid visible.
+        self.level = MAX_ZOOM_LEVEL
+        while self.__scale(columns) > width or self.__scale(rows) > height:
+            self.level -= 1
+        self.__min_level = self.level
+
+        red, green, blue = bytearray(256), bytearray(256), bytearray(256)
+        for code, colour in enumerate(self.palette):
+            # winfo_rgb gives 16 bit channels.
+            red[code], green[code], blue[code] = (channel >> 8 for channel in canvas.winfo_rgb(colour or background))
+        self.__rgb = (bytes(red), bytes(green), bytes(blue))
+
+        self.__image = None
+        self.__item = canvas.create_image(0, 0, anchor=tk.NW)
+        self.redraw(None)
+
+    def pan(self, dx: int, dy: int) -> None:
+        """ Move the viewport by the given number of pixels, without moving past the edges of the grid. """
+        self.__scroll_to(self.scroll_x + dx, self.scroll_y + dy)
+        self.invalidate()
+
+    def zoom(self, steps: int, x: int, y: int) -> None:
+        """ Zoom in (or out, for a negative number of steps) by factors of two, keeping the cell at the given point on
+        the canvas under it.
+        """
+        level = max(self.__min_level, min(MAX_ZOOM_LEVEL, self.level + steps))
+        if level == self.level:
+            return
+
+        # Position of the point in pixels at the new zoom level.
+        shift = level - self.level
+        point_x = (self.scroll_x + x) << shift if shift > 0 else (self.scroll_x + x) >> -shift
+        point_y = (self.scroll_y + y) << shift if shift > 0 else (self.scroll_y + y) >> -shift
+        self.level = level
+        self.__scroll_to(point_x - x, point_y - y)
+        self.invalidate()
+
+    def redraw(self, cell_ids: Optional[Set[Cell_ID]]) -> None:
+        """ Draw the visible part of the grid. Only the visible cells are read, whichever cells changed. """
+        if self.level >= 0:
+            # Draw a pixel per visible cell, and scale the image up to the zoom level.
+            pixels = 1 << self.level
+            first_column = self.scroll_x >> self.level
+            first_row = self.scroll_y >> self.level
+            offset_x = self.scroll_x & (pixels - 1)
+            offset_y = self.scroll_y & (pixels - 1)
+            width = min(self.columns - first_column, -(-(offset_x + self.width) // pixels))
+            height = min(self.rows - first_row, -(-(offset_y + self.height) // pixels))
+            codes = self.__read_cells(self.layer, first_column, first_row, width, height)
+            if self.has_base():
+                codes = _overlay(codes, self.__read_cells(self.base, first_column, first_row, width, height))
+        else:
+            pixels = 1
+            offset_x = offset_y = 0
+            width = min(self.__scale(self.columns) - self.scroll_x, self.width)
+            height = min(self.__scale(self.rows) - self.scroll_y, self.height)
+            codes = self.__read_blocks(self.scroll_x, self.scroll_y, width, height)
+
+        if width <= 0 or height <= 0:
+            return
+
+        red, green, blue = self.__rgb
+        rgb = bytearray(3 * len(codes))
+        rgb[0::3] = codes.translate(red)
+        rgb[1::3] = codes.translate(green)
+        rgb[2::3] = codes.translate(blue)
+
+        image = tk.PhotoImage(master=self.canvas, data=b'P6 %d %d 255\n' % (width, height) + rgb, format='PPM')
+        if pixels > 1:
+            image = image.zoom(pixels)
+        self.__image = image
+        self.canvas.itemconfig(self.__item, image=image)
+        self.canvas.coords(self.__item, -offset_x, -offset_y)
+
+    def canvas_to_cell(self, x: int, y: int) -> Coordinate:
+        """ Get the coordinates of the cell drawn at a point on the canvas. When zoomed out, this is the top left cell
+        of the block drawn there.
+        """
+        if self.level >= 0:
+            return ((self.scroll_x + x) >> self.level, (self.scroll_y + y) >> self.level)
+        return ((self.scroll_x + x) << -self.level, (self.scroll_y + y) << -self.level)
+
+    def __scale(self, cells: int) -> int:
+        """ Get the number of pixels a number of cells takes up at the current zoom level. """
+        if self.level >= 0:
+            return cells << self.level
+        return -(-cells >> -self.level)
+
+    def __scroll_to(self, scroll_x: int, scroll_y: int) -> None:
+        """ Move the viewport, keeping it within the grid. """
+        self.scroll_x = max(0, min(scroll_x, self.__scale(self.columns) - self.width))
+        self.scroll_y = max(0, min(scroll_y, self.__scale(self.rows) - self.height))
+
+    def __read_cells(self, layer: bytearray, first_column: int, first_row: int, width: int, height: int) -> bytes:
+        """ Get the codes of a rectangle of cells in a layer, row by row. """
+        return b''.join(layer[start:start + width]
+                        for start in range((first_row * self.columns) + first_column,
+                                           (first_row + height) * self.columns, self.columns))
+
+    def __read_blocks(self, first_x: int, first_y: int, width: int, height: int) -> bytes:
+        """ Get the highest code in each block of cells drawn in a rectangle of pixels, row by row, or the base code of
+        the block's top left cell if the block is empty.
+        """
+        block = 1 << -self.level
+        first_column = first_x * block
+        first_row = first_y * block
+        last_column = min(self.columns, (first_x + width) * block)
+        last_row = min(self.rows, (first_y + height) * block)
+
+        # NumPy is optional; without it, blocks are combined in pure Python.
+        numpy = get_numpy()
+        if numpy is not None:
+            cells = numpy.frombuffer(self.layer, dtype=numpy.uint8).reshape(self.rows, self.columns)
+            cells = cells[first_row:last_row, first_column:last_column]
+
+            # Pad the cells to whole blocks, then take the highest code in each block.
+            padded = numpy.zeros((height * block, width * block), dtype=numpy.uint8)
+            padded[:cells.shape[0], :cells.shape[1]] = cells
+            codes = padded.reshape(height, block, width, block).max(axis=(1, 3))
+            if self.has_base():
+                base = numpy.frombuffer(self.base, dtype=numpy.uint8).reshape(self.rows, self.columns)
+                corners = numpy.zeros((height, width), dtype=numpy.uint8)
+                sampled = base[first_row:last_row:block, first_column:last_column:block]
+                corners[:sampled.shape[0], :sampled.shape[1]] = sampled
+                codes = numpy.where(codes != 0, codes, corners)
+            return codes.tobytes()
+
+        span = last_column - first_column
+        pixels = bytearray()
+        for y in range(first_row, last_row, block):
+            # Combine the rows of cells in the block, then every block-th cell of the combined row at each offset.
+            rows = 0
+            for row_start in range(y * self.columns + first_column, min(y + block, last_row) * self.columns,
+                                   self.columns):
+                rows |= int.from_bytes(self.layer[row_start:row_start + span].translate(_COLOUR_BITS), 'little')
+            combined = rows.to_bytes(width * block, 'little')
+
+            row = 0
+            for offset in range(block):
+                row |= int.from_bytes(combined[offset::block], 'little')
+            codes = row.to_bytes(width, 'little').translate(_HIGHEST_CODE)
+            if self.has_base():
+                row_start = y * self.columns
+                corners = self.base[row_start + first_column:row_start + last_column:block]
+                codes = _overlay(codes, bytes(corners).ljust(width, b'\0'))
+            pixels += codes
+        return bytes(pixels)
+
+
+def _overlay(top: bytes, bottom: bytes) -> bytes:
+    """ Combine two equally long strings of codes, taking the code from the top wherever it isn't empty and from the
+    bottom elsewhere. This draws cells over their base colours.
+    """
+    filled = int.from_bytes(top.translate(_FILLED), 'little')
+    combined = int.from_bytes(top, 'little') | (int.from_bytes(bottom, 'little') & ~filled)
+    return combined.to_bytes(len(top), 'little')
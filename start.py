@@ -1,10 +1,135 @@
+import argparse
+import importlib
+import math
 import sys
-import window
+import time
 
+from typing import Dict, Optional, Sequence, Tuple
 
-def main() -> int:
+# Algorithms --headless can search with, as the module and name of each search function. Only the module of the
+# algorithm that is used gets imported.
+HEADLESS_ALGORITHMS: Dict[str, Tuple[str, str]] = {
+    'a_star': ('pathfinding', 'a_star'),
+    'jump_point_search': ('pathfinding', 'jump_point_search'),
+    'bidirectional_a_star': ('pathfinding', 'bidirectional_a_star'),
+    'hierarchical': ('hierarchical', 'hierarchical_search'),
+    'distance_field': ('distance_fields', 'distance_field_search'),
+    'weighted_a_star': ('anytime', 'weighted_a_star'),
+    'ara_star': ('anytime', 'ara_star'),
+}
+DEFAULT_HEADLESS_ALGORITHM = 'a_star'
+
+# Algorithms that take a heuristic weight and a budget of time and expansions.
+BUDGETED_HEADLESS_ALGORITHMS = ('weighted_a_star', 'ara_star')
+
+
+def solve(map_path: str, algorithm: str = DEFAULT_HEADLESS_ALGORITHM, start: Optional[Sequence[int]] = None,
+          end: Optional[Sequence[int]] = None, weight: Optional[float] = None, budget_ms: Optional[float] = None,
+          expansions: Optional[int] = None) -> int:
+    """ Find a path on a map file without opening a window, and print it as (x, y) coordinates along with how long
+    loading the map and searching took. Maps ending in .map are imported from the Moving AI format; the start and end
+    points stored in the map can be overridden with (x, y) coordinates. The heuristic weight and the budget of
+    milliseconds and expansions are passed to the budgeted algorithms (see BUDGETED_HEADLESS_ALGORITHMS); the others
+    don't take them. Returns 1 if there is no path, nowhere to search from or to, or the map can't be read.
+
+    Only the modules the search needs are imported, so tkinter is never loaded.
+    """
+    import mapfile
+    from pathfinding import SearchStats
+
+    module, name = HEADLESS_ALGORITHMS[algorithm]
+    search = getattr(importlib.import_module(module), name)
+
+    # Options the budgeted algorithms use their defaults for when they aren't given.
+    options = {option: value for option, value in (('weight', weight), ('expansions', expansions),
+                                                   ('seconds', budget_ms / 1000 if budget_ms is not None else None))
+               if value is not None}
+    assert algorithm in BUDGETED_HEADLESS_ALGORITHMS or not options
+
+    started = time.perf_counter()
+    try:
+        if map_path.endswith('.map'):
+            grid, start_id, end_id = mapfile.import_moving_ai(map_path)
+        else:
+            grid, start_id, end_id = mapfile.load_map(map_path)
+    except (OSError, ValueError) as error:
+        # Missing, empty or truncated files, and files that aren't maps.
+        print(f"Can't load {map_path}: {error}", file=sys.stderr)
+        return 1
+    load_seconds = time.perf_counter() - started
+
+    for point in (start, end):
+        if point is not None and grid.out_of_bounds(tuple(point)):
+            print(f"{point[0]},{point[1]} is outside the {grid.width}x{grid.height} map", file=sys.stderr)
+            return 1
+    if start is not None:
+        start_id = grid.cell_to_cell_id(tuple(start))
+    if end is not None:
+        end_id = grid.cell_to_cell_id(tuple(end))
+    if start_id is None or end_id is None:
+        print(f"{map_path} has no start or end point; give them with --start and --end", file=sys.stderr)
+        return 1
+
+    stats = SearchStats()
+    started = time.perf_counter()
+    try:
+        path = search(grid, start_id, end_id, stats=stats, **options)
+    except ValueError as error:
+        # Jump point search can't search maps with terrain.
+        print(f"Can't search {map_path} with {algorithm}: {error}", file=sys.stderr)
+        return 1
+    search_seconds = time.perf_counter() - started
+
+    if path:
+        print(' '.join("{},{}".format(*grid.cell_id_to_cell(cell_id)) for cell_id in path))
+        print(f"Path of {len(path)} cells", file=sys.stderr)
+    elif stats.suboptimality_bound == math.inf:
+        print("No path found within the budget!", file=sys.stderr)
+    else:
+        print("No path found!", file=sys.stderr)
+    print(f"Loaded {grid.width}x{grid.height} map in {load_seconds * 1000:.2f}ms, searched with {algorithm} in "
+          f"{search_seconds * 1000:.2f}ms ({stats.expanded} cells expanded)", file=sys.stderr)
+    return 0 if path else 1
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
     """ Entry point of the program. """
-    main_window = window.Window()
+    parser = argparse.ArgumentParser(description="Interactive visualization of pathfinding algorithms.")
+    parser.add_argument('--size', type=int, nargs=2, metavar=('COLUMNS', 'ROWS'),
+                        help="size of the grid in cells; grids too large to show in full can be panned and zoomed")
+    parser.add_argument('--headless', metavar='MAP',
+                        help="find a path on a map file and print it, without opening a window")
+    parser.add_argument('--algorithm', choices=list(HEADLESS_ALGORITHMS), default=DEFAULT_HEADLESS_ALGORITHM,
+                        help=f"algorithm --headless searches with (default: {DEFAULT_HEADLESS_ALGORITHM})")
+    parser.add_argument('--start', type=int, nargs=2, metavar=('X', 'Y'), help="start point for --headless")
+    parser.add_argument('--end', type=int, nargs=2, metavar=('X', 'Y'), help="end point for --headless")
+    parser.add_argument('--weight', type=float,
+                        help="heuristic weight (at least 1) for the weighted_a_star and ara_star --headless searches")
+    parser.add_argument('--budget-ms', type=float, metavar='MS',
+                        help="time budget in milliseconds for the weighted_a_star and ara_star --headless searches")
+    parser.add_argument('--expansions', type=int,
+                        help="most cells the weighted_a_star and ara_star --headless searches may expand")
+    args = parser.parse_args(argv)
+
+    budget_options = {'--weight': args.weight, '--budget-ms': args.budget_ms, '--expansions': args.expansions}
+    given = [option for option, value in budget_options.items() if value is not None]
+    if given and args.algorithm not in BUDGETED_HEADLESS_ALGORITHMS:
+        parser.error(f"{', '.join(given)} can only be used with --algorithm "
+                     f"{' or '.join(BUDGETED_HEADLESS_ALGORITHMS)}")
+    if args.weight is not None and args.weight < 1:
+        parser.error("--weight must be at least 1")
+    if (args.budget_ms is not None and args.budget_ms <= 0) or (args.expansions is not None and args.expansions <= 0):
+        parser.error("--budget-ms and --expansions must be positive")
+
+    if args.headless:
+        return solve(args.headless, args.algorithm, args.start, args.end, args.weight, args.budget_ms,
+                     args.expansions)
+
+    # The window (and tkinter with it) is only imported once it's known to be needed.
+    import window
+
+    columns, rows = args.size if args.size else (None, None)
+    main_window = window.Window(columns=columns, rows=rows)
     main_window.root.mainloop()
     return 0
 
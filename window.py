@@ -1,10 +1,22 @@
+import math
+import time
 import tkinter as tk
+import tkinter.filedialog as filedialog
 import tkinter.messagebox as messagebox
 
-from cell import Cell
+from anytime import DEFAULT_BUDGET_SECONDS, DEFAULT_WEIGHT, ara_star, weighted_a_star
+from distance_fields import distance_field_search, get_distance_field, heatmap
 from enum import Enum
-from idlelib import tooltip
-from typing import Dict, List, Optional, Tuple
+from grid import DEFAULT_COST, Grid
+from heuristics import Heuristic, default_heuristic
+from hierarchical import close_planners, hierarchical_search
+from incremental import IncrementalPlanner
+from mapfile import MapData, export_moving_ai, import_moving_ai, load_map, save_map
+from path_cache import PathCache
+from pathfinding import (SearchStats, SearchStep, a_star, a_star_steps, bidirectional_a_star, get_search_state,
+                         jump_point_search)
+from renderer import CellRenderer, Renderer, ViewportRenderer
+from typing import Generator, Iterable, List, Optional, Sequence, Set, Tuple
 
 # Type definitions.
 Coordinate = Tuple[int, int]
@@ -18,6 +30,8 @@ BUTTON_BG_PLACE_START = '#e8fffc'
 BUTTON_BG_PLACE_END = '#fff2fe'
 BUTTON_BG_CLEAR = '#fff'
 BUTTON_BG_START_ALGORITHM = '#f2fff4'
+BUTTON_BG_PAINT_TERRAIN = '#fff8e8'
+MENU_BG_OPTIONS = '#e3e3e3'
 
 # Strings for buttons.
 BUTTON_TEXT_PLACE_OBSTACLES = "Place Obstacles"
@@ -25,6 +39,89 @@ BUTTON_TEXT_PLACE_START = "Place Starting Point"
 BUTTON_TEXT_PLACE_END = "Place Ending Point"
 BUTTON_TEXT_CLEAR = "Clear"
 BUTTON_TEXT_START_ALGORITHM = "Start Pathfinding Algorithm"
+BUTTON_TEXT_PAUSE = "Pause"
+BUTTON_TEXT_RESUME = "Resume"
+BUTTON_TEXT_CANCEL = "Cancel"
+BUTTON_TEXT_SAVE = "Save Map"
+BUTTON_TEXT_LOAD = "Load Map"
+BUTTON_TEXT_PAINT_TERRAIN = "Paint Terrain"
+CHECKBUTTON_TEXT_LIVE_REROUTING = "Live Re-routing"
+CHECKBUTTON_TEXT_ANIMATE = "Animate Search"
+CHECKBUTTON_TEXT_DISTANCE_FIELD = "Show Distance Field"
+SCALE_TEXT_FRAME_BUDGET = "Frame Budget (ms)"
+SCALE_TEXT_TERRAIN_COST = "Terrain Cost"
+SCALE_TEXT_WEIGHT = "Heuristic Weight"
+SCALE_TEXT_TIME_BUDGET = "Time Budget (ms)"
+
+# Strings for the statistics of the last search.
+LABEL_TEXT_COUNTS = ("{algorithm}: {expanded:,} expanded, {pushes:,} pushes, {stale_pops:,} stale pops, "
+                     "path of {path_length:,} cells")
+LABEL_TEXT_TIME = "{milliseconds:.1f} ms"
+LABEL_TEXT_MAX_HEAP_SIZE = ", largest heap {max_heap_size:,}"
+LABEL_TEXT_PHASES = " (setup {setup:.1f} ms, search {search:.1f} ms, path {path:.1f} ms)"
+LABEL_TEXT_CACHED = "{algorithm}: path of {path_length:,} cells, from the cache"
+LABEL_TEXT_REROUTING = "Live re-routing: path of {path_length:,} cells"
+LABEL_TEXT_REROUTING_NO_PATH = "Live re-routing: no path"
+LABEL_TEXT_BOUND = ", at most {bound:.2f}x the shortest"
+
+# Text of the tooltip that explains the controls, and the time (in milliseconds) the mouse must hover before it shows.
+TOOLTIP_TEXT = ('Left-Click is used to select buttons and draw squares on the grid.\n'
+                'Right-Click is used to erase squares from the grid.\n'
+                'Terrain costs more to move through; paint it with the terrain brush, and erase it with Right-Click.\n'
+                'With live re-routing, obstacles and terrain can be drawn and erased while the path is shown.\n'
+                'The distance field shades every cell by its cost to the ending point, from light (near) to dark '
+                '(far).\n'
+                'Weighted A* and ARA* trade path length for speed: a higher weight finds a path sooner, and ARA* '
+                'improves it until the time budget runs out.\n'
+                'On grids too large to show in full, Middle-Click and drag to move around the grid, and scroll to zoom '
+                'in and out.')
+TOOLTIP_DELAY_MS = 100
+
+# Strings for drop-down menus.
+MENU_TEXT_MOVEMENT_FOUR = "4-Way Movement"
+MENU_TEXT_MOVEMENT_EIGHT = "8-Way Movement"
+
+# File types that maps can be saved as and loaded from. Moving AI maps are recognized by their extension.
+MAP_FILE_TYPES = [("Grid maps", "*.grid"), ("Moving AI maps", "*.map")]
+MOVING_AI_EXTENSION = ".map"
+
+# Time between frames of an animated search (about 60 frames per second), and the default time each frame may spend
+# searching. The rest of the frame is left for tkinter to redraw and handle input.
+FRAME_INTERVAL_MS = 16
+DEFAULT_FRAME_BUDGET_MS = 8
+
+# Number of cells an animated search expands between checks of the frame budget.
+SEARCH_BATCH_SIZE = 32
+
+# Slot of the cached search state that animated searches use. The searches run from the window without animating use
+# slots 0 and 1, and finish before the next event is handled, but an animated search keeps its state between frames.
+ANIMATED_SEARCH_SLOT = 2
+
+# Range of costs the terrain brush paints with, and its default cost. Terrain that costs at least HEAVY_TERRAIN_COST to
+# enter is drawn in a darker colour.
+MIN_TERRAIN_COST = 2
+MAX_TERRAIN_COST = 9
+DEFAULT_TERRAIN_COST = 3
+HEAVY_TERRAIN_COST = 5
+
+# Range of the heuristic weight and the time budget (in milliseconds) that weighted and anytime searches can be given.
+MAX_WEIGHT = 5
+WEIGHT_RESOLUTION = 0.1
+MAX_TIME_BUDGET_MS = 1000
+
+# Algorithms that can be chosen in the algorithm drop-down menu, by name.
+ALGORITHMS = {
+    "A*": a_star,
+    "Jump Point Search": jump_point_search,
+    "Bidirectional A*": bidirectional_a_star,
+    "HPA* (Near-Optimal)": hierarchical_search,
+    "Distance Field": distance_field_search,
+    "Weighted A*": weighted_a_star,
+    "ARA* (Anytime)": ara_star,
+}
+
+# Algorithms that take the heuristic weight and the time budget.
+BUDGETED_ALGORITHMS = (weighted_a_star, ara_star)
 
 
 class Colours(Enum):
@@ -33,12 +130,42 @@ class Colours(Enum):
     START = 'cyan'
     END = 'magenta'
     PATH = 'green'
+    OPEN = 'khaki'
+    CLOSED = 'light blue'
+    LIGHT_TERRAIN = 'wheat'
+    HEAVY_TERRAIN = 'peru'
+
+
+# Colours of the distance field heatmap, from the cells nearest the end to the furthest.
+HEATMAP_COLOURS = ['#ffffd9', '#edf8b1', '#c7e9b4', '#7fcdbb', '#41b6c4', '#1d91c0', '#225ea8', '#0c2c84']
+
+# Colours cells can be drawn in, from lowest to highest priority when the grid is zoomed out far enough that several
+# cells share a pixel.
+CELL_COLOURS = [Colours.OPEN.value, Colours.CLOSED.value, Colours.OBSTACLE.value, Colours.PATH.value,
+                Colours.START.value, Colours.END.value]
+
+# Colours drawn under empty cells: terrain, or the distance field heatmap while it is shown.
+BASE_COLOURS = [Colours.LIGHT_TERRAIN.value, Colours.HEAVY_TERRAIN.value, *HEATMAP_COLOURS]
+
+
+def terrain_colour(cost: int) -> Optional[str]:
+    """ Get the colour terrain with the given cost is drawn in, or None if it costs no more than an empty cell. """
+    if cost <= DEFAULT_COST:
+        return None
+    return Colours.HEAVY_TERRAIN.value if cost >= HEAVY_TERRAIN_COST else Colours.LIGHT_TERRAIN.value
+
+
+# Colour of each terrain cost, for drawing a whole cost layer at once.
+TERRAIN_COLOURS = [terrain_colour(cost) for cost in range(256)]
 
 
 class Window:
     """ This class defines all window-related behaviour, including updating the window with the algorithm's progress and
     allowing the user to create and destroy obstacles before running the algorithm.
 
+    Grids too large to show in full at the normal cell size are shown through a viewport, which can be panned by
+    dragging with the middle mouse button and zoomed with the mouse wheel.
+
     Class Variables:
         cell_width: Width of a cell in the grid (in pixels).
         cell_height: Height of a cell in the grid (in pixels).
@@ -48,13 +175,39 @@ class Window:
         height: Height of the window (in pixels).
         __root: Represents the tkinter window.
         __canvas: Displayed in the window and holds all elements drawn.
-        __colour: Current colour chosen to draw cells with.
-        __cells: Dictionary of Cell ID to Cell structure. The cell ID is calculated based on the (x,y) position of the
-            cell in the grid.
+        __renderer: Keeps the colour of every cell and draws the grid on the canvas.
+        __pan_origin: Last position of the mouse while panning the viewport.
+        __colour: Current colour chosen to draw cells with. Colours.LIGHT_TERRAIN stands for the terrain brush, which
+            paints the cost chosen with __terrain_cost.
         __start: Cell ID that represents the starting point of the algorithm.
         __end: Cell ID that represents the ending point of the algorithm.
-        __shortest_path: Dictionary of Cell ID to Cell structure. These cells are excluded from the other cells
-            dictionary because they are cleared at different times.
+        __shortest_path: Cell IDs of the drawn shortest path, excluding its start and end points.
+        __grid: Headless grid model that mirrors the obstacles drawn on the canvas. This is what the pathfinding
+            algorithm runs on.
+        __path_cache: Cache of shortest paths found on the grid, so re-running the algorithm on an unchanged grid
+            doesn't repeat the search.
+        __heuristic: Name of the heuristic chosen in the heuristic drop-down menu.
+        __movement: Movement model chosen in the movement drop-down menu.
+        __algorithm: Name of the algorithm chosen in the algorithm drop-down menu.
+        __live_rerouting: Whether the path should be re-routed as obstacles are drawn and erased.
+        __planner: Planner that keeps the drawn path up to date while live re-routing, or None if not re-routing.
+        __animate: Whether A* searches should be animated.
+        __frame_budget: Slider for the time (in milliseconds) each frame of an animated search may spend searching.
+        __terrain_cost: Slider for the cost the terrain brush paints with.
+        __show_distance_field: Whether the distance field to the end is shown as a heatmap instead of the terrain.
+        __distance_field_stale: Whether the grid or the end changed during the current drag, so the heatmap needs
+            redrawing when the mouse button is released.
+        __weight: Slider for the heuristic weight of weighted and anytime searches.
+        __time_budget: Slider for the time (in milliseconds) weighted and anytime searches may spend searching.
+        __search: Animated search in progress, or None if there isn't one.
+        __search_heuristic: Heuristic used by the animated search.
+        __search_job: ID of the tkinter callback scheduled to run the next frame of the animated search, or None if the
+            search is paused.
+        __search_stats: Statistics of the animated search.
+        __pause_button: Button that pauses and resumes the animated search.
+        __cancel_button: Button that cancels the animated search.
+        __stats: Statistics of the last search run, or None if the last path didn't need a search (or there wasn't one).
+        __stats_label: Label that shows the statistics of the last search.
     """
     cell_width: int = 25
     cell_height: int = 25
@@ -63,20 +216,53 @@ class Window:
     height: int
     __root: tk.Tk
     __canvas: tk.Canvas
+    __renderer: Renderer
+    __pan_origin: Coordinate
     __colour: str
-    __cells: Dict[Cell_ID, Cell]
     __start: Optional[Cell_ID]
     __end: Optional[Cell_ID]
-    __shortest_path: Dict[Cell_ID, Cell]
-
-    def __init__(self, width: int = 500, height: int = 500) -> None:
+    __shortest_path: Set[Cell_ID]
+    __grid: Grid
+    __path_cache: PathCache
+    __heuristic: tk.StringVar
+    __movement: tk.StringVar
+    __algorithm: tk.StringVar
+    __live_rerouting: tk.BooleanVar
+    __planner: Optional[IncrementalPlanner]
+    __animate: tk.BooleanVar
+    __frame_budget: tk.Scale
+    __terrain_cost: tk.Scale
+    __show_distance_field: tk.BooleanVar
+    __distance_field_stale: bool
+    __weight: tk.Scale
+    __time_budget: tk.Scale
+    __search: Optional[Generator[SearchStep, None, List[Cell_ID]]]
+    __search_heuristic: Heuristic
+    __search_job: Optional[str]
+    __search_stats: SearchStats
+    __pause_button: tk.Button
+    __cancel_button: tk.Button
+    __stats: Optional[SearchStats]
+    __stats_label: tk.Label
+
+    def __init__(self, width: int = 500, height: int = 500, columns: Optional[int] = None,
+                 rows: Optional[int] = None) -> None:
+        """ Create a window with a width x height canvas, showing a grid of columns x rows cells. By default the grid
+        fills the canvas.
+        """
         self.width = width
         self.height = height
         self.__colour = Colours.OBSTACLE.value
-        self.__cells = {}
         self.__start = None
         self.__end = None
-        self.__shortest_path = {}
+        self.__shortest_path = set()
+        self.__grid = Grid(columns or width // self.cell_width, rows or height // self.cell_height)
+        self.__path_cache = PathCache()
+        self.__planner = None
+        self.__distance_field_stale = False
+        self.__search = None
+        self.__search_job = None
+        self.__stats = None
 
         # Initialize window sections that interactive elements will live.
         self.__root = tk.Tk()
@@ -90,11 +276,7 @@ class Window:
 
     def __create_canvas(self) -> None:
         """ Draw the grid and register callback functions for when a user clicks the screen. """
-        # Create vertical and horizontal lines that define the grid and draw them on the canvas.
-        for x in range(0, self.width+1, self.cell_width):
-            self.__canvas.create_line([x, 0], [x, self.height])
-        for y in range(0, self.height+1, self.cell_height):
-            self.__canvas.create_line([0, y], [self.width, y])
+        self.__create_renderer()
         self.__canvas.pack()
 
         # Left mouse button should create a cell, right mouse button should erase a cell.
@@ -102,6 +284,31 @@ class Window:
         self.__canvas.bind('<Button-1>', self.__draw_callback)
         self.__canvas.bind('<B3-Motion>', self.__erase_callback)
         self.__canvas.bind('<Button-3>', self.__erase_callback)
+        # The distance field is recomputed once per stroke rather than for every cell drawn or erased.
+        self.__canvas.bind('<ButtonRelease-1>', self.__release_callback)
+        self.__canvas.bind('<ButtonRelease-3>', self.__release_callback)
+
+    def __create_renderer(self) -> None:
+        """ Create the renderer for the grid, replacing anything drawn on the canvas. """
+        self.__canvas.delete(tk.ALL)
+
+        columns = self.__grid.width
+        rows = self.__grid.height
+        viewport_events = ('<Button-2>', '<B2-Motion>', '<MouseWheel>', '<Button-4>', '<Button-5>')
+        if columns * self.cell_width <= self.width and rows * self.cell_height <= self.height:
+            self.__renderer = CellRenderer(self.__canvas, columns, rows, CELL_COLOURS, self.cell_width,
+                                           self.cell_height, BASE_COLOURS)
+            for event in viewport_events:
+                self.__canvas.unbind(event)
+        else:
+            # The grid is too large to show in full. Middle mouse button should pan the view, the mouse wheel should
+            # zoom it (<Button-4> and <Button-5> are the mouse wheel on X11).
+            self.__renderer = ViewportRenderer(self.__canvas, columns, rows, CELL_COLOURS, self.width, self.height,
+                                               CANVAS_BG_COLOUR, BASE_COLOURS)
+            callbacks = (self.__start_pan_callback, self.__pan_callback, self.__zoom_callback, self.__zoom_callback,
+                         self.__zoom_callback)
+            for event, callback in zip(viewport_events, callbacks):
+                self.__canvas.bind(event, callback)
 
     def __create_controls(self) -> None:
         """ Draw the buttons/tooltips and register callback functions for when a user clicks each button. """
@@ -156,23 +363,144 @@ class Window:
         button.configure(command=lambda: self.__find_shortest_path())
         button.grid(row=1, column=0, columnspan=4, sticky=tk.W+tk.E, padx=5, pady=(2.5, 2.5))
 
+        # Drop-down menus to choose the heuristic, movement model and algorithm used to find the path.
+        self.__heuristic = tk.StringVar(self.__controls, value=default_heuristic(self.__grid).value)
+        menu = tk.OptionMenu(self.__controls, self.__heuristic, *[heuristic.value for heuristic in Heuristic])
+        menu.configure(width=15, bg=MENU_BG_OPTIONS, highlightthickness=0)
+        menu.grid(row=2, column=0, padx=5, pady=(2.5, 2.5))
+
+        self.__movement = tk.StringVar(self.__controls, value=MENU_TEXT_MOVEMENT_FOUR)
+        menu = tk.OptionMenu(self.__controls, self.__movement, MENU_TEXT_MOVEMENT_FOUR, MENU_TEXT_MOVEMENT_EIGHT,
+                             command=lambda movement: self.__change_movement(movement))
+        menu.configure(width=15, bg=MENU_BG_OPTIONS, highlightthickness=0)
+        menu.grid(row=2, column=1, padx=5, pady=(2.5, 2.5))
+
+        self.__algorithm = tk.StringVar(self.__controls, value=next(iter(ALGORITHMS)))
+        menu = tk.OptionMenu(self.__controls, self.__algorithm, *ALGORITHMS)
+        menu.configure(width=15, bg=MENU_BG_OPTIONS, highlightthickness=0)
+        menu.grid(row=2, column=2, padx=5, pady=(2.5, 2.5))
+
+        # Checkbox to keep the path up to date while obstacles are drawn and erased.
+        self.__live_rerouting = tk.BooleanVar(self.__controls, value=False)
+        checkbutton = tk.Checkbutton(self.__controls, text=CHECKBUTTON_TEXT_LIVE_REROUTING,
+                                     variable=self.__live_rerouting, bg=FRAME_BG_COLOUR)
+        checkbutton.grid(row=3, column=0, padx=5, pady=(0, 2.5), sticky=tk.W)
+
+        # Controls for animating the search: whether to animate it, how much of each frame it may use, and buttons to
+        # pause and cancel it while it runs.
+        self.__animate = tk.BooleanVar(self.__controls, value=True)
+        checkbutton = tk.Checkbutton(self.__controls, text=CHECKBUTTON_TEXT_ANIMATE, variable=self.__animate,
+                                     bg=FRAME_BG_COLOUR)
+        checkbutton.grid(row=3, column=1, padx=5, pady=(0, 2.5), sticky=tk.W)
+
+        self.__pause_button = tk.Button(
+            self.__controls,
+            text=BUTTON_TEXT_PAUSE,
+            width=15,
+            bg=BUTTON_BG_CLEAR,
+            state=tk.DISABLED)
+        self.__pause_button.configure(command=lambda: self.__toggle_pause())
+        self.__pause_button.grid(row=3, column=2, padx=5, pady=(0, 2.5))
+
+        self.__cancel_button = tk.Button(
+            self.__controls,
+            text=BUTTON_TEXT_CANCEL,
+            width=15,
+            bg=BUTTON_BG_CLEAR,
+            state=tk.DISABLED)
+        self.__cancel_button.configure(command=lambda: self.__cancel_search())
+        self.__cancel_button.grid(row=3, column=3, padx=5, pady=(0, 2.5))
+
+        self.__frame_budget = tk.Scale(self.__controls, label=SCALE_TEXT_FRAME_BUDGET, from_=1, to=FRAME_INTERVAL_MS,
+                                       orient=tk.HORIZONTAL, bg=FRAME_BG_COLOUR, highlightthickness=0)
+        self.__frame_budget.set(DEFAULT_FRAME_BUDGET_MS)
+        self.__frame_budget.grid(row=4, column=0, columnspan=2, sticky=tk.W+tk.E, padx=5, pady=(0, 2.5))
+
+        button = tk.Button(
+            self.__controls,
+            text=BUTTON_TEXT_SAVE,
+            width=15,
+            bg=BUTTON_BG_CLEAR)
+        button.configure(command=lambda: self.__save_map())
+        button.grid(row=4, column=2, padx=5, pady=(0, 2.5))
+
+        button = tk.Button(
+            self.__controls,
+            text=BUTTON_TEXT_LOAD,
+            width=15,
+            bg=BUTTON_BG_CLEAR)
+        button.configure(command=lambda: self.__load_map())
+        button.grid(row=4, column=3, padx=5, pady=(0, 2.5))
+
+        # Terrain brush, and the cost it paints with.
+        button = tk.Button(
+            self.__controls,
+            text=BUTTON_TEXT_PAINT_TERRAIN,
+            width=15,
+            bg=BUTTON_BG_PAINT_TERRAIN)
+        button.configure(command=lambda b=button: self.__change_cell_colour(Colours.LIGHT_TERRAIN.value, b))
+        button.grid(row=5, column=0, padx=5, pady=(0, 2.5))
+
+        self.__terrain_cost = tk.Scale(self.__controls, label=SCALE_TEXT_TERRAIN_COST, from_=MIN_TERRAIN_COST,
+                                       to=MAX_TERRAIN_COST, orient=tk.HORIZONTAL, bg=FRAME_BG_COLOUR,
+                                       highlightthickness=0)
+        self.__terrain_cost.set(DEFAULT_TERRAIN_COST)
+        self.__terrain_cost.grid(row=5, column=1, columnspan=2, sticky=tk.W+tk.E, padx=5, pady=(0, 2.5))
+
+        # Checkbox to show the cost from every cell to the end as a heatmap.
+        self.__show_distance_field = tk.BooleanVar(self.__controls, value=False)
+        checkbutton = tk.Checkbutton(self.__controls, text=CHECKBUTTON_TEXT_DISTANCE_FIELD,
+                                     variable=self.__show_distance_field, bg=FRAME_BG_COLOUR,
+                                     command=lambda: self.__draw_base_layer())
+        checkbutton.grid(row=5, column=3, padx=5, pady=(0, 2.5), sticky=tk.W)
+
+        # Sliders for the heuristic weight and time budget of weighted and anytime searches.
+        self.__weight = tk.Scale(self.__controls, label=SCALE_TEXT_WEIGHT, from_=1, to=MAX_WEIGHT,
+                                 resolution=WEIGHT_RESOLUTION, orient=tk.HORIZONTAL, bg=FRAME_BG_COLOUR,
+                                 highlightthickness=0)
+        self.__weight.set(DEFAULT_WEIGHT)
+        self.__weight.grid(row=6, column=0, columnspan=2, sticky=tk.W+tk.E, padx=5, pady=(0, 2.5))
+
+        self.__time_budget = tk.Scale(self.__controls, label=SCALE_TEXT_TIME_BUDGET, from_=1, to=MAX_TIME_BUDGET_MS,
+                                      orient=tk.HORIZONTAL, bg=FRAME_BG_COLOUR, highlightthickness=0)
+        self.__time_budget.set(round(DEFAULT_BUDGET_SECONDS * 1000))
+        self.__time_budget.grid(row=6, column=2, columnspan=2, sticky=tk.W+tk.E, padx=5, pady=(0, 2.5))
+
+        # Label under the controls that shows how much work the last search did.
+        self.__stats_label = tk.Label(self.__controls, text="", bg=FRAME_BG_COLOUR, justify=tk.LEFT)
+        self.__stats_label.grid(row=7, column=0, columnspan=4, padx=5, pady=(0, 2.5), sticky=tk.W)
+
         # Create a label in the buttom right corner of the screen that, when hovered over, displays information about
-        # how to use the program.
+        # how to use the program. The tooltip itself is created the first time the label is hovered over.
         tooltip_label = tk.Label(self.__controls, text="?", bg=FRAME_BG_COLOUR)
         tooltip_label.grid(row=2, column=3, padx=5, pady=(0, 2.5), sticky=tk.E)
-        tooltip.Hovertip(tooltip_label, hover_delay=100,
-                         text=('Left-Click is used to select buttons and draw squares on the grid.\n'
-                               'Right-Click is used to erase squares from the grid.'))
+        tooltip_label.bind('<Enter>', self.__create_tooltip)
 
         self.__controls.pack()
 
+    @staticmethod
+    def __create_tooltip(event: tk.Event) -> None:
+        """ Attach the tooltip to the label the mouse entered, and schedule it to show. idlelib is slow to import and
+        most sessions never hover over the label, so it is only imported here.
+        """
+        from idlelib import tooltip
+
+        # The tooltip replaces this callback with its own, so it is only created once.
+        hovertip = tooltip.Hovertip(event.widget, TOOLTIP_TEXT, hover_delay=TOOLTIP_DELAY_MS)
+        hovertip.schedule()
+
     @property
     def root(self) -> tk.Tk:
         return self.__root
 
     @property
-    def cells(self) -> Dict[int, Cell]:
-        return self.__cells
+    def stats(self) -> Optional[SearchStats]:
+        """ Statistics of the last search run, or None if the last path didn't need a search. """
+        return self.__stats
+
+    @property
+    def grid(self) -> Grid:
+        return self.__grid
 
     @property
     def start(self) -> Optional[Cell_ID]:
@@ -191,67 +519,215 @@ class Window:
         button.focus()
         self.__colour = colour
 
+    def __change_movement(self, movement: str) -> None:
+        """ Switch the grid between 4-way and 8-way movement, and select the best heuristic for the new movement model.
+        """
+        self.__grid.diagonal = movement == MENU_TEXT_MOVEMENT_EIGHT
+        self.__heuristic.set(default_heuristic(self.__grid).value)
+        self.__refresh_distance_field()
+
+    def __save_map(self) -> None:
+        """ Ask for a file and save the grid with its start and end points to it. Maps saved with the Moving AI
+        extension are exported in that format, without the start and end points.
+        """
+        path = filedialog.asksaveasfilename(defaultextension=".grid", filetypes=MAP_FILE_TYPES)
+        if not path:
+            return
+
+        try:
+            if path.endswith(MOVING_AI_EXTENSION):
+                export_moving_ai(path, self.__grid)
+            else:
+                save_map(path, self.__grid, self.__start, self.__end)
+        except OSError as error:
+            messagebox.showerror("Error", f"Could not save the map: {error}")
+
+    def __load_map(self) -> None:
+        """ Ask for a file and replace the grid with the map in it. """
+        path = filedialog.askopenfilename(filetypes=MAP_FILE_TYPES)
+        if not path:
+            return
+
+        try:
+            if path.endswith(MOVING_AI_EXTENSION):
+                map_data = import_moving_ai(path)
+            else:
+                map_data = load_map(path)
+        except (OSError, ValueError) as error:
+            messagebox.showerror("Error", f"Could not load the map: {error}")
+            return
+        self.__set_map(map_data)
+
+    def __set_map(self, map_data: MapData) -> None:
+        """ Replace the grid and its start and end points, and draw them. """
+        # Free the HPA* planners of the old grid, which would otherwise keep it (and its cluster graph) alive.
+        close_planners(self.__grid)
+        self.__grid = map_data.grid
+        self.__start = map_data.start
+        self.__end = map_data.end
+        self.__shortest_path = set()
+
+        self.__create_renderer()
+        self.__renderer.fill_mask(self.__grid.get_obstacle_mask(), Colours.OBSTACLE.value)
+        self.__draw_base_layer()
+        if self.__start is not None:
+            self.draw_cell(self.__start, Colours.START.value)
+        if self.__end is not None:
+            self.draw_cell(self.__end, Colours.END.value)
+
+        # Match the drop-down menus to the map's movement model.
+        self.__movement.set(MENU_TEXT_MOVEMENT_EIGHT if self.__grid.diagonal else MENU_TEXT_MOVEMENT_FOUR)
+        self.__heuristic.set(default_heuristic(self.__grid).value)
+
+    def __draw_base_layer(self) -> None:
+        """ Draw the heatmap of the distance field to the end under the cells if it is shown (and there is an end), or
+        the terrain otherwise.
+        """
+        self.__distance_field_stale = False
+        if self.__show_distance_field.get() and self.__end is not None:
+            field = get_distance_field(self.__grid, self.__end)
+            self.__renderer.fill_base_layer(heatmap(field, len(HEATMAP_COLOURS)), [None, *HEATMAP_COLOURS])
+        elif self.__grid.costs is not None:
+            self.__renderer.fill_base_layer(self.__grid.costs, TERRAIN_COLOURS)
+        elif self.__renderer.has_base():
+            self.__renderer.fill_base_layer(bytes(self.__grid.get_num_cells()), [])
+
+    def __refresh_distance_field(self) -> None:
+        """ Redraw the distance field heatmap after the grid or the end changes, if it is shown. """
+        if self.__show_distance_field.get():
+            self.__draw_base_layer()
+
+    def __release_callback(self, event: tk.Event) -> None:
+        """ Redraw the distance field heatmap once a stroke that changed the grid or the end is finished. """
+        if self.__distance_field_stale:
+            self.__distance_field_stale = False
+            self.__refresh_distance_field()
+
     def __draw_callback(self, event: tk.Event) -> None:
         """ Draw a cell (a filled square) on the screen. """
-        # Cannot draw if a path is drawn on the screen.
-        if self.__shortest_path:
+        # Cannot draw while a search is animating.
+        if self.__search is not None:
             return
 
-        cell_id = self.abs_to_cell_id((event.x, event.y))
+        # Cannot draw if a path is drawn on the screen, unless it is being re-routed live (then only obstacles and
+        # terrain can be drawn).
+        if self.__planner is not None:
+            if self.__colour not in (Colours.OBSTACLE.value, Colours.LIGHT_TERRAIN.value):
+                return
+        elif self.__shortest_path:
+            return
 
-        # Don't draw the cell if a cell already exists, the user clicked in an area outside the grid, or the user is
+        # Don't draw the cell if the user clicked in an area outside the grid, a cell already exists, or the user is
         # drawing a start/end cell when a start/end cell already exists.
+        cell_coords = self.abs_to_cell((event.x, event.y))
+        if self.out_of_bounds(cell_coords):
+            return
+
+        cell_id = self.cell_to_cell_id(cell_coords)
+
+        # Terrain is painted under whatever is drawn in the cell.
+        if self.__colour == Colours.LIGHT_TERRAIN.value:
+            cost = self.__terrain_cost.get()
+            self.__grid.set_cost(cell_id, cost)
+            if self.__show_distance_field.get():
+                self.__distance_field_stale = True
+            else:
+                self.__renderer.fill_base(cell_id, terrain_colour(cost))
+            if self.__planner is not None:
+                self.__reroute()
+            return
+
         if self.cell_exists(cell_id) or \
-           self.out_of_bounds(self.abs_to_cell((event.x, event.y))) or \
            (self.__end is not None and self.__colour == Colours.END.value) or \
            (self.__start is not None and self.__colour == Colours.START.value):
             return
 
-        self.draw_cell(cell_id, self.__colour, self.__cells)
+        self.draw_cell(cell_id, self.__colour)
 
-        # Make note if a start/end cell is drawn.
-        if self.__colour == Colours.START.value:
+        # Make note if an obstacle or a start/end cell is drawn.
+        if self.__colour == Colours.OBSTACLE.value:
+            self.__grid.set_obstacle(cell_id, True)
+        elif self.__colour == Colours.START.value:
             self.__start = cell_id
         elif self.__colour == Colours.END.value:
             self.__end = cell_id
 
+        if self.__colour != Colours.START.value:
+            self.__distance_field_stale = True
+        if self.__planner is not None:
+            self.__reroute()
+
     def __erase_callback(self, event: tk.Event) -> None:
         """ Erase a cell (a filled square) on the screen. """
-        # Cannot erase if a path is drawn on the screen.
-        if self.__shortest_path:
+        # Cannot erase while a search is animating.
+        if self.__search is not None:
             return
 
-        cell_id = self.abs_to_cell_id((event.x, event.y))
+        # Cannot erase if a path is drawn on the screen, unless it is being re-routed live.
+        if self.__shortest_path and self.__planner is None:
+            return
+
+        cell_coords = self.abs_to_cell((event.x, event.y))
+        if self.out_of_bounds(cell_coords):
+            return
 
-        if not self.cell_exists(cell_id) or self.out_of_bounds(self.abs_to_cell((event.x, event.y))):
+        cell_id = self.cell_to_cell_id(cell_coords)
+        if not self.cell_exists(cell_id):
+            # Erase terrain once there is nothing drawn over it.
+            if self.__grid.get_cost(cell_id) != DEFAULT_COST:
+                self.__grid.set_cost(cell_id, DEFAULT_COST)
+                if self.__show_distance_field.get():
+                    self.__distance_field_stale = True
+                else:
+                    self.__renderer.fill_base(cell_id, None)
+                if self.__planner is not None:
+                    self.__reroute()
             return
 
-        # Make note if a start/end point is removed.
-        if self.__cells[cell_id].colour == Colours.START.value:
+        # Only obstacles (and terrain) can be erased while re-routing live.
+        colour = self.__renderer.colour(cell_id)
+        if self.__planner is not None and colour != Colours.OBSTACLE.value:
+            return
+
+        # Make note if an obstacle or a start/end point is removed.
+        if colour == Colours.OBSTACLE.value:
+            self.__grid.set_obstacle(cell_id, False)
+        elif colour == Colours.START.value:
             self.__start = None
-        elif self.__cells[cell_id].colour == Colours.END.value:
+        elif colour == Colours.END.value:
             self.__end = None
 
-        # Remove from screen and stop keeping track of the cell.
-        self.__canvas.delete(self.__cells[cell_id].tk_id)
-        del self.__cells[cell_id]
+        self.__renderer.erase(cell_id)
+
+        if colour != Colours.START.value:
+            self.__distance_field_stale = True
+        if self.__planner is not None:
+            self.__reroute()
 
     def __clear_canvas(self) -> None:
-        """ Remove all drawn cells from the grid. If a shortest path is drawn, it is removed first. """
-        if self.__shortest_path:
-            for cell in self.__shortest_path.values():
-                self.__canvas.delete(cell.tk_id)
+        """ Remove all drawn cells from the grid. If a search is animating, it is cancelled instead. If a shortest path
+        is drawn (or being re-routed live), it is removed first.
+        """
+        if self.__search is not None:
+            self.__cancel_search()
+            return
+
+        if self.__shortest_path or self.__planner is not None:
+            self.__erase_path_cells(self.__shortest_path)
             self.__shortest_path.clear()
+            self.__clear_search_cells()
+
+            if self.__planner is not None:
+                self.__planner.close()
+                self.__planner = None
 
             # Re-enable non-clear buttons after the path has been cleared from the screen.
             self.__set_non_clear_buttons_state(tk.NORMAL)
 
             return
 
-        for cell in self.__cells.values():
-            self.__canvas.delete(cell.tk_id)
-
-        self.__cells.clear()
+        self.__renderer.clear()
+        self.__grid.clear()
         self.__start = None
         self.__end = None
 
@@ -262,61 +738,248 @@ class Window:
         if self.__start is None or self.__end is None:
             messagebox.showerror("Error", "Please select both a starting and ending point before running the"
                                           " pathfinding algorithm!")
-        else:
-            import pathfinding
-            path = pathfinding.a_star(self)
+        elif self.__live_rerouting.get():
+            # Keep the search state around so the path can be repaired as obstacles change. Only obstacles can be
+            # edited while re-routing.
+            planner = IncrementalPlanner(self.__grid, self.__start, self.__end, Heuristic(self.__heuristic.get()))
+            path = planner.find_path()
 
             if not path:
+                planner.close()
                 messagebox.showinfo("Info", "No path found!")
                 return
+            self.__planner = planner
+            if self.__colour != Colours.LIGHT_TERRAIN.value:
+                self.__colour = Colours.OBSTACLE.value
+            self.__stats = None
+            self.__stats_label.config(text=LABEL_TEXT_REROUTING.format(path_length=len(path)))
+            self.__draw_shortest_path(path)
+        elif self.__animate.get() and ALGORITHMS[self.__algorithm.get()] is a_star and \
+                self.__path_cache.get(self.__grid, self.__start, self.__end, a_star,
+                                      heuristic=Heuristic(self.__heuristic.get())) is None:
+            self.__start_search()
+        else:
+            search = ALGORITHMS[self.__algorithm.get()]
+            options = {'heuristic': Heuristic(self.__heuristic.get())}
+            if search in BUDGETED_ALGORITHMS:
+                options.update(weight=self.__weight.get(), seconds=self.__time_budget.get() / 1000)
+
+            stats = SearchStats()
+            hits = self.__path_cache.hits
+            started = time.perf_counter()
+            try:
+                if search in BUDGETED_ALGORITHMS:
+                    # What these find depends on how far they got within the time budget, so the same query can
+                    # give a different path each time and they aren't cached.
+                    path = search(self.__grid, self.__start, self.__end, stats=stats, **options)
+                else:
+                    path = self.__path_cache.find_path(self.__grid, self.__start, self.__end, search, stats,
+                                                       **options)
+            except ValueError as error:
+                # Raised by algorithms that can't search grids with terrain.
+                messagebox.showerror("Error", str(error))
+                return
+
+            if self.__path_cache.hits > hits:
+                self.__stats = None
+                self.__stats_label.config(text=LABEL_TEXT_CACHED.format(algorithm=self.__algorithm.get(),
+                                                                        path_length=len(path)))
+            else:
+                self.__show_stats(self.__algorithm.get(), stats, time.perf_counter() - started)
+
+            if not path:
+                if stats.suboptimality_bound == math.inf:
+                    messagebox.showinfo("Info", "No path found within the time budget!")
+                else:
+                    messagebox.showinfo("Info", "No path found!")
+                return
             self.__draw_shortest_path(path)
 
     def __draw_shortest_path(self, path: List[Cell_ID]) -> None:
-        """ Draw the shortest path on the grid. """
+        """ Draw the shortest path on the grid. If a path is already drawn, only the cells that differ are redrawn. """
         # Start and end points are already drawn, no need to draw over them.
-        for cell_id in path[1:-1]:
-            self.draw_cell(cell_id, Colours.PATH.value, self.__shortest_path)
+        path_cells = set(path[1:-1])
+        self.__erase_path_cells(self.__shortest_path - path_cells)
+        for cell_id in path_cells - self.__shortest_path:
+            self.draw_cell(cell_id, Colours.PATH.value)
+        self.__shortest_path = path_cells
 
         # Disable every button except for the clear button to force the user to clear the path before making
         # modifications to the grid.
         self.__set_non_clear_buttons_state(tk.DISABLED)
 
+    def __reroute(self) -> None:
+        """ Repair the live re-routed path after the grid was edited, then redraw it and show its length. If the edit
+        cut the end off from the start, the path is erased and the label says there is no path.
+        """
+        assert self.__planner is not None
+        path = self.__planner.find_path()
+        if path:
+            self.__stats_label.config(text=LABEL_TEXT_REROUTING.format(path_length=len(path)))
+        else:
+            self.__stats_label.config(text=LABEL_TEXT_REROUTING_NO_PATH)
+        self.__draw_shortest_path(path)
+
+    def __erase_path_cells(self, cells: Iterable[Cell_ID]) -> None:
+        """ Erase cells of the drawn shortest path. Cells drawn over since the path was drawn (such as obstacles placed
+        on it while re-routing live) are left as they are.
+        """
+        for cell_id in cells:
+            if self.__renderer.colour(cell_id) == Colours.PATH.value:
+                self.__renderer.erase(cell_id)
+
+    def __start_search(self) -> None:
+        """ Start an animated A* search. Each frame runs the search for up to the frame budget, colouring the cells it
+        opens and closes, then hands control back to tkinter so the window stays responsive.
+        """
+        assert self.__start is not None and self.__end is not None
+
+        # The search gets its own slot of the cached search states, since it stays alive between frames.
+        self.__search_heuristic = Heuristic(self.__heuristic.get())
+        self.__search_stats = SearchStats()
+        self.__search = a_star_steps(self.__grid, self.__start, self.__end, SEARCH_BATCH_SIZE,
+                                     get_search_state(self.__grid.get_num_cells(), ANIMATED_SEARCH_SLOT),
+                                     self.__search_heuristic, stats=self.__search_stats)
+
+        # Only the clear, pause and cancel buttons work while searching.
+        self.__set_non_clear_buttons_state(tk.DISABLED)
+        self.__pause_button.config(state=tk.NORMAL, text=BUTTON_TEXT_PAUSE)
+        self.__cancel_button.config(state=tk.NORMAL)
+        self.__search_job = self.__root.after(0, self.__step_search)
+
+    def __step_search(self) -> None:
+        """ Run one frame of the animated search. """
+        assert self.__search is not None
+        self.__search_job = None
+
+        started = time.perf_counter()
+        deadline = started + self.__frame_budget.get() / 1000
+        try:
+            while time.perf_counter() < deadline:
+                step = next(self.__search)
+                for cell_id in step.opened:
+                    self.__draw_search_cell(cell_id, Colours.OPEN.value)
+                for cell_id in step.closed:
+                    self.__draw_search_cell(cell_id, Colours.CLOSED.value)
+        except StopIteration as stop:
+            self.__finish_search(stop.value)
+            return
+
+        # The next frame starts FRAME_INTERVAL_MS after this one started, so the time spent searching is part of it.
+        elapsed_ms = int((time.perf_counter() - started) * 1000)
+        self.__search_job = self.__root.after(max(0, FRAME_INTERVAL_MS - elapsed_ms), self.__step_search)
+
+    def __finish_search(self, path: List[Cell_ID]) -> None:
+        """ Show the result of a completed animated search. """
+        assert self.__start is not None and self.__end is not None
+        self.__search = None
+        self.__pause_button.config(state=tk.DISABLED, text=BUTTON_TEXT_PAUSE)
+        self.__cancel_button.config(state=tk.DISABLED)
+        self.__path_cache.put(self.__grid, self.__start, self.__end, path, a_star, heuristic=self.__search_heuristic)
+
+        # Time spent between frames isn't part of the search.
+        self.__show_stats(self.__algorithm.get(), self.__search_stats, self.__search_stats.seconds)
+
+        if not path:
+            self.__clear_search_cells()
+            self.__set_non_clear_buttons_state(tk.NORMAL)
+            messagebox.showinfo("Info", "No path found!")
+            return
+        self.__draw_shortest_path(path)
+
+    def __show_stats(self, algorithm: str, stats: SearchStats, seconds: float) -> None:
+        """ Show the statistics of a search that took the given number of seconds. The largest heap size, the time
+        spent on each phase and the suboptimality bound are only shown if the search measured them.
+        """
+        self.__stats = stats
+        counts = LABEL_TEXT_COUNTS.format(algorithm=algorithm, expanded=stats.expanded, pushes=stats.pushes,
+                                          stale_pops=stats.stale_pops, path_length=stats.path_length)
+        if stats.max_heap_size:
+            counts += LABEL_TEXT_MAX_HEAP_SIZE.format(max_heap_size=stats.max_heap_size)
+        if 1 < stats.suboptimality_bound < math.inf:
+            counts += LABEL_TEXT_BOUND.format(bound=stats.suboptimality_bound)
+
+        timings = LABEL_TEXT_TIME.format(milliseconds=seconds * 1000)
+        if stats.seconds:
+            timings += LABEL_TEXT_PHASES.format(setup=stats.setup_seconds * 1000, search=stats.search_seconds * 1000,
+                                                path=stats.path_seconds * 1000)
+        self.__stats_label.config(text=counts + "\n" + timings)
+
+    def __toggle_pause(self) -> None:
+        """ Pause the animated search, or resume it if it is paused. """
+        if self.__search is None:
+            return
+
+        if self.__search_job is not None:
+            self.__root.after_cancel(self.__search_job)
+            self.__search_job = None
+            self.__pause_button.config(text=BUTTON_TEXT_RESUME)
+        else:
+            self.__search_job = self.__root.after(0, self.__step_search)
+            self.__pause_button.config(text=BUTTON_TEXT_PAUSE)
+
+    def __cancel_search(self) -> None:
+        """ Stop the animated search and remove its progress from the grid. """
+        if self.__search is None:
+            return
+
+        if self.__search_job is not None:
+            self.__root.after_cancel(self.__search_job)
+            self.__search_job = None
+        self.__search.close()
+        self.__search = None
+
+        self.__clear_search_cells()
+        self.__pause_button.config(state=tk.DISABLED, text=BUTTON_TEXT_PAUSE)
+        self.__cancel_button.config(state=tk.DISABLED)
+        self.__set_non_clear_buttons_state(tk.NORMAL)
+
+    def __draw_search_cell(self, cell_id: Cell_ID, colour: str) -> None:
+        """ Colour a cell opened or closed by the animated search. Start and end points are left as they are. """
+        if not self.cell_exists(cell_id):
+            self.draw_cell(cell_id, colour)
+
+    def __clear_search_cells(self) -> None:
+        """ Remove the cells coloured by the animated search from the grid. """
+        self.__renderer.remove([Colours.OPEN.value, Colours.CLOSED.value])
+
+    def __start_pan_callback(self, event: tk.Event) -> None:
+        """ Start panning the viewport from the position of the mouse. """
+        self.__pan_origin = (event.x, event.y)
+
+    def __pan_callback(self, event: tk.Event) -> None:
+        """ Move the viewport with the mouse. """
+        assert isinstance(self.__renderer, ViewportRenderer)
+        self.__renderer.pan(self.__pan_origin[0] - event.x, self.__pan_origin[1] - event.y)
+        self.__pan_origin = (event.x, event.y)
+
+    def __zoom_callback(self, event: tk.Event) -> None:
+        """ Zoom the viewport in or out around the mouse. """
+        assert isinstance(self.__renderer, ViewportRenderer)
+        self.__renderer.zoom(1 if event.num == 4 or event.delta > 0 else -1, event.x, event.y)
+
     def __set_non_clear_buttons_state(self, new_state: str) -> None:
-        """ Sets the state of all non-clear buttons in the window controls. """
+        """ Sets the state of all non-clear buttons and drop-down menus in the window controls. The buttons that control
+        an animated search are handled separately.
+        """
         for widget in self.__controls.winfo_children():
-            if widget.winfo_class().upper() == "BUTTON":
-                if widget.config("text")[-1] != BUTTON_TEXT_CLEAR:
+            if widget.winfo_class().upper() in ("BUTTON", "MENUBUTTON"):
+                if widget.config("text")[-1] not in (BUTTON_TEXT_CLEAR, BUTTON_TEXT_PAUSE, BUTTON_TEXT_RESUME,
+                                                     BUTTON_TEXT_CANCEL):
                     widget.config(state=new_state)
 
-    def draw_cell(self, cell_id: Cell_ID, colour: str,
-                  cells_dict: Dict[Cell_ID, Cell]) -> None:
-        """ Draw a cell on the grid with the specified colour. The cells_dict is the dictionary the new cell should be
-        tracked in.
-        """
+    def draw_cell(self, cell_id: Cell_ID, colour: str) -> None:
+        """ Draw a cell on the grid with the specified colour. The cell is drawn the next time the renderer flushes. """
         assert colour in [colour.value for colour in Colours]
-
-        cell_coords = self.cell_id_to_cell(cell_id)
-        tk_id = self.__canvas.create_rectangle(self.cell_to_corner_coords(cell_coords), fill=colour)
-        self.__canvas.pack()
-
-        cells_dict[cell_id] = Cell(tk_id, cell_coords, colour)
+        self.__renderer.fill(cell_id, colour)
 
     def cell_exists(self, cell_id: Cell_ID) -> bool:
-        """ Return if a cell already exists in the specified cell. """
-        return cell_id in self.__cells.keys()
+        """ Return if an obstacle or a start/end point exists in the specified cell. """
+        return self.__renderer.colour(cell_id) in (Colours.OBSTACLE.value, Colours.START.value, Colours.END.value)
 
     def obstacle_exists(self, cell_id: Cell_ID) -> bool:
         """ Return if an obstacle exists in the specified cell. """
-        return (cell_id in self.__cells.keys() and self.__cells[cell_id].colour == Colours.OBSTACLE.value)
-
-    def cell_to_corner_coords(self, cell_coords: Coordinate) -> Tuple[Coordinate, Coordinate]:
-        """ Converts a cell's coordinates to the coordinates of it's top left and bottom right corners
-        on the canvas.
-        """
-        top_left = (cell_coords[0] * self.cell_width, cell_coords[1] * self.cell_height)
-        bottom_right = (top_left[0] + self.cell_width, top_left[1] + self.cell_height)
-
-        return top_left, bottom_right
+        return self.__grid.obstacle_exists(cell_id)
 
     def cell_to_cell_id(self, cell_coords: Coordinate) -> Cell_ID:
         """ Convert's a cell's position on the grid to its cell ID. Note: this function may return an unexpected Cell
@@ -324,15 +987,15 @@ class Window:
         same Cell ID: 25. It is up to the caller of this function to determine whether the Cell ID makes sense (for
         example, by checking if the coordinate is in bounds.
         """
-        return cell_coords[0] + (cell_coords[1] * self.width // self.cell_width)
+        return self.__grid.cell_to_cell_id(cell_coords)
 
     def cell_id_to_cell(self, cell_id: Cell_ID) -> Coordinate:
         """ Convert's a cell ID to its position on the grid. """
-        return (cell_id % (self.width // self.cell_width), cell_id // (self.width // self.cell_width))
+        return self.__grid.cell_id_to_cell(cell_id)
 
     def abs_to_cell(self, abs_coords: Coordinate) -> Coordinate:
-        """ Converts absolute coordinates on the grid to the cell coordinates at that position. """
-        return (abs_coords[0] // self.cell_width, abs_coords[1] // self.cell_height)
+        """ Converts absolute coordinates on the canvas to the cell coordinates drawn at that position. """
+        return self.__renderer.canvas_to_cell(abs_coords[0], abs_coords[1])
 
     def abs_to_cell_id(self, abs_coords: Coordinate) -> Cell_ID:
         """ Converts absolute coordinates on the grid to the cell ID at that position. """
@@ -340,26 +1003,12 @@ class Window:
 
     def out_of_bounds(self, cell_coords: Coordinate) -> bool:
         """ Return whether the coordinates of a cell that the user clicked is outside the bounds of the grid. """
-        if cell_coords[0] < 0 or cell_coords[1] < 0 or \
-           cell_coords[0] > self.width // self.cell_width - 1 or \
-           cell_coords[1] > self.height // self.cell_height - 1:
-            return True
-        return False
+        return self.__grid.out_of_bounds(cell_coords)
 
     def get_num_cells(self) -> int:
         """ Get the number of cells on the grid. """
-        return (self.width // self.cell_width) * (self.height // self.cell_height)
-
-    def get_neighbours(self, cell_id: Cell_ID) -> List[Cell_ID]:
-        """ Get surrounding cells (N,E,S,W). """
-        cell = self.cell_id_to_cell(cell_id)
-
-        north = (cell[0], cell[1]-1)
-        east = (cell[0]+1, cell[1])
-        south = (cell[0], cell[1]+1)
-        west = (cell[0]-1, cell[1])
+        return self.__grid.get_num_cells()
 
-        return [self.cell_to_cell_id(coords)
-                for coords in [north, east, south, west]
-                if not self.out_of_bounds(coords) and
-                not self.obstacle_exists(self.cell_to_cell_id(coords))]
+    def get_neighbours(self, cell_id: Cell_ID) -> Sequence[Cell_ID]:
+        """ Get surrounding cells (N,E,S,W, then NE,SE,SW,NW if diagonal moves are allowed) that can be moved to. """
+        return self.__grid.get_neighbours(cell_id)